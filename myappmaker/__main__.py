@@ -8,19 +8,22 @@ and technical users, including block coding and many more.
 import sys
 
 
-### third-party import
-from PySide6.QtWidgets import QApplication
 
+def main():
 
-### local imports
+    ### Qt and the modules using it are only imported here: worker processes
+    ### used for matching (see strokesmgmt/processpool.py) are spawned, so
+    ### they import the main module again, and must not import Qt
 
-from .appinfo import ORG_DIR_NAME, APP_DIR_NAME
+    from PySide6.QtWidgets import QApplication
 
-from .mainwindow import MainWindow
+    from .appinfo import ORG_DIR_NAME, APP_DIR_NAME
 
+    from .mainwindow import MainWindow
 
+    from .prefsdata import flush_preferences
 
-def main():
+    ###
 
     app = QApplication(sys.argv)
     app.setOrganizationName(ORG_DIR_NAME)
@@ -31,6 +34,9 @@ def main():
 
     app.exec()
 
+    ### save changes to preferences which may still be pending
+    flush_preferences(wait=True)
+
 
 ### when file is run as script...
 
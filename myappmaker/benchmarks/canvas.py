@@ -0,0 +1,329 @@
+"""Benchmark of memory and frame time of canvases with many widgets.
+
+Fills a canvas with a given number of widgets, either painted by
+lightweight items or embedded as actual widgets (one proxy widget each),
+and measures the memory taken and the time needed to repaint the view
+showing all of them. Results are reported as JSON.
+
+Each measurement runs in a separate process, so the memory of one doesn't
+affect the others. The canvas performance profile used can be chosen, so
+profiles can be compared as well.
+
+Usage example:
+
+    python -m myappmaker.benchmarks.canvas --counts 100 1000 10000
+
+Qt's offscreen platform is used unless another one is requested via the
+QT_QPA_PLATFORM environment variable.
+"""
+
+### standard library imports
+
+import os
+
+import sys
+
+import json
+
+import platform
+
+import subprocess
+
+from argparse import ArgumentParser
+
+from time import perf_counter
+
+
+### set platform before importing Qt widgets
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+### third-party imports
+
+from numpy import percentile
+
+## PySide6
+
+from PySide6.QtWidgets import QApplication, QGraphicsScene, QGraphicsView
+
+from PySide6.QtCore import qVersion
+
+
+### local imports
+
+from .. import __version__ as myappmaker_version
+
+from ..prefsdata import PREFERENCES, PreferencesKeys
+
+from ..widgetitems import PaintedWidgetItem, get_widget_proxy
+
+from ..canvasprofiles import (
+    CANVAS_PROFILES,
+    apply_canvas_profile,
+    prepare_canvas_widget,
+)
+
+from ..widgets import get_widget_keys
+
+
+
+### constants
+
+DEFAULT_WIDGET_COUNTS = (100, 1000, 10000)
+
+MODES = ('painted', 'proxy')
+
+NO_OF_FRAMES = 20
+
+FRAME_TIME_PERCENTILES = (50, 95)
+
+## distance between the positions of neighbouring widgets on the canvas
+COLUMN_WIDTH = 120
+ROW_HEIGHT = 40
+
+NO_OF_COLUMNS = 100
+
+## size of the view
+VIEW_SIZE = (1280, 720)
+
+
+
+### functions
+
+def get_resident_memory():
+    """Return memory (in bytes) of current process, if available."""
+
+    try:
+
+        with open('/proc/self/statm', encoding='utf-8') as f:
+            resident_pages = int(f.read().split()[1])
+
+    except (OSError, IndexError, ValueError):
+        return
+
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure_canvas(mode, no_of_widgets, profile='standard'):
+    """Return dict with measurements of canvas with given widgets."""
+
+    app = QApplication.instance() or QApplication([])
+
+    scene = QGraphicsScene()
+
+    view = QGraphicsView(scene)
+    view.resize(*VIEW_SIZE)
+    view.show()
+
+    PREFERENCES[PreferencesKeys.CANVAS_PERFORMANCE_PROFILE.value] = profile
+    apply_canvas_profile(scene, view)
+
+    app.processEvents()
+
+    memory_before = get_resident_memory()
+
+    ### fill canvas
+
+    widget_keys = get_widget_keys()
+
+    start = perf_counter()
+
+    for index in range(no_of_widgets):
+
+        widget_key = widget_keys[index % len(widget_keys)]
+
+        if mode == 'painted':
+            item = PaintedWidgetItem(widget_key)
+
+        else:
+            item = get_widget_proxy(widget_key)
+
+        item = prepare_canvas_widget(item)
+        scene.addItem(item)
+
+        row, column = divmod(index, NO_OF_COLUMNS)
+        item.setPos(column * COLUMN_WIDTH, row * ROW_HEIGHT)
+
+    insertion_time = perf_counter() - start
+
+    ### show all widgets in the view
+
+    view.fitInView(scene.itemsBoundingRect())
+    app.processEvents()
+
+    memory_after = get_resident_memory()
+
+    ### time repainting of the view
+
+    frame_times = []
+    viewport = view.viewport()
+
+    for _ in range(NO_OF_FRAMES):
+
+        start = perf_counter()
+        viewport.repaint()
+        frame_times.append((perf_counter() - start) * 1000)
+
+    view.close()
+
+    return {
+
+        'mode': mode,
+        'profile': profile,
+        'no_of_widgets': no_of_widgets,
+        'insertion_seconds': insertion_time,
+
+        'memory_bytes': (
+            memory_after - memory_before
+            if memory_before is not None
+            else None
+        ),
+
+        'frame_time_ms': {
+            **{
+                f'p{value}': float(percentile(frame_times, value))
+                for value in FRAME_TIME_PERCENTILES
+            },
+            'mean': sum(frame_times) / len(frame_times),
+        },
+
+    }
+
+
+def run_benchmark(
+    widget_counts=DEFAULT_WIDGET_COUNTS,
+    modes=MODES,
+    profiles=('standard',),
+):
+    """Return dict with measurements for each profile, mode and count.
+
+    Each measurement is made in a new process.
+    """
+    results = []
+
+    for profile in profiles:
+
+        for mode in modes:
+
+            for no_of_widgets in widget_counts:
+
+                output = subprocess.run(
+                    [
+                        sys.executable,
+                        '-m',
+                        __spec__.name,
+                        '--profiles',
+                        profile,
+                        '--measure',
+                        mode,
+                        str(no_of_widgets),
+                    ],
+                    capture_output=True,
+                    check=True,
+                    text=True,
+                ).stdout
+
+                results.append(json.loads(output))
+
+    return {
+
+        'parameters': {
+            'widget_counts': list(widget_counts),
+            'modes': list(modes),
+            'profiles': list(profiles),
+            'no_of_frames': NO_OF_FRAMES,
+            'view_size': list(VIEW_SIZE),
+        },
+
+        'environment': {
+            'myappmaker_version': myappmaker_version,
+            'python_version': platform.python_version(),
+            'qt_version': qVersion(),
+            'platform': platform.platform(),
+        },
+
+        'results': results,
+
+    }
+
+
+def main(args=None):
+
+    parser = ArgumentParser(
+        description="Benchmark memory and frame time of canvas widgets."
+    )
+
+    parser.add_argument(
+        '--counts',
+        type=int,
+        nargs='+',
+        default=DEFAULT_WIDGET_COUNTS,
+        help="numbers of widgets on the canvases benchmarked",
+    )
+
+    parser.add_argument(
+        '--modes',
+        nargs='+',
+        choices=MODES,
+        default=MODES,
+        help="ways of representing widgets on the canvas",
+    )
+
+    parser.add_argument(
+        '--profiles',
+        nargs='+',
+        choices=list(CANVAS_PROFILES),
+        default=['standard'],
+        help="canvas performance profiles to benchmark",
+    )
+
+    parser.add_argument(
+        '--output',
+        help="path of JSON file to write results to (stdout if not given)",
+    )
+
+    ### used internally, to make a single measurement in a new process
+
+    parser.add_argument(
+        '--measure',
+        nargs=2,
+        metavar=('MODE', 'COUNT'),
+        help="make single measurement and print it (used internally)",
+    )
+
+    options = parser.parse_args(args)
+
+    if options.measure is not None:
+
+        mode, no_of_widgets = options.measure
+        print(
+            json.dumps(
+                measure_canvas(
+                    mode,
+                    int(no_of_widgets),
+                    options.profiles[0],
+                )
+            )
+        )
+
+        return
+
+    report = run_benchmark(options.counts, options.modes, options.profiles)
+
+    if options.output is None:
+
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    else:
+
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+### when file is run as script...
+
+if __name__ == "__main__":
+
+    ### execute main()
+    main()
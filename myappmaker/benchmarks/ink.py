@@ -0,0 +1,324 @@
+"""Benchmark of input-to-ink latency while drawing long strokes.
+
+Feeds the points of long synthetic strokes, one by one, to the item used
+to display strokes being drawn, measuring the time between handing each
+point over and the view being repainted. The live stroke item is compared
+with the previous approach (a path item whose whole path is set again on
+every mouse move), and latency percentiles are reported as JSON for the
+whole stroke and for its last points, where the cost of long strokes
+shows.
+
+Usage example:
+
+    python -m myappmaker.benchmarks.ink --lengths 500 2000 5000
+
+Qt's offscreen platform is used unless another one is requested via the
+QT_QPA_PLATFORM environment variable.
+"""
+
+### standard library imports
+
+import os
+
+import sys
+
+import json
+
+import platform
+
+from argparse import ArgumentParser
+
+from math import cos, sin
+
+from time import perf_counter
+
+
+### set platform before importing Qt widgets
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+### third-party imports
+
+from numpy import percentile
+
+## PySide6
+
+from PySide6.QtWidgets import QApplication, QGraphicsScene, QGraphicsView
+
+from PySide6.QtGui import QPen, QPainterPath
+
+from PySide6.QtCore import QObject, QEvent, QPointF, Qt, qVersion
+
+
+### local imports
+
+from .. import __version__ as myappmaker_version
+
+from ..canvasscene import SIZE
+
+from ..strokesmgmt.liveink import LiveStrokeItem
+
+
+
+### constants
+
+DEFAULT_STROKE_LENGTHS = (500, 2000, 5000)
+
+LATENCY_PERCENTILES = (50, 95, 99)
+
+## fraction of the stroke considered its tail
+TAIL_FRACTION = 0.1
+
+## distance between consecutive points, slightly above the minimum mouse
+## movement registered by the scenes
+POINT_SPACING = 4.0
+
+
+
+### classes
+
+class PaintCounter(QObject):
+    """Counts paint events received by the watched widget."""
+
+    def __init__(self):
+
+        super().__init__()
+        self.count = 0
+
+    def eventFilter(self, obj, event):
+
+        if event.type() == QEvent.Paint:
+            self.count += 1
+
+        return False
+
+
+class LiveStrokeInk:
+    """Displays stroke with the live stroke item."""
+
+    def __init__(self, scene, pen, point):
+
+        self.item = LiveStrokeItem(pen, point)
+        scene.addItem(self.item)
+
+        self.add_point = self.item.add_point
+
+
+class PathStrokeInk:
+    """Displays stroke by setting the whole path of a path item each time."""
+
+    def __init__(self, scene, pen, point):
+
+        self.path = QPainterPath()
+        self.path.moveTo(point)
+
+        self.item = scene.addPath(self.path, pen)
+
+    def add_point(self, point):
+
+        self.path.lineTo(point)
+        self.item.setPath(self.path)
+
+
+INK_CLASSES = {
+    'live_item': LiveStrokeInk,
+    'path_item': PathStrokeInk,
+}
+
+
+
+### functions
+
+def get_spiral_points(no_of_points):
+    """Return points of spiral filling the canvas, evenly spaced."""
+
+    width, height = SIZE
+
+    center_x, center_y = width / 2, height / 2
+    max_radius = min(width, height) / 2 - 10
+
+    ### spiral getting narrower towards the center, with the angle step
+    ### adjusted so consecutive points keep roughly the same spacing
+
+    points = []
+    angle = 0.0
+
+    for index in range(no_of_points):
+
+        radius = max_radius * (1 - .9 * index / no_of_points)
+
+        points.append(
+            QPointF(
+                center_x + radius * cos(angle),
+                center_y + radius * sin(angle),
+            )
+        )
+
+        angle += POINT_SPACING / radius
+
+    return points
+
+
+def get_latency_summary(latencies):
+    """Return latency percentiles (and mean) in milliseconds."""
+
+    milliseconds = [latency * 1000 for latency in latencies]
+
+    summary = {
+        f'p{value}': float(percentile(milliseconds, value))
+        for value in LATENCY_PERCENTILES
+    }
+
+    summary['mean'] = sum(milliseconds) / len(milliseconds)
+
+    return summary
+
+
+def measure_stroke(app, scene, paint_counter, ink_class, points):
+    """Return latency of each point of stroke, in seconds."""
+
+    pen = QPen(Qt.red)
+    pen.setWidth(3)
+
+    ink = ink_class(scene, pen, points[0])
+    app.processEvents()
+
+    latencies = []
+
+    for point in points[1:]:
+
+        paint_count = paint_counter.count
+        start = perf_counter()
+
+        ink.add_point(point)
+
+        while paint_counter.count == paint_count:
+            app.processEvents()
+
+        latencies.append(perf_counter() - start)
+
+    scene.removeItem(ink.item)
+    app.processEvents()
+
+    return latencies
+
+
+def run_benchmark(stroke_lengths=DEFAULT_STROKE_LENGTHS, engines=None):
+    """Return dict with latencies for each engine and stroke length."""
+
+    engines = engines or list(INK_CLASSES)
+
+    app = QApplication.instance() or QApplication([])
+
+    scene = QGraphicsScene(0, 0, *SIZE)
+
+    ### view must show the whole scene, otherwise points out of sight
+    ### wouldn't cause any repainting
+
+    view = QGraphicsView(scene)
+    view.resize(SIZE[0] + 40, SIZE[1] + 40)
+    view.show()
+
+    paint_counter = PaintCounter()
+    view.viewport().installEventFilter(paint_counter)
+
+    app.processEvents()
+
+    results = []
+
+    for engine in engines:
+
+        for stroke_length in stroke_lengths:
+
+            latencies = measure_stroke(
+                app,
+                scene,
+                paint_counter,
+                INK_CLASSES[engine],
+                get_spiral_points(stroke_length),
+            )
+
+            tail_start = int(len(latencies) * (1 - TAIL_FRACTION))
+
+            results.append(
+                {
+                    'engine': engine,
+                    'stroke_length': stroke_length,
+                    'latency_ms': get_latency_summary(latencies),
+                    'tail_latency_ms': (
+                        get_latency_summary(latencies[tail_start:])
+                    ),
+                }
+            )
+
+    view.close()
+
+    return {
+
+        'parameters': {
+            'stroke_lengths': list(stroke_lengths),
+            'engines': engines,
+            'tail_fraction': TAIL_FRACTION,
+            'point_spacing': POINT_SPACING,
+        },
+
+        'environment': {
+            'myappmaker_version': myappmaker_version,
+            'python_version': platform.python_version(),
+            'qt_version': qVersion(),
+            'qt_platform': QApplication.platformName(),
+            'platform': platform.platform(),
+        },
+
+        'results': results,
+
+    }
+
+
+def main(args=None):
+
+    parser = ArgumentParser(
+        description="Benchmark input-to-ink latency of long strokes."
+    )
+
+    parser.add_argument(
+        '--lengths',
+        type=int,
+        nargs='+',
+        default=DEFAULT_STROKE_LENGTHS,
+        help="numbers of points in the strokes benchmarked",
+    )
+
+    parser.add_argument(
+        '--engines',
+        nargs='+',
+        choices=list(INK_CLASSES),
+        help="ways of displaying strokes to benchmark (all, if not given)",
+    )
+
+    parser.add_argument(
+        '--output',
+        help="path of JSON file to write results to (stdout if not given)",
+    )
+
+    options = parser.parse_args(args)
+
+    report = run_benchmark(options.lengths, options.engines)
+
+    if options.output is None:
+
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    else:
+
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+### when file is run as script...
+
+if __name__ == "__main__":
+
+    ### execute main()
+    main()
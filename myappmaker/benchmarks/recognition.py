@@ -0,0 +1,480 @@
+"""Headless benchmark of drawing recognition.
+
+Registers libraries of synthetic widget drawings of increasing sizes and
+times the recognition of distorted versions of them, reporting latency
+percentiles along with top-1 and top-k accuracy as JSON, so results of
+different matching engines/settings can be compared and regressions
+tracked.
+
+Usage example:
+
+    python -m myappmaker.benchmarks.recognition --sizes 10 100 1000 \\
+        --queries 100 --output results.json
+
+No display is needed, since no Qt widgets are imported or created.
+"""
+
+### standard library imports
+
+import sys
+
+import json
+
+import platform
+
+from argparse import ArgumentParser
+
+from pathlib import Path
+
+from tempfile import TemporaryDirectory
+
+from random import Random
+
+from time import perf_counter
+
+
+### third-party import
+from numpy import __version__ as numpy_version, percentile
+
+
+### local imports
+
+from .. import __version__ as myappmaker_version
+
+from ..config import FEATURE_CACHE_FILEPATH, TEMPLATE_STORE_DIR
+
+from ..prefsdata import PREFERENCES, PreferencesKeys
+
+from ..strokesmgmt.utils import (
+    REGISTERED_STROKES,
+    set_template_store_directory,
+    update_strokes_map,
+    remove_from_strokes_map,
+    get_stroke_matches_data,
+)
+
+from ..strokesmgmt.strokesbuffer import StrokesBuffer
+
+from ..strokesmgmt.featurecache import (
+    set_feature_cache_filepath,
+    get_feature_cache_stats,
+    reset_feature_cache_stats,
+)
+
+from ..strokesmgmt.cascade import (
+    STAGES,
+    ENABLED_STAGES,
+    set_enabled_stages,
+    get_cascade_stats,
+    reset_cascade_stats,
+)
+
+from .synthstrokes import (
+    DEFAULT_POINT_SPACING,
+    get_random_shapes,
+    get_drawing,
+    get_distorted_drawing,
+)
+
+
+
+### constants
+
+DEFAULT_LIBRARY_SIZES = (10, 100, 1000, 10000)
+
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+
+### functions
+
+def clear_library():
+    """Remove all registered templates."""
+
+    for widget_key in list(REGISTERED_STROKES):
+        remove_from_strokes_map(widget_key)
+
+
+def get_captured_strokes(strokes, simplification_tolerance):
+    """Return view of strokes captured as if drawn on the canvas.
+
+    That is, with their points added one by one to a strokes buffer, which
+    simplifies them within the given tolerance (if greater than 0).
+    """
+    strokes_buffer = StrokesBuffer()
+
+    for (x, y), *points in strokes:
+
+        strokes_buffer.add_stroke(x, y, simplification_tolerance)
+
+        for point in points:
+            strokes_buffer.add_point(*point)
+
+    return strokes_buffer.get_view()
+
+
+def get_latency_summary(latencies):
+    """Return latency percentiles (and mean) in milliseconds."""
+
+    milliseconds = [latency * 1000 for latency in latencies]
+
+    summary = {
+        f'p{value}': float(percentile(milliseconds, value))
+        for value in LATENCY_PERCENTILES
+    }
+
+    summary['mean'] = sum(milliseconds) / len(milliseconds)
+
+    return summary
+
+
+def get_timed_matches_data(strokes, show_menu):
+    """Return (match data, seconds taken) for given strokes."""
+
+    PREFERENCES[PreferencesKeys.SHOW_WIDGET_MENU_AFTER_DRAWING.value] = (
+        show_menu
+    )
+
+    start = perf_counter()
+    match_data = get_stroke_matches_data(strokes)
+
+    return match_data, perf_counter() - start
+
+
+def benchmark_library_size(
+    library_size,
+    no_of_queries,
+    top_k,
+    rng,
+    max_strokes,
+    distortion,
+    simplification_tolerance,
+):
+    """Return results of benchmarking a library of given size."""
+
+    ### register library
+
+    clear_library()
+
+    library_shapes = {}
+    no_of_points = 0
+
+    reset_feature_cache_stats()
+
+    start = perf_counter()
+
+    for index in range(library_size):
+
+        widget_key = f'synthetic_{index}'
+        shapes = library_shapes[widget_key] = (
+            get_random_shapes(rng, max_strokes)
+        )
+
+        strokes = get_captured_strokes(
+            get_drawing(shapes),
+            simplification_tolerance,
+        )
+
+        no_of_points += len(strokes.union_array)
+
+        update_strokes_map(widget_key, strokes.get_strokes_lists())
+
+    registration_time = perf_counter() - start
+
+    feature_cache_stats = get_feature_cache_stats()
+
+    ### pick queries (each one a distorted version of a registered drawing)
+
+    widget_keys = list(library_shapes)
+
+    queries = [
+        (
+            widget_key,
+            get_captured_strokes(
+                get_distorted_drawing(
+                    library_shapes[widget_key],
+                    rng,
+                    **distortion,
+                ),
+                simplification_tolerance,
+            ),
+        )
+        for widget_key in (
+            rng.choice(widget_keys) for _ in range(no_of_queries)
+        )
+    ]
+
+    ### warm up (so lazily built data isn't included in the timings)
+
+    for show_menu in (False, True):
+        get_timed_matches_data(queries[0][1], show_menu)
+
+    reset_cascade_stats()
+
+    ### time automatic choice (top-1)
+
+    auto_latencies = []
+    top_1_hits = 0
+    no_match_count = 0
+
+    for widget_key, strokes in queries:
+
+        match_data, latency = get_timed_matches_data(strokes, False)
+        auto_latencies.append(latency)
+
+        chosen_widget_key = match_data['chosen_widget_key']
+
+        if chosen_widget_key == widget_key:
+            top_1_hits += 1
+
+        elif not chosen_widget_key:
+            no_match_count += 1
+
+    cascade_stats = get_cascade_stats()
+
+    ### time menu of candidates (top-k)
+
+    menu_latencies = []
+    top_k_hits = 0
+
+    for widget_key, strokes in queries:
+
+        match_data, latency = get_timed_matches_data(strokes, True)
+        menu_latencies.append(latency)
+
+        if any(
+            menu_widget_key == widget_key
+            for _, menu_widget_key in match_data['menu_items'][:top_k]
+        ):
+            top_k_hits += 1
+
+    ###
+
+    return {
+        'library_size': library_size,
+        'no_of_queries': no_of_queries,
+        'registration_seconds': registration_time,
+        'feature_cache_stats': feature_cache_stats,
+        'mean_points_per_template': no_of_points / library_size,
+        'automatic_choice': {
+            'latency_ms': get_latency_summary(auto_latencies),
+            'top_1_accuracy': top_1_hits / no_of_queries,
+            'no_match_rate': no_match_count / no_of_queries,
+            'cascade_stats': cascade_stats,
+        },
+        'menu': {
+            'latency_ms': get_latency_summary(menu_latencies),
+            'top_k_accuracy': top_k_hits / no_of_queries,
+        },
+    }
+
+
+def run_benchmark(
+    library_sizes=DEFAULT_LIBRARY_SIZES,
+    no_of_queries=100,
+    top_k=5,
+    seed=0,
+    max_strokes=3,
+    jitter=2.0,
+    scale=0.05,
+    translation=200.0,
+    point_spacing=DEFAULT_POINT_SPACING,
+    point_spacing_variation=0.3,
+    simplification_tolerance=0,
+):
+    """Return dict with benchmark results for each library size.
+
+    The current preferences and enabled cascade stages are used, and
+    reported along with the results.
+
+    The template store and feature cache are kept in a temporary directory
+    during the run, so the files of the app are neither used nor changed.
+    """
+    rng = Random(seed)
+
+    distortion = {
+        'jitter': jitter,
+        'scale': scale,
+        'translation': translation,
+        'point_spacing': point_spacing,
+        'point_spacing_variation': point_spacing_variation,
+    }
+
+    show_menu_key = PreferencesKeys.SHOW_WIDGET_MENU_AFTER_DRAWING.value
+    show_menu = PREFERENCES[show_menu_key]
+
+    with TemporaryDirectory() as directory:
+
+        try:
+
+            set_template_store_directory(Path(directory))
+            set_feature_cache_filepath(Path(directory) / 'features.cache')
+
+            results = [
+
+                benchmark_library_size(
+                    library_size,
+                    no_of_queries,
+                    top_k,
+                    rng,
+                    max_strokes,
+                    distortion,
+                    simplification_tolerance,
+                )
+
+                for library_size in library_sizes
+
+            ]
+
+        finally:
+
+            PREFERENCES[show_menu_key] = show_menu
+            clear_library()
+
+            ### release the temporary store before its directory is removed
+
+            set_template_store_directory(TEMPLATE_STORE_DIR)
+            set_feature_cache_filepath(FEATURE_CACHE_FILEPATH)
+
+    return {
+
+        'parameters': {
+            'library_sizes': list(library_sizes),
+            'no_of_queries': no_of_queries,
+            'top_k': top_k,
+            'seed': seed,
+            'max_strokes': max_strokes,
+            'simplification_tolerance': simplification_tolerance,
+            **distortion,
+        },
+
+        'engine': {
+            'myappmaker_version': myappmaker_version,
+            'enabled_cascade_stages': list(ENABLED_STAGES),
+            'preferences': {
+                key: value
+                for key, value in PREFERENCES.items()
+                if key != show_menu_key
+            },
+        },
+
+        'environment': {
+            'python_version': platform.python_version(),
+            'numpy_version': numpy_version,
+            'platform': platform.platform(),
+        },
+
+        'results': results,
+
+    }
+
+
+def main(args=None):
+
+    parser = ArgumentParser(
+        description="Benchmark recognition of synthetic drawings."
+    )
+
+    parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=DEFAULT_LIBRARY_SIZES,
+        help="numbers of templates in the libraries benchmarked",
+    )
+
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-strokes', type=int, default=3)
+    parser.add_argument('--jitter', type=float, default=2.0)
+    parser.add_argument('--scale', type=float, default=0.05)
+    parser.add_argument('--translation', type=float, default=200.0)
+
+    parser.add_argument(
+        '--point-spacing',
+        type=float,
+        default=DEFAULT_POINT_SPACING,
+    )
+
+    parser.add_argument(
+        '--point-spacing-variation',
+        type=float,
+        default=0.3,
+    )
+
+    parser.add_argument(
+        '--simplification-tolerance',
+        type=float,
+        default=0,
+        help="tolerance used to simplify strokes as they are captured",
+    )
+
+    parser.add_argument(
+        '--stages',
+        nargs='*',
+        choices=list(STAGES),
+        help="cascade stages to enable (the lossless ones, if not given)",
+    )
+
+    parser.add_argument(
+        '--points-per-stroke',
+        type=int,
+        default=PREFERENCES[
+            PreferencesKeys.RESAMPLING_POINTS_PER_STROKE.value
+        ],
+    )
+
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=PREFERENCES[PreferencesKeys.MATCHING_PROCESSES.value],
+    )
+
+    parser.add_argument(
+        '--output',
+        help="path of JSON file to write results to (stdout if not given)",
+    )
+
+    options = parser.parse_args(args)
+
+    if options.stages is not None:
+        set_enabled_stages(options.stages)
+
+    PREFERENCES[PreferencesKeys.RESAMPLING_POINTS_PER_STROKE.value] = (
+        options.points_per_stroke
+    )
+
+    PREFERENCES[PreferencesKeys.MATCHING_PROCESSES.value] = options.processes
+
+    report = run_benchmark(
+        options.sizes,
+        options.queries,
+        options.top_k,
+        options.seed,
+        options.max_strokes,
+        options.jitter,
+        options.scale,
+        options.translation,
+        options.point_spacing,
+        options.point_spacing_variation,
+        options.simplification_tolerance,
+    )
+
+    if options.output is None:
+
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    else:
+
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+### when file is run as script...
+
+if __name__ == "__main__":
+
+    ### execute main()
+    main()
@@ -0,0 +1,251 @@
+"""Facility for generating synthetic widget drawings.
+
+Drawings are made of strokes shaped like the ones people use to sketch
+widgets (lines, boxes, ellipses, zigzags and check marks). Each stroke is
+sampled along its path the way the canvas samples mouse movement, so the
+drawings resemble real ones.
+
+Variations of a drawing (as if drawn again by a person) are obtained by
+distorting it with jitter, scaling, translation and a different point
+density.
+"""
+
+### standard library import
+from math import cos, pi, sin
+
+
+### third-party imports
+
+from numpy import (
+    array as numpy_array,
+    concatenate,
+    cumsum,
+    diff,
+    hypot,
+    interp,
+    linspace,
+)
+
+
+
+### constants
+
+## default distance between consecutive points of a stroke, similar to the
+## minimum mouse movement registered by the canvas
+DEFAULT_POINT_SPACING = 5.0
+
+## range of the size (width and height) of shapes, in pixels
+SHAPE_SIZE_RANGE = (20.0, 160.0)
+
+## range of the position of shapes within a drawing, in pixels
+SHAPE_POSITION_RANGE = (0.0, 120.0)
+
+## number of vertices used to approximate ellipses
+ELLIPSE_VERTICES = 24
+
+
+
+### shape functions; each one returns the vertices of a polyline fitting
+### the given box
+
+def get_line_vertices(rng, left, top, width, height):
+
+    ### roughly horizontal or vertical line, slightly slanted
+
+    slant = rng.uniform(-.2, .2)
+
+    if rng.random() < .5:
+        return [(left, top), (left + width, top + slant * height)]
+
+    return [(left, top), (left + slant * width, top + height)]
+
+
+def get_box_vertices(rng, left, top, width, height):
+
+    right, bottom = left + width, top + height
+
+    return [
+        (left, top),
+        (right, top),
+        (right, bottom),
+        (left, bottom),
+        (left, top),
+    ]
+
+
+def get_ellipse_vertices(rng, left, top, width, height):
+
+    center_x, center_y = left + width / 2, top + height / 2
+    start_angle = rng.uniform(0, 2 * pi)
+
+    return [
+
+        (
+            center_x + cos(start_angle + angle) * width / 2,
+            center_y + sin(start_angle + angle) * height / 2,
+        )
+
+        for angle in linspace(0, 2 * pi, ELLIPSE_VERTICES)
+
+    ]
+
+
+def get_zigzag_vertices(rng, left, top, width, height):
+
+    no_of_teeth = rng.randint(2, 6)
+
+    return [
+
+        (
+            left + width * index / (no_of_teeth * 2),
+            top + (height if index % 2 else 0),
+        )
+
+        for index in range(no_of_teeth * 2 + 1)
+
+    ]
+
+
+def get_check_mark_vertices(rng, left, top, width, height):
+
+    return [
+        (left, top + height * .6),
+        (left + width * .35, top + height),
+        (left + width, top),
+    ]
+
+
+SHAPE_OPERATIONS = (
+    get_line_vertices,
+    get_box_vertices,
+    get_ellipse_vertices,
+    get_zigzag_vertices,
+    get_check_mark_vertices,
+)
+
+
+
+### functions
+
+def get_sampled_stroke(vertices, point_spacing=DEFAULT_POINT_SPACING):
+    """Return points evenly spaced along polyline with given vertices."""
+
+    vertices = numpy_array(vertices, dtype=float)
+
+    segments_lengths = hypot(*diff(vertices, axis=0).T)
+    cumulative_lengths = concatenate(([0.0], cumsum(segments_lengths)))
+    total_length = cumulative_lengths[-1]
+
+    no_of_points = max(2, round(total_length / point_spacing) + 1)
+
+    positions = linspace(0, total_length, no_of_points)
+
+    return list(
+        zip(
+            interp(positions, cumulative_lengths, vertices[:, 0]).tolist(),
+            interp(positions, cumulative_lengths, vertices[:, 1]).tolist(),
+        )
+    )
+
+
+def get_random_shapes(rng, max_strokes=3):
+    """Return list with vertices of each stroke of a random drawing.
+
+    Parameters
+    ==========
+    rng (random.Random instance)
+        source of randomness, so drawings can be reproduced.
+    max_strokes (integer)
+        maximum number of strokes in the drawing.
+    """
+    shapes = []
+
+    for _ in range(rng.randint(1, max_strokes)):
+
+        shape_operation = rng.choice(SHAPE_OPERATIONS)
+
+        shapes.append(
+            shape_operation(
+                rng,
+                rng.uniform(*SHAPE_POSITION_RANGE),
+                rng.uniform(*SHAPE_POSITION_RANGE),
+                rng.uniform(*SHAPE_SIZE_RANGE),
+                rng.uniform(*SHAPE_SIZE_RANGE),
+            )
+        )
+
+    return shapes
+
+
+def get_drawing(shapes, point_spacing=DEFAULT_POINT_SPACING):
+    """Return strokes sampled from vertices of each shape."""
+
+    return [
+        get_sampled_stroke(vertices, point_spacing)
+        for vertices in shapes
+    ]
+
+
+def get_distorted_drawing(
+    shapes,
+    rng,
+    jitter=2.0,
+    scale=0.05,
+    translation=200.0,
+    point_spacing=DEFAULT_POINT_SPACING,
+    point_spacing_variation=0.3,
+):
+    """Return strokes of shapes as if drawn again by a person.
+
+    Parameters
+    ==========
+    shapes (list of lists of vertices)
+        vertices of each stroke of the original drawing.
+    rng (random.Random instance)
+        source of randomness, so distortions can be reproduced.
+    jitter (float)
+        maximum offset, in pixels, applied to each coordinate of each
+        sampled point.
+    scale (float)
+        maximum relative change in the size of the drawing along each axis
+        (0.05 means up to 5% larger or smaller).
+    translation (float)
+        maximum offset, in pixels, applied to the whole drawing along each
+        axis.
+    point_spacing (float)
+        distance between consecutive sampled points.
+    point_spacing_variation (float)
+        maximum relative change in the point spacing (that is, in the
+        density of points).
+    """
+    scale_x = 1 + rng.uniform(-scale, scale)
+    scale_y = 1 + rng.uniform(-scale, scale)
+
+    offset_x = rng.uniform(-translation, translation)
+    offset_y = rng.uniform(-translation, translation)
+
+    point_spacing *= 1 + rng.uniform(
+        -point_spacing_variation,
+        point_spacing_variation,
+    )
+
+    strokes = []
+
+    for vertices in shapes:
+
+        vertices = [
+            (x * scale_x + offset_x, y * scale_y + offset_y)
+            for x, y in vertices
+        ]
+
+        strokes.append(
+            [
+                (
+                    x + rng.uniform(-jitter, jitter),
+                    y + rng.uniform(-jitter, jitter),
+                )
+                for x, y in get_sampled_stroke(vertices, point_spacing)
+            ]
+        )
+
+    return strokes
@@ -0,0 +1,370 @@
+"""Facility with the document model of the canvas.
+
+The widgets on the canvas are stored as rows of column arrays (type id of
+the widget and its rect), independent from the Qt items displaying them,
+so the document can be queried (bounding boxes, overlaps, alignments),
+serialized and snapshotted without walking the scene graph.
+
+Snapshots are taken in O(1): they reference the current columns and mark
+the rows they use as reserved; the columns are only copied when a reserved
+row would be written again (copy-on-write).
+"""
+
+### third-party imports
+
+from numpy import (
+    arange,
+    argsort,
+    asarray,
+    bincount,
+    column_stack,
+    concatenate,
+    empty,
+    float64,
+    full,
+    int32,
+    nonzero,
+    round as round_array,
+    searchsorted,
+    split,
+    unique,
+)
+
+
+
+### constants
+
+INITIAL_CAPACITY = 256
+
+## names of the columns of the rects array
+X, Y, WIDTH, HEIGHT = range(4)
+
+## functions returning coordinates of edges/centers of rects, by name
+EDGE_GETTERS = {
+    'left': lambda rects: rects[:, X],
+    'right': lambda rects: rects[:, X] + rects[:, WIDTH],
+    'top': lambda rects: rects[:, Y],
+    'bottom': lambda rects: rects[:, Y] + rects[:, HEIGHT],
+    'center_x': lambda rects: rects[:, X] + rects[:, WIDTH] / 2,
+    'center_y': lambda rects: rects[:, Y] + rects[:, HEIGHT] / 2,
+}
+
+
+
+### class definitions
+
+class DocumentColumns:
+    """Column arrays holding the rows of a document."""
+
+    __slots__ = ('type_ids', 'rects', 'reserved')
+
+    def __init__(self, capacity):
+
+        self.type_ids = empty(capacity, dtype=int32)
+        self.rects = empty((capacity, 4), dtype=float64)
+
+        ### number of leading rows referenced by snapshots (which therefore
+        ### can't be written in place)
+        self.reserved = 0
+
+    def __len__(self):
+        return len(self.type_ids)
+
+
+class CanvasDocument:
+    """Widgets on the canvas, stored in column arrays."""
+
+    def __init__(self):
+
+        ### widget keys by type id (only grows, so it can be shared by
+        ### snapshots)
+
+        self.widget_keys = []
+        self.type_id_map = {}
+
+        self.clear()
+
+    def clear(self):
+
+        ### new columns are used, so snapshots are not affected
+        self.columns = DocumentColumns(INITIAL_CAPACITY)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def type_ids(self):
+        return self.columns.type_ids[:self.size]
+
+    @property
+    def rects(self):
+        return self.columns.rects[:self.size]
+
+    def get_type_id(self, widget_key):
+        """Return type id of widget key, registering it if needed."""
+
+        try:
+            return self.type_id_map[widget_key]
+
+        except KeyError:
+
+            type_id = self.type_id_map[widget_key] = len(self.widget_keys)
+            self.widget_keys.append(widget_key)
+
+            return type_id
+
+    def get_widget_key(self, index):
+        return self.widget_keys[self.columns.type_ids[index]]
+
+    def get_writable_columns(self, first_row, needed_size):
+        """Return columns where rows from first_row on can be written.
+
+        The columns are replaced by a copy if they are too small or if the
+        rows to be written are referenced by snapshots.
+        """
+        columns = self.columns
+
+        if first_row < columns.reserved or needed_size > len(columns):
+
+            capacity = max(len(columns), INITIAL_CAPACITY)
+
+            while capacity < needed_size:
+                capacity *= 2
+
+            new_columns = DocumentColumns(capacity)
+
+            size = self.size
+
+            new_columns.type_ids[:size] = columns.type_ids[:size]
+            new_columns.rects[:size] = columns.rects[:size]
+
+            columns = self.columns = new_columns
+
+        return columns
+
+    def add_widgets(self, widget_keys, rects):
+        """Add widgets with given keys and (x, y, width, height) rects.
+
+        Returns array with the indices of the new widgets.
+        """
+        return self.add_rows(
+            [self.get_type_id(widget_key) for widget_key in widget_keys],
+            rects,
+        )
+
+    def add_rows(self, type_ids, rects):
+        """Add rows with given type ids and rects; return their indices."""
+
+        rects = asarray(rects, dtype=float64).reshape(-1, 4)
+
+        start = self.size
+        end = start + len(rects)
+
+        columns = self.get_writable_columns(start, end)
+
+        columns.type_ids[start:end] = type_ids
+        columns.rects[start:end] = rects
+
+        self.size = end
+
+        return arange(start, end)
+
+    ### snapshots
+
+    def get_snapshot(self):
+        """Return snapshot of the document, in O(1)."""
+
+        columns = self.columns
+        columns.reserved = max(columns.reserved, self.size)
+
+        return columns, self.size
+
+    def restore_snapshot(self, snapshot):
+        """Make document match given snapshot, in O(1)."""
+        self.columns, self.size = snapshot
+
+    ### queries
+
+    def get_counts_by_widget_key(self):
+        """Return dict with number of widgets of each kind."""
+
+        counts = bincount(self.type_ids, minlength=len(self.widget_keys))
+
+        return {
+            widget_key: int(count)
+            for widget_key, count in zip(self.widget_keys, counts)
+            if count
+        }
+
+    def get_bounding_box(self, indices=None):
+        """Return (left, top, right, bottom) box of widgets, if any."""
+
+        rects = self.rects if indices is None else self.rects[indices]
+
+        if not len(rects):
+            return
+
+        return (
+            float(rects[:, X].min()),
+            float(rects[:, Y].min()),
+            float((rects[:, X] + rects[:, WIDTH]).max()),
+            float((rects[:, Y] + rects[:, HEIGHT]).max()),
+        )
+
+    def get_indices_in_rect(self, left, top, right, bottom):
+        """Return array with indices of widgets intersecting given rect."""
+
+        rects = self.rects
+
+        return nonzero(
+            (rects[:, X] < right)
+            & (rects[:, X] + rects[:, WIDTH] > left)
+            & (rects[:, Y] < bottom)
+            & (rects[:, Y] + rects[:, HEIGHT] > top)
+        )[0]
+
+    def get_overlapping_pairs(self):
+        """Return (n, 2) array with pairs of indices of overlapping widgets.
+
+        Widgets are swept from left to right, so each widget is only tested
+        against the widgets starting before it ends horizontally.
+        """
+        rects = self.rects
+
+        order = argsort(rects[:, X], kind='stable')
+        sorted_rects = rects[order]
+
+        lefts = sorted_rects[:, X]
+        rights = lefts + sorted_rects[:, WIDTH]
+        tops = sorted_rects[:, Y]
+        bottoms = tops + sorted_rects[:, HEIGHT]
+
+        ### for each widget, position (in the sorted order) after the last
+        ### widget starting before it ends
+        ends = searchsorted(lefts, rights, side='left')
+
+        pairs = []
+
+        for position, end in enumerate(ends.tolist()):
+
+            start = position + 1
+
+            if start >= end:
+                continue
+
+            candidates = arange(start, end)
+
+            overlapping = candidates[
+                (tops[candidates] < bottoms[position])
+                & (bottoms[candidates] > tops[position])
+            ]
+
+            if len(overlapping):
+
+                pairs.append(
+                    column_stack(
+                        (
+                            full(len(overlapping), order[position]),
+                            order[overlapping],
+                        )
+                    )
+                )
+
+        if not pairs:
+            return empty((0, 2), dtype=int)
+
+        return concatenate(pairs)
+
+    def get_aligned_groups(self, edge='left', tolerance=0.0):
+        """Return lists of indices of widgets aligned on given edge.
+
+        edge is one of the keys in EDGE_GETTERS; coordinates are snapped
+        to multiples of the tolerance (when given) before being compared.
+        Only groups with more than one widget are returned.
+        """
+        coordinates = EDGE_GETTERS[edge](self.rects)
+
+        if tolerance:
+            coordinates = round_array(coordinates / tolerance)
+
+        _, inverse, counts = unique(
+            coordinates,
+            return_inverse=True,
+            return_counts=True,
+        )
+
+        order = argsort(inverse, kind='stable')
+        boundaries = counts.cumsum()[:-1]
+
+        return [
+            group.tolist()
+            for group in split(order, boundaries)
+            if len(group) > 1
+        ]
+
+    ### serialization
+
+    def get_state(self):
+        """Return dict with data of the document (arrays are copies)."""
+
+        return {
+            'widget_keys': list(self.widget_keys),
+            'type_ids': self.type_ids.copy(),
+            'rects': self.rects.copy(),
+        }
+
+    def set_state(self, state, known_widget_keys=None):
+        """Replace contents of document with data from get_state().
+
+        If known_widget_keys is given, the widgets in the state must use
+        only those keys.
+
+        The state is checked before the document is touched, so ValueError
+        is raised and the document is kept as is if the state is invalid.
+        """
+        widget_keys = state['widget_keys']
+        type_ids = asarray(state['type_ids'], dtype=int32)
+
+        if len(type_ids) and (
+            type_ids.min() < 0
+            or type_ids.max() >= len(widget_keys)
+        ):
+            raise ValueError("Type ids out of range of the widget keys")
+
+        if known_widget_keys is not None:
+
+            unknown_keys = {
+                widget_keys[type_id]
+                for type_id in unique(type_ids).tolist()
+            }.difference(known_widget_keys)
+
+            if unknown_keys:
+
+                raise ValueError(
+                    f"Unknown widget key(s): {', '.join(sorted(unknown_keys))}"
+                )
+
+        ### map type ids in the state to the ones in this document
+
+        type_id_map = asarray(
+            [self.get_type_id(widget_key) for widget_key in widget_keys],
+            dtype=int32,
+        )
+
+        self.clear()
+
+        self.add_rows(type_id_map[type_ids], state['rects'])
+
+    def get_records(self):
+        """Return list of (widget_key, (x, y)) records."""
+
+        widget_keys = self.widget_keys
+
+        return [
+            (widget_keys[type_id], (x, y))
+            for type_id, (x, y) in zip(
+                self.type_ids.tolist(),
+                self.rects[:, :2].tolist(),
+            )
+        ]
@@ -0,0 +1,388 @@
+"""Facility for saving/loading canvas documents in a binary format.
+
+Layout of a canvas file (all numbers little-endian):
+
+- header (32 bytes): magic bytes, format version, padding and offset/length
+  of the directory;
+- chunks of rows, each with the rects (float64 x, y, width, height) of its
+  widgets followed by their type ids (int32), aligned to 8 bytes;
+- directory: number of strings and chunks, length of each string, offset
+  and number of rows of each chunk, and the strings (UTF-8 widget keys
+  indexed by the type ids).
+
+Files are loaded by memory-mapping them and viewing the chunks as NumPy
+arrays, so there's no parsing involved.
+
+Saving is incremental: when the file already holds the first rows of the
+document, only the new rows are appended (followed by a new directory),
+and the header is then rewritten to point to the new directory, so until
+that last small write the file keeps pointing to its previous contents.
+Otherwise, the whole file is written to a temporary file which then
+replaces the existing one.
+"""
+
+### standard library imports
+
+import os
+
+from mmap import mmap, ACCESS_READ
+
+from struct import Struct
+
+
+### third-party imports
+
+from numpy import (
+    array,
+    array_equal,
+    concatenate,
+    dtype,
+    empty,
+    float64,
+    frombuffer,
+    int32,
+)
+
+
+### local import
+from .ourstdlibs.atomicfile import atomic_write
+
+
+
+### constants
+
+MAGIC = b'MYAPPCNV'
+
+FORMAT_VERSION = 1
+
+## magic, version, padding, directory offset and directory length
+HEADER_STRUCT = Struct('<8sIIQQ')
+
+## number of strings and number of chunks
+DIRECTORY_STRUCT = Struct('<II')
+
+CHUNK_DTYPE = dtype([('offset', '<u8'), ('no_of_rows', '<u8')])
+
+ALIGNMENT = 8
+
+## number of chunks from which the file is rewritten as a single chunk
+MAX_CHUNKS = 64
+
+RECT_SIZE = 4 * 8
+
+CANVAS_FILE_EXTENSION = '.myappcanvas'
+
+
+
+### functions
+
+def get_padding(offset):
+    return -offset % ALIGNMENT
+
+
+def get_chunk_bytes(type_ids, rects):
+    """Return bytes of chunk with given rows, including padding."""
+
+    data = (
+        rects.astype('<f8', copy=False).tobytes()
+        + type_ids.astype('<i4', copy=False).tobytes()
+    )
+
+    return data + bytes(get_padding(len(data)))
+
+
+def get_directory_bytes(widget_keys, chunks):
+    """Return bytes of directory for given string table and chunks."""
+
+    encoded_keys = [widget_key.encode('utf-8') for widget_key in widget_keys]
+
+    return b''.join(
+        (
+            DIRECTORY_STRUCT.pack(len(encoded_keys), len(chunks)),
+            array([len(key) for key in encoded_keys], dtype='<u4').tobytes(),
+            array(chunks, dtype=CHUNK_DTYPE).tobytes(),
+            *encoded_keys,
+        )
+    )
+
+
+def read_directory(buffer):
+    """Return string table and chunks from canvas file in buffer.
+
+    Chunks are returned as a list of (offset, no_of_rows) tuples.
+    """
+    if len(buffer) < HEADER_STRUCT.size:
+        raise ValueError("File is too small to be a canvas file")
+
+    magic, version, _, directory_offset, directory_length = (
+        HEADER_STRUCT.unpack_from(buffer)
+    )
+
+    if magic != MAGIC:
+        raise ValueError("File is not a canvas file")
+
+    if version > FORMAT_VERSION:
+
+        raise ValueError(
+            f"Canvas file has format version {version}, but only versions"
+            f" up to {FORMAT_VERSION} are supported"
+        )
+
+    if directory_offset + directory_length > len(buffer):
+        raise ValueError("Canvas file is truncated")
+
+    no_of_strings, no_of_chunks = DIRECTORY_STRUCT.unpack_from(
+        buffer,
+        directory_offset,
+    )
+
+    offset = directory_offset + DIRECTORY_STRUCT.size
+
+    string_lengths = frombuffer(
+        buffer,
+        dtype='<u4',
+        count=no_of_strings,
+        offset=offset,
+    ).tolist()
+
+    offset += no_of_strings * 4
+
+    chunks = [
+        (int(chunk_offset), int(no_of_rows))
+        for chunk_offset, no_of_rows in frombuffer(
+            buffer,
+            dtype=CHUNK_DTYPE,
+            count=no_of_chunks,
+            offset=offset,
+        ).tolist()
+    ]
+
+    offset += no_of_chunks * CHUNK_DTYPE.itemsize
+
+    widget_keys = []
+
+    for length in string_lengths:
+
+        widget_keys.append(buffer[offset:offset+length].decode('utf-8'))
+        offset += length
+
+    return widget_keys, chunks
+
+
+def get_chunk_arrays(buffer, chunk):
+    """Return (type_ids, rects) arrays viewing chunk in buffer."""
+
+    offset, no_of_rows = chunk
+
+    rects = frombuffer(
+        buffer,
+        dtype='<f8',
+        count=no_of_rows * 4,
+        offset=offset,
+    ).reshape(-1, 4)
+
+    type_ids = frombuffer(
+        buffer,
+        dtype='<i4',
+        count=no_of_rows,
+        offset=offset + no_of_rows * RECT_SIZE,
+    )
+
+    return type_ids, rects
+
+
+def get_rows(buffer, chunks):
+    """Return (type_ids, rects) arrays with all rows of chunks (copies)."""
+
+    if not chunks:
+        return empty(0, dtype=int32), empty((0, 4), dtype=float64)
+
+    type_ids_list, rects_list = zip(
+        *(get_chunk_arrays(buffer, chunk) for chunk in chunks)
+    )
+
+    return (
+        concatenate(type_ids_list).astype(int32),
+        concatenate(rects_list).astype(float64),
+    )
+
+
+def load_canvas(filepath, document, known_widget_keys=None):
+    """Replace contents of document with the ones of canvas file.
+
+    If known_widget_keys is given, the file must use only those widget
+    keys. ValueError is raised if the file is invalid, in which case the
+    document is kept as is.
+    """
+
+    with open(filepath, 'rb') as f:
+
+        ### an empty file can't be memory-mapped
+
+        if not os.fstat(f.fileno()).st_size:
+            raise ValueError("File is not a canvas file")
+
+        with mmap(f.fileno(), 0, access=ACCESS_READ) as buffer:
+
+            widget_keys, chunks = read_directory(buffer)
+            type_ids, rects = get_rows(buffer, chunks)
+
+    document.set_state(
+        {
+            'widget_keys': widget_keys,
+            'type_ids': type_ids,
+            'rects': rects,
+        },
+        known_widget_keys,
+    )
+
+
+def write_canvas(document, filepath):
+    """Write whole document to canvas file, atomically."""
+
+    chunk_offset = HEADER_STRUCT.size
+    chunk_bytes = get_chunk_bytes(document.type_ids, document.rects)
+
+    chunks = [(chunk_offset, len(document))] if len(document) else []
+
+    directory_offset = chunk_offset + len(chunk_bytes)
+    directory_bytes = get_directory_bytes(document.widget_keys, chunks)
+
+    with atomic_write(filepath) as f:
+
+        f.write(
+            HEADER_STRUCT.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                0,
+                directory_offset,
+                len(directory_bytes),
+            )
+        )
+
+        f.write(chunk_bytes)
+        f.write(directory_bytes)
+
+
+def save_canvas(document, filepath):
+    """Save document in canvas file, incrementally when possible.
+
+    Returns a string indicating what was done: 'unchanged', 'appended' or
+    'written'.
+    """
+    try:
+        saved_data = get_saved_data(filepath)
+
+    except (OSError, ValueError):
+        saved_data = None
+
+    if saved_data is not None:
+
+        saved_keys, chunks, saved_type_ids, saved_rects, file_size = (
+            saved_data
+        )
+
+        no_of_saved_rows = len(saved_type_ids)
+
+        ### the file holds the first rows of the document if its string
+        ### table and rows match the beginning of the document's ones
+
+        if (
+            document.widget_keys[:len(saved_keys)] == saved_keys
+            and len(document) >= no_of_saved_rows
+            and len(chunks) < MAX_CHUNKS
+            and array_equal(
+                document.type_ids[:no_of_saved_rows],
+                saved_type_ids,
+            )
+            and array_equal(document.rects[:no_of_saved_rows], saved_rects)
+        ):
+
+            if (
+                len(document) == no_of_saved_rows
+                and len(document.widget_keys) == len(saved_keys)
+            ):
+                return 'unchanged'
+
+            append_to_canvas(
+                document,
+                filepath,
+                no_of_saved_rows,
+                chunks,
+                file_size,
+            )
+
+            return 'appended'
+
+    write_canvas(document, filepath)
+    return 'written'
+
+
+def get_saved_data(filepath):
+    """Return data of existing canvas file, or None if there's no file."""
+
+    if not os.path.exists(filepath):
+        return
+
+    with open(filepath, 'rb') as f:
+
+        file_size = os.fstat(f.fileno()).st_size
+
+        if not file_size:
+            raise ValueError("File is not a canvas file")
+
+        with mmap(f.fileno(), 0, access=ACCESS_READ) as buffer:
+
+            widget_keys, chunks = read_directory(buffer)
+            type_ids, rects = get_rows(buffer, chunks)
+
+    return widget_keys, chunks, type_ids, rects, file_size
+
+
+def append_to_canvas(document, filepath, no_of_saved_rows, chunks, file_size):
+    """Append new rows of document to canvas file.
+
+    The new rows and directory are written (and flushed to disk) after
+    the existing contents, and only then the header is updated to point to
+    the new directory.
+    """
+    chunk_offset = file_size + get_padding(file_size)
+
+    new_rows = slice(no_of_saved_rows, len(document))
+
+    chunk_bytes = get_chunk_bytes(
+        document.type_ids[new_rows],
+        document.rects[new_rows],
+    )
+
+    if new_rows.stop > new_rows.start:
+        chunks = [*chunks, (chunk_offset, new_rows.stop - new_rows.start)]
+
+    directory_offset = chunk_offset + len(chunk_bytes)
+    directory_bytes = get_directory_bytes(document.widget_keys, chunks)
+
+    with open(filepath, 'r+b') as f:
+
+        f.seek(file_size)
+
+        f.write(bytes(chunk_offset - file_size))
+        f.write(chunk_bytes)
+        f.write(directory_bytes)
+
+        f.flush()
+        os.fsync(f.fileno())
+
+        f.seek(0)
+
+        f.write(
+            HEADER_STRUCT.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                0,
+                directory_offset,
+                len(directory_bytes),
+            )
+        )
+
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,137 @@
+"""Facility with performance profiles for the canvas.
+
+A profile configures how the canvas scene indexes its items, how widgets
+on it are cached, how the view showing it repaints and whether widgets are
+replaced by placeholders when zoomed out far enough for their details not
+to be visible.
+"""
+
+### third-party imports
+
+## PySide6
+
+from PySide6.QtWidgets import (
+    QGraphicsItem,
+    QGraphicsView,
+    QGraphicsProxyWidget,
+)
+
+
+### local imports
+
+from .prefsdata import PREFERENCES, PreferencesKeys
+
+from .widgetitems import (
+    RENDERING_SETTINGS,
+    WIDGET_KEY_DATA,
+    PaintedWidgetItem,
+    update_widget_proxy,
+)
+
+
+
+### constants
+
+## profiles, by name, along with their descriptions
+
+CANVAS_PROFILES = {
+
+    'standard': {
+        'description': "Qt defaults; best for small canvases",
+
+        ## depth of the tree used to index items (0 means automatic)
+        'bsp_tree_depth': 0,
+
+        'item_cache_mode': QGraphicsItem.NoCache,
+
+        'viewport_update_mode': QGraphicsView.MinimalViewportUpdate,
+
+        'cache_background': False,
+
+        'level_of_detail': False,
+    },
+
+    'large_canvas': {
+        'description': (
+            "caches widgets and background and draws placeholders when"
+            " zoomed out; best for canvases with many widgets"
+        ),
+
+        ## fixed depth, so the index isn't rebuilt as widgets are added
+        'bsp_tree_depth': 10,
+
+        'item_cache_mode': QGraphicsItem.DeviceCoordinateCache,
+
+        'viewport_update_mode': QGraphicsView.SmartViewportUpdate,
+
+        'cache_background': True,
+
+        'level_of_detail': True,
+    },
+
+}
+
+
+
+### functions
+
+def get_canvas_profile():
+    """Return canvas profile chosen in the preferences."""
+
+    return CANVAS_PROFILES.get(
+        PREFERENCES[PreferencesKeys.CANVAS_PERFORMANCE_PROFILE.value],
+        CANVAS_PROFILES['standard'],
+    )
+
+
+def apply_canvas_profile(scene, view):
+    """Configure scene, view and widgets on scene with chosen profile."""
+
+    profile = get_canvas_profile()
+
+    RENDERING_SETTINGS['level_of_detail'] = profile['level_of_detail']
+
+    ### scene
+
+    scene.setBspTreeDepth(profile['bsp_tree_depth'])
+
+    for item in scene.items():
+
+        ### proxies of widgets on the canvas are replaced by ones of the
+        ### kind used with the profile (see widgetitems.get_widget_proxy())
+
+        if (
+            isinstance(item, QGraphicsProxyWidget)
+            and item.data(WIDGET_KEY_DATA) is not None
+        ):
+            item = update_widget_proxy(item)
+
+        if isinstance(item, (PaintedWidgetItem, QGraphicsProxyWidget)):
+            item.setCacheMode(profile['item_cache_mode'])
+
+    ### view
+
+    view.setViewportUpdateMode(profile['viewport_update_mode'])
+
+    view.setCacheMode(
+        QGraphicsView.CacheBackground
+        if profile['cache_background']
+        else QGraphicsView.CacheNone
+    )
+
+    view.resetCachedContent()
+    view.viewport().update()
+
+
+def prepare_canvas_widget(item):
+    """Configure widget item about to be added to canvas, per profile.
+
+    Returns the item to add, which is a new one if the item is a proxy of
+    a kind not used with the profile (see apply_canvas_profile()).
+    """
+    if isinstance(item, QGraphicsProxyWidget):
+        item = update_widget_proxy(item)
+
+    item.setCacheMode(get_canvas_profile()['item_cache_mode'])
+
+    return item
@@ -1,4 +1,8 @@
-"""Facility with canvas to add and organize widgets."""
+"""Facility with canvas to add and organize widgets.
+
+The widgets on the canvas are stored in a document model (see the
+canvasdocument module); the items in the scene are just views of it.
+"""
 
 ### standard library import
 from collections import deque
@@ -10,29 +14,51 @@ from collections import deque
 
 from PySide6.QtWidgets import QGraphicsScene, QMenu
 
-from PySide6.QtGui import QBrush, QPen, QPainterPath, QCursor
+from PySide6.QtGui import QBrush, QPen, QCursor
 
 from PySide6.QtCore import Qt, QPoint
 
 
 ### local imports
 
-from .strokesmgmt.utils import get_stroke_matches_data
+from .prefsdata import PREFERENCES, PreferencesKeys
+
+from .strokesmgmt.recognition import RecognitionService
+
+from .strokesmgmt.strokesbuffer import StrokesBuffer
+
+from .strokesmgmt.liveink import LiveStrokeItem
+
+from .canvasdocument import CanvasDocument
+
+from .canvasfile import load_canvas, save_canvas
 
-from .widgets import (
-    get_label,
-    get_unchecked_check_box,
-    get_checked_check_box,
+from .widgets import WIDGET_FACTORIES, get_widget_size
+
+from .widgetitems import (
+    WIDGET_KEY_DATA,
+    PaintedWidgetItem,
+    get_widget_proxy,
 )
 
+from .canvasprofiles import prepare_canvas_widget
+
+
 
 
 ### constants/module level objs
 
 SIZE = (1280, 720)
 
-STROKES = deque()
-STROKE_PATH_PROXIES = []
+STROKES = StrokesBuffer()
+STROKE_ITEMS = []
+
+## number of items from which they are added with the scene index and the
+## repainting of views suspended
+BULK_INSERTION_THRESHOLD = 64
+
+## maximum number of changes that can be undone
+MAX_UNDO_SNAPSHOTS = 100
 
 
 
@@ -62,6 +88,25 @@ class CanvasScene(QGraphicsScene):
         self.last_point = None
         self.watch_out_for_shift_release = False
 
+        ### matches strokes in the background (including speculatively,
+        ### as they are finished)
+
+        self.recognition_service = RecognitionService(self)
+
+        self.recognition_service.matches_ready.connect(
+            self.insert_matching_widget
+        )
+
+        ### widgets on the canvas, along with snapshots of it to undo
+        ### changes
+
+        self.document = CanvasDocument()
+        self.undo_snapshots = deque(maxlen=MAX_UNDO_SNAPSHOTS)
+
+        ### virtualizes the widgets on the canvas, when enabled (set by the
+        ### main window, since it needs the view)
+        self.virtualizer = None
+
     def mouseMoveEvent(self, event):
 
         ### leave right away if either...
@@ -90,21 +135,32 @@ class CanvasScene(QGraphicsScene):
 
         if last_point is None:
 
-            ### create a path and its QGraphics proxy to represent the stroke
+            ### since there's a new stroke, any speculative matching of
+            ### previous strokes is useless, as is any result from a
+            ### previous drawing not delivered yet
+            self.recognition_service.cancel()
 
-            path = self.path = QPainterPath()
-            self.path_proxy = self.addPath(path, self.strokes_pen)
+            ### create item to represent the stroke, starting at the current
+            ### point, and store such point as last one
 
-            ### move path to current point and store such point as last one
+            self.stroke_item = LiveStrokeItem(self.strokes_pen, point)
+            self.addItem(self.stroke_item)
 
-            path.moveTo(*coords)
             self.last_point = point
 
-            ### store coordinates in new list within STROKES
-            STROKES.append([coords])
+            ### start new stroke in STROKES with the coordinates; the
+            ### stroke is simplified as its points are added, within the
+            ### tolerance set in the preferences
+
+            STROKES.add_stroke(
+                *coords,
+                PREFERENCES[
+                    PreferencesKeys.STROKE_SIMPLIFICATION_TOLERANCE.value
+                ],
+            )
 
-            ### store path proxy
-            STROKE_PATH_PROXIES.append(self.path_proxy)
+            ### store stroke item
+            STROKE_ITEMS.append(self.stroke_item)
 
             ### then leave
             return
@@ -114,20 +170,26 @@ class CanvasScene(QGraphicsScene):
             return
 
 
-        ### otherwise, draw a line on our board and update its
-        ### QGraphics proxy
+        ### otherwise, draw a line on our board by appending a segment to
+        ### the stroke item (only the area of the segment is repainted)
 
-        self.path.lineTo(point.x(), point.y())
-        self.path_proxy.setPath(self.path)
+        self.stroke_item.add_point(point)
 
         ### store coordinates
-        STROKES[-1].append(coords)
+        STROKES.add_point(*coords)
 
         ### reference current point as last one
         self.last_point = point
 
 
     def mouseReleaseEvent(self, event):
+
+        ### if a stroke was just finished, it may be the last one, so we
+        ### start matching the strokes drawn so far in the background
+
+        if self.last_point is not None:
+            self.recognition_service.speculate(STROKES.get_view())
+
         self.last_point = None
 
     def keyReleaseEvent(self, event):
@@ -142,22 +204,24 @@ class CanvasScene(QGraphicsScene):
 
     def process_strokes(self):
 
-        ### remove path proxies
+        ### remove stroke items
 
-        for item in STROKE_PATH_PROXIES:
+        for item in STROKE_ITEMS:
             self.removeItem(item)
 
-        STROKE_PATH_PROXIES.clear()
+        STROKE_ITEMS.clear()
 
-        del self.path, self.path_proxy
+        del self.stroke_item
 
-        ### check list of strokes for matches
+        ### check strokes for matches in the background (handing over a
+        ### view of them, since the buffer is cleared right away); the result
+        ### is delivered to insert_matching_widget()
 
-        match_data = get_stroke_matches_data(STROKES)
+        self.recognition_service.submit(STROKES.get_view())
 
         STROKES.clear()
 
-        ###
+    def insert_matching_widget(self, match_data, context):
 
         menu_items = match_data['menu_items']
         chosen_widget_key = match_data['chosen_widget_key']
@@ -213,16 +277,12 @@ class CanvasScene(QGraphicsScene):
         ### get position for widget
 
         union_of_strokes = match_data['union_of_strokes']
-        xs, ys = zip(*union_of_strokes)
 
-        left = min(xs)
-        right = max(xs)
+        left, top = union_of_strokes.min(axis=0).tolist()
+        right, bottom = union_of_strokes.max(axis=0).tolist()
 
         width = right - left
 
-        top = min(ys)
-        bottom = max(ys)
-
         height = top - bottom
 
         x = left + width/2
@@ -237,18 +297,211 @@ class CanvasScene(QGraphicsScene):
         y -= height
         ###
 
-        if chosen_widget_key == 'label':
+        self.insert_widgets([(chosen_widget_key, (x, y))])
+
+    def get_widget_item(self, widget_key):
+        """Return new item representing widget with given key.
+
+        The item is either one painting the widget (replaced by the actual
+        widget once the user interacts with it) or a proxy of the widget
+        itself, depending on the preferences.
+        """
+        if PREFERENCES[PreferencesKeys.PAINT_CANVAS_WIDGETS.value]:
+            widget_item = PaintedWidgetItem(widget_key)
+
+        else:
+            widget_item = get_widget_proxy(widget_key)
+
+        return prepare_canvas_widget(widget_item)
+
+    def insert_widgets(self, widget_records):
+        """Add widgets to the canvas; return their items.
+
+        widget_records is an iterable of (widget_key, (x, y)) records.
+
+        When the canvas is virtualized, items are only created later, for
+        the widgets near the visible area, so no item is returned.
+        """
+
+        ### get keys and rects beforehand, so a record with an unknown widget
+        ### key doesn't leave the canvas half-populated
+
+        widget_keys = []
+        rects = []
+
+        for widget_key, (x, y) in widget_records:
+
+            widget_keys.append(widget_key)
+            rects.append((x, y, *get_widget_size(widget_key)))
+
+        if not widget_keys:
+            return []
+
+        self.save_undo_snapshot()
+
+        indices = self.document.add_widgets(widget_keys, rects)
+
+        if self.is_virtualized():
+
+            self.virtualizer.sync()
+            return []
+
+        return self.add_widget_items(indices.tolist())
+
+    def add_widget_items(self, indices):
+        """Create and add items for widgets in document; return them.
+
+        When there are many items, they are added with the scene index and
+        the repainting of views suspended; the index is then rebuilt and
+        views repainted only once, instead of once per widget.
+        """
+        document = self.document
+        rects = document.rects
+
+        widget_items = []
+
+        for index in indices:
+
+            widget_item = self.get_widget_item(document.get_widget_key(index))
+            widget_item.setPos(*rects[index, :2].tolist())
+
+            widget_items.append(widget_item)
+
+        if len(widget_items) < BULK_INSERTION_THRESHOLD:
+
+            for widget_item in widget_items:
+                self.addItem(widget_item)
+
+            return widget_items
+
+        ### suspend indexing and repainting of views
+
+        index_method = self.itemIndexMethod()
+        bsp_tree_depth = self.bspTreeDepth()
+
+        self.setItemIndexMethod(QGraphicsScene.NoIndex)
+
+        viewports = [view.viewport() for view in self.views()]
+
+        for viewport in viewports:
+            viewport.setUpdatesEnabled(False)
+
+        ### add items in a single pass
+
+        try:
+
+            for widget_item in widget_items:
+                self.addItem(widget_item)
+
+        ### rebuild index (restoring its depth, since changing the index
+        ### method discards it) and repaint once
+
+        finally:
+
+            self.setItemIndexMethod(index_method)
+            self.setBspTreeDepth(bsp_tree_depth)
+
+            for viewport in viewports:
+
+                viewport.setUpdatesEnabled(True)
+                viewport.update()
+
+        return widget_items
+
+    def is_virtualized(self):
+        return self.virtualizer is not None and self.virtualizer.enabled
+
+    def get_widget_items(self):
+        """Return items in the scene representing widgets."""
+
+        return [
+            item
+            for item in self.items()
+            if item.data(WIDGET_KEY_DATA) is not None
+        ]
+
+    def rebuild_widget_items(self):
+        """Make items in the scene match the document again."""
+
+        if self.is_virtualized():
+            self.virtualizer.reset()
+
+        else:
+
+            for item in self.get_widget_items():
+                self.removeItem(item)
+
+            self.add_widget_items(range(len(self.document)))
+
+    def save_undo_snapshot(self):
+        self.undo_snapshots.append(self.document.get_snapshot())
+
+    def undo(self):
+        """Undo last change to the widgets on the canvas."""
+
+        if not self.undo_snapshots:
+
+            self.show_message_on_status_bar("Nothing to undo", 2500)
+            return
+
+        self.document.restore_snapshot(self.undo_snapshots.pop())
+        self.rebuild_widget_items()
+
+    def open_canvas(self, filepath):
+        """Replace widgets on the canvas by the ones in canvas file."""
+
+        self.save_undo_snapshot()
+
+        try:
+            load_canvas(filepath, self.document, WIDGET_FACTORIES)
+
+        except Exception as err:
+
+            self.undo_snapshots.pop()
+
+            self.show_message_on_status_bar(
+                f"Failed to open canvas: {err}",
+                5000,
+            )
+
+            return False
+
+        self.rebuild_widget_items()
+
+        return True
+
+    def save_canvas(self, filepath):
+        """Save widgets on the canvas in canvas file."""
+
+        try:
+            outcome = save_canvas(self.document, filepath)
+
+        except Exception as err:
+
+            self.show_message_on_status_bar(
+                f"Failed to save canvas: {err}",
+                5000,
+            )
+
+            return False
+
+        self.show_message_on_status_bar(
+            (
+                "No changes to save"
+                if outcome == 'unchanged'
+                else f"Saved canvas ({len(self.document)} widgets)"
+            ),
+            2500,
+        )
+
+        return True
 
-            # using get_label for the sake of conformity here,
-            # since we could just use QGraphicsScene.addText()
-            # instead
-            get_widget = get_label
+    def clear_canvas(self):
+        """Remove all widgets and strokes from the canvas."""
 
-        elif chosen_widget_key == 'unchecked_check_box':
-            get_widget = get_unchecked_check_box
+        self.save_undo_snapshot()
 
-        elif chosen_widget_key == 'checked_check_box':
-            get_widget = get_checked_check_box
+        self.document.clear()
+        self.rebuild_widget_items()
 
-        widget_proxy = self.addWidget(get_widget())
-        widget_proxy.setPos(x, y)
+        self.clear()
@@ -0,0 +1,75 @@
+"""Facility with view showing the canvas.
+
+The view can be zoomed in and out by turning the mouse wheel while holding
+the Ctrl key, which, among other things, allows seeing the widgets drawn
+as placeholders when zoomed out far enough (see the canvas profiles).
+"""
+
+### third-party imports
+
+## PySide6
+
+from PySide6.QtWidgets import QGraphicsView
+
+from PySide6.QtCore import Qt, Signal
+
+
+
+### constants
+
+## factor by which the view is scaled per step of the mouse wheel
+ZOOM_FACTOR = 1.15
+
+## minimum and maximum scales of the view
+MIN_SCALE = 0.05
+MAX_SCALE = 4.0
+
+## angle delta of a single step of the mouse wheel, in eighths of a degree
+WHEEL_STEP = 120
+
+
+
+### class definition
+
+class CanvasView(QGraphicsView):
+    """View of the canvas which can be zoomed with Ctrl + mouse wheel."""
+
+    ## emitted with the new scale whenever the view is zoomed
+    zoomed = Signal(float)
+
+    def __init__(self, scene):
+
+        super().__init__(scene)
+
+        ### zoom around the point under the mouse
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+
+    def wheelEvent(self, event):
+
+        if not event.modifiers() & Qt.ControlModifier:
+
+            super().wheelEvent(event)
+            return
+
+        steps = event.angleDelta().y() / WHEEL_STEP
+
+        if steps:
+            self.set_scale(self.get_scale() * ZOOM_FACTOR ** steps)
+
+        event.accept()
+
+    def get_scale(self):
+        return self.transform().m11()
+
+    def set_scale(self, scale):
+        """Zoom view to given scale, kept within the allowed ones."""
+
+        scale = min(max(scale, MIN_SCALE), MAX_SCALE)
+
+        factor = scale / self.get_scale()
+
+        if factor == 1:
+            return
+
+        self.scale(factor, factor)
+        self.zoomed.emit(scale)
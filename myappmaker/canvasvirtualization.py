@@ -0,0 +1,229 @@
+"""Facility for virtualizing the widgets on the canvas.
+
+When the canvas is virtualized, only the widgets in the document of the
+canvas intersecting the visible area of the view (plus a margin) exist as
+graphics items. Items are created as the view scrolls/resizes and
+recycled when they leave such area, so memory and frame time depend on
+what is visible rather than on the size of the whole document.
+"""
+
+### standard library import
+from collections import defaultdict
+
+
+### third-party imports
+
+## PySide6
+
+from PySide6.QtCore import QObject, QEvent, QRectF, QTimer
+
+
+### local imports
+
+from .widgetitems import PaintedWidgetItem
+
+from .canvasprofiles import prepare_canvas_widget
+
+
+
+### constants
+
+## margin around the visible area of the view within which items are kept
+MARGIN = 200
+
+## maximum number of unused items kept for reuse, per widget key
+MAX_POOLED_ITEMS = 256
+
+
+
+### class definition
+
+class CanvasVirtualizer(QObject):
+    """Keeps items only for records near the visible area of the view."""
+
+    def __init__(self, scene, view):
+
+        super().__init__()
+
+        self.scene = scene
+        self.view = view
+
+        self.document = scene.document
+
+        self.enabled = False
+
+        ### items existing for widgets in the document, by index
+        self.live_items = {}
+
+        ### unused items, by widget key
+        self.pooled_items = defaultdict(list)
+
+        ### refresh the items whenever the visible area may have changed;
+        ### requests are coalesced, so the items are refreshed only once per
+        ### pass of the event loop
+
+        self.refresh_pending = False
+
+        for scroll_bar in (
+            view.horizontalScrollBar(),
+            view.verticalScrollBar(),
+        ):
+            scroll_bar.valueChanged.connect(self.schedule_refresh)
+            scroll_bar.rangeChanged.connect(self.schedule_refresh)
+
+        view.viewport().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+
+        if event.type() == QEvent.Resize:
+            self.schedule_refresh()
+
+        return False
+
+    def set_enabled(self, enabled):
+        """Virtualize the widgets on the canvas, or stop doing so."""
+
+        if enabled == self.enabled:
+            return
+
+        scene = self.scene
+
+        if enabled:
+
+            for item in scene.get_widget_items():
+                scene.removeItem(item)
+
+            self.enabled = True
+            self.sync()
+
+        else:
+
+            self.recycle_live_items()
+            self.pooled_items.clear()
+
+            self.enabled = False
+
+            scene.add_widget_items(range(len(self.document)))
+
+    def sync(self):
+        """Update scene rect and items after the document changed."""
+
+        ### grow scene so the view can scroll to all the widgets
+
+        bounding_box = self.document.get_bounding_box()
+
+        if bounding_box is not None:
+
+            left, top, right, bottom = bounding_box
+
+            self.scene.setSceneRect(
+                self.scene.sceneRect().united(
+                    QRectF(left, top, right - left, bottom - top)
+                )
+            )
+
+        self.schedule_refresh()
+
+    def reset(self):
+        """Recreate all items, since the document was replaced/restored."""
+
+        self.recycle_live_items()
+        self.sync()
+
+    def recycle_live_items(self):
+
+        for index in list(self.live_items):
+            self.recycle_item(index)
+
+    def recycle_item(self, index):
+        """Remove item of widget at index from scene, pooling it if possible.
+
+        Only items painting widgets are pooled, since proxies hold actual
+        widgets the user may have changed, which must not show up in place
+        of other widgets. If a painted item was materialized, its proxy is
+        discarded and the painted item itself is pooled again.
+        """
+        item = self.live_items.pop(index)
+        self.scene.removeItem(self.get_current_item(item))
+
+        if not isinstance(item, PaintedWidgetItem):
+            return
+
+        item.replaced_by = None
+
+        pool = self.pooled_items[item.widget_key]
+
+        if len(pool) < MAX_POOLED_ITEMS:
+            pool.append(item)
+
+    def get_current_item(self, item):
+        """Return item, or item replacing it, if it was materialized."""
+
+        while getattr(item, 'replaced_by', None) is not None:
+            item = item.replaced_by
+
+        return item
+
+    def schedule_refresh(self, *args):
+
+        if self.enabled and not self.refresh_pending:
+
+            self.refresh_pending = True
+            QTimer.singleShot(0, self.refresh)
+
+    def refresh(self):
+        """Create/recycle items so they match the records near the view."""
+
+        self.refresh_pending = False
+
+        if not self.enabled:
+            return
+
+        scene = self.scene
+        view = self.view
+        document = self.document
+
+        live_items = self.live_items
+        pooled_items = self.pooled_items
+
+        ### indices of widgets intersecting the visible area plus the margin
+
+        visible_rect = (
+            view.mapToScene(view.viewport().rect())
+            .boundingRect()
+            .adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN)
+        )
+
+        wanted_indices = set(
+            document.get_indices_in_rect(
+                *visible_rect.getCoords()
+            ).tolist()
+        )
+
+        ### recycle items of widgets no longer wanted
+
+        for index in live_items.keys() - wanted_indices:
+            self.recycle_item(index)
+
+        ### create (or reuse) items for widgets now wanted
+
+        rects = document.rects
+
+        for index in wanted_indices - live_items.keys():
+
+            widget_key = document.get_widget_key(index)
+            pool = pooled_items[widget_key]
+
+            if pool:
+
+                ### the canvas profile may have changed since the item was
+                ### pooled
+                item = prepare_canvas_widget(pool.pop())
+
+            else:
+                item = scene.get_widget_item(widget_key)
+
+            item.setPos(*rects[index, :2].tolist())
+            scene.addItem(item)
+
+            live_items[index] = item
@@ -34,3 +34,13 @@ STROKES_DATA_DIR = WRITEABLE_DIR / 'strokes_data'
 
 if not STROKES_DATA_DIR.exists():
     STROKES_DATA_DIR.mkdir()
+
+### filepath for the library with the strokes of all widgets
+STROKES_LIBRARY_FILEPATH = STROKES_DATA_DIR / 'strokes.library'
+
+### directory for the memory-mapped files holding the templates used to
+### recognize drawings
+TEMPLATE_STORE_DIR = WRITEABLE_DIR / 'template_store'
+
+### filepath for the cache of the features computed for each template
+FEATURE_CACHE_FILEPATH = WRITEABLE_DIR / 'template_features.cache'
@@ -6,7 +6,7 @@ from PySide6.QtWidgets import (
     QMainWindow,
     QToolBar,
     QStatusBar,
-    QGraphicsView,
+    QFileDialog,
 )
 
 from PySide6.QtGui import QAction, QKeySequence, QShortcut
@@ -20,10 +20,33 @@ from .appinfo import APP_TITLE, ORG_DIR_NAME, APP_DIR_NAME
 
 from .canvasscene import CanvasScene
 
+from .canvasview import CanvasView
+
+from .canvasfile import CANVAS_FILE_EXTENSION
+
 from .strokesmgmt.recordingdialog import StrokeRecordingDialog
 
+from .strokesmgmt.featurecache import get_feature_cache_report
+
 from .prefsmgmt import PreferencesDialog
 
+from .canvasprofiles import apply_canvas_profile
+
+from .canvasvirtualization import CanvasVirtualizer
+
+from .prefsdata import (
+    PREFERENCES,
+    PreferencesKeys,
+    add_preference_listener,
+    prepare_preferences,
+)
+
+
+
+### constant
+
+CANVAS_FILE_FILTER = f"Canvas files (*{CANVAS_FILE_EXTENSION})"
+
 
 
 class MainWindow(QMainWindow):
@@ -39,6 +62,10 @@ class MainWindow(QMainWindow):
         qs = self.quit_shortcut = QShortcut(QKeySequence(Qt.Key_Escape), self)
         qs.activated.connect(app.quit, Qt.QueuedConnection)
 
+        ### load the saved preferences before creating anything which
+        ### depends on them
+        prepare_preferences()
+
         ###
         status_bar = QStatusBar(self)
         self.setStatusBar(status_bar)
@@ -47,25 +74,97 @@ class MainWindow(QMainWindow):
         ###
 
         scene = self.scene = CanvasScene(self, status_bar.showMessage)
-        view = self.view = QGraphicsView(scene)
+        view = self.view = CanvasView(scene)
 
         self.setCentralWidget(view)
 
+        scene.virtualizer = CanvasVirtualizer(scene, view)
+
+        ### zooming out shows more of the canvas
+        view.zoomed.connect(scene.virtualizer.schedule_refresh)
+
+        ### apply the (already loaded) preferences affecting the canvas and
+        ### keep the canvas up to date with them
+
+        for key, callback in (
+
+            (
+                PreferencesKeys.CANVAS_PERFORMANCE_PROFILE.value,
+                lambda name: apply_canvas_profile(scene, view),
+            ),
+
+            (
+                PreferencesKeys.VIRTUALIZE_CANVAS.value,
+                scene.virtualizer.set_enabled,
+            ),
+
+        ):
+
+            callback(PREFERENCES[key])
+            add_preference_listener(key, callback)
+
+        us = self.undo_shortcut = QShortcut(QKeySequence.Undo, self)
+        us.activated.connect(scene.undo)
+
+        ### path of the canvas file being edited, if any
+        self.canvas_filepath = None
+
         ###
         self.stroke_recording_dlg = StrokeRecordingDialog(self)
         self.preferences_dlg = PreferencesDialog(self)
 
+        ### the dialog registered the templates of all widgets, so report
+        ### how many of them reused cached features
+        status_bar.showMessage(get_feature_cache_report())
+
         ###
 
         toolbar = QToolBar("My main toolbar")
         self.addToolBar(toolbar)
 
         for text, operation in (
+            ("Open canvas", self.open_canvas),
+            ("Save canvas", self.save_canvas),
             ("Preferences", self.preferences_dlg.exec),
             ("(Re)define strokes", self.stroke_recording_dlg.exec),
-            ("Clear canvas", self.scene.clear),
+            ("Clear canvas", self.scene.clear_canvas),
+            ("Undo", self.scene.undo),
         ):
 
             btn = QAction(text, self)
             btn.triggered.connect(operation)
             toolbar.addAction(btn)
+
+    def open_canvas(self):
+
+        filepath, _ = QFileDialog.getOpenFileName(
+            self,
+            "Open canvas",
+            '',
+            CANVAS_FILE_FILTER,
+        )
+
+        if filepath and self.scene.open_canvas(filepath):
+            self.canvas_filepath = filepath
+
+    def save_canvas(self):
+
+        filepath = self.canvas_filepath
+
+        if filepath is None:
+
+            filepath, _ = QFileDialog.getSaveFileName(
+                self,
+                "Save canvas",
+                '',
+                CANVAS_FILE_FILTER,
+            )
+
+            if not filepath:
+                return
+
+            if not filepath.endswith(CANVAS_FILE_EXTENSION):
+                filepath += CANVAS_FILE_EXTENSION
+
+        if self.scene.save_canvas(filepath):
+            self.canvas_filepath = filepath
@@ -0,0 +1,48 @@
+"""Facility for writing files atomically."""
+
+### standard library imports
+
+import os
+
+from contextlib import contextmanager
+
+from tempfile import NamedTemporaryFile
+
+
+
+@contextmanager
+def atomic_write(filepath, mode='wb', **kwargs):
+    """Yield file object whose contents replace the file when done.
+
+    Contents are written to a temporary file in the same directory, which
+    is flushed to disk and then renamed over the file in filepath, so the
+    file is either left untouched (if an error occurs) or fully replaced.
+    """
+    filepath = os.fspath(filepath)
+
+    f = NamedTemporaryFile(
+        mode,
+        dir=os.path.dirname(os.path.abspath(filepath)),
+        prefix=f'.{os.path.basename(filepath)}.',
+        suffix='.tmp',
+        delete=False,
+        **kwargs,
+    )
+
+    try:
+
+        with f:
+
+            yield f
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(f.name, filepath)
+
+    except BaseException:
+
+        try: os.remove(f.name)
+        except OSError: pass
+
+        raise
@@ -7,6 +7,10 @@ from ast import literal_eval
 from pprint import pformat
 
 
+### local import
+from .atomicfile import atomic_write
+
+
 
 def load_pyl(filepath):
     """Return python literal from file in filepath."""
@@ -30,10 +34,16 @@ def save_pyl(
     indent=2,
     width=80,
     compact=False,
+    atomic=False,
 ):
-    """Save pretty-formatted python literal in filepath."""
+    """Save pretty-formatted python literal in filepath.
+
+    If atomic is True, the file is written via a temporary file which then
+    replaces it, so it is never left half-written.
+    """
+    opener = atomic_write if atomic else open
 
-    with open(str(filepath), mode="w", encoding="utf-8") as f:
+    with opener(str(filepath), mode="w", encoding="utf-8") as f:
 
         try:
 
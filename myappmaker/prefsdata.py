@@ -0,0 +1,257 @@
+"""Facility for preferences data.
+
+Kept apart from the preferences dialog, so the preferences can be used
+without importing/creating Qt widgets (for instance, when recognizing
+drawings in headless benchmarks).
+
+Preferences changed via set_preference() take effect at once, but are
+only saved once changes stop for a moment (so dragging a slider doesn't
+rewrite the file on every tick), in a background thread and atomically.
+Callbacks can be registered to be notified whenever a specific
+preference changes, including when preferences are loaded from file.
+"""
+
+### standard library imports
+
+from collections import defaultdict
+
+from concurrent.futures import ThreadPoolExecutor
+
+from enum import Enum, unique
+
+
+### third-party import
+from PySide6.QtCore import QCoreApplication, QTimer
+
+
+### local imports
+
+from .config import PREFERENCES_FILEPATH
+
+from .ourstdlibs.pyl import load_pyl, save_pyl
+
+
+
+### module-level objects/constants
+
+@unique
+class PreferencesKeys(Enum):
+    SHOW_WIDGET_MENU_AFTER_DRAWING = 'show_widget_menu_after_drawing'
+    RATIO_LOG_DIFF_TOLERANCE = 'ratio_log_diff_tolerance'
+    MAXIMUM_TOLERABLE_HAUSDORFF_DISTANCE = (
+        'maximum_tolerable_hausdorff_distance'
+    )
+    RESAMPLING_POINTS_PER_STROKE = 'resampling_points_per_stroke'
+    MATCHING_PROCESSES = 'matching_processes'
+    STROKE_SIMPLIFICATION_TOLERANCE = 'stroke_simplification_tolerance'
+    PAINT_CANVAS_WIDGETS = 'paint_canvas_widgets'
+    CANVAS_PERFORMANCE_PROFILE = 'canvas_performance_profile'
+    VIRTUALIZE_CANVAS = 'virtualize_canvas'
+
+DEFAULT_PREFERENCES = {
+    PreferencesKeys.SHOW_WIDGET_MENU_AFTER_DRAWING.value: True,
+    PreferencesKeys.RATIO_LOG_DIFF_TOLERANCE.value: 0.6,
+    PreferencesKeys.MAXIMUM_TOLERABLE_HAUSDORFF_DISTANCE.value: 60,
+    PreferencesKeys.RESAMPLING_POINTS_PER_STROKE.value: 0,
+    PreferencesKeys.MATCHING_PROCESSES.value: 0,
+    PreferencesKeys.STROKE_SIMPLIFICATION_TOLERANCE.value: 0,
+    PreferencesKeys.PAINT_CANVAS_WIDGETS.value: True,
+    PreferencesKeys.CANVAS_PERFORMANCE_PROFILE.value: 'standard',
+    PreferencesKeys.VIRTUALIZE_CANVAS.value: False,
+}
+
+PREFERENCES = DEFAULT_PREFERENCES.copy()
+
+## minimum number of points strokes can be resampled to (with fewer points
+## distances between drawings stop telling them apart)
+MINIMUM_POINTS_PER_STROKE = 8
+
+## time in milliseconds to wait for further changes before saving
+SAVE_DELAY = 500
+
+## keys of preferences changed since the preferences were last saved
+DIRTY_KEYS = set()
+
+## callbacks to be notified of changes, by key of preference
+PREFERENCE_LISTENERS = defaultdict(list)
+
+## timer delaying saves, along with the thread in which preferences are
+## saved and the last save requested
+
+SAVING_STATE = {
+    'timer': None,
+    'executor': None,
+    'future': None,
+}
+
+
+
+### functions
+
+def validate_preferences(preferences):
+
+    for key, default_value in DEFAULT_PREFERENCES.items():
+
+        value_type = type(default_value)
+
+        if (
+            key in preferences
+            and value_type != type(preferences[key])
+        ):
+
+            raise TypeError(
+                f"If the '{key!r}' key is present in preferences,"
+                f" it must of {value_type} type"
+            )
+
+def prepare_preferences():
+    """Load preferences from file (creating it if it doesn't exist).
+
+    Listeners of preferences whose values changed by loading them are
+    notified.
+    """
+    ### if the preferences file doesn't exist, create it
+
+    if (
+        not PREFERENCES_FILEPATH.is_file()
+        and not PREFERENCES_FILEPATH.exists()
+    ):
+
+        try: save_pyl(PREFERENCES, PREFERENCES_FILEPATH, atomic=True)
+        except Exception as err:
+            print(f"Failed to create preferences file: {err}")
+
+    ### load preferences
+
+    else:
+
+        try: prefs = load_pyl(PREFERENCES_FILEPATH)
+
+        except Exception as err:
+
+            print(
+                "Preferences couldn't be loaded (using defaults instead):"
+                f" {err}"
+            )
+
+        else:
+
+            try: validate_preferences(prefs)
+
+            except Exception as err:
+
+                print(
+                    "Loaded preferences didn't validate"
+                    f" (using defaults instead): {err}"
+                )
+
+            else:
+                update_preferences(prefs)
+
+
+def update_preferences(prefs):
+    """Update preferences with loaded ones, notifying listeners."""
+
+    changed_keys = [
+        key
+        for key, value in prefs.items()
+        if PREFERENCES.get(key) != value
+    ]
+
+    PREFERENCES.update(prefs)
+
+    for key in changed_keys:
+
+        for callback in PREFERENCE_LISTENERS[key]:
+            callback(PREFERENCES[key])
+
+
+def add_preference_listener(key, callback):
+    """Call callback with the new value whenever preference changes."""
+    PREFERENCE_LISTENERS[key].append(callback)
+
+
+def set_preference(key, value):
+    """Change preference, notify listeners and schedule saving it.
+
+    Nothing happens if the preference already has the given value.
+    """
+    if PREFERENCES[key] == value:
+        return
+
+    PREFERENCES[key] = value
+    DIRTY_KEYS.add(key)
+
+    for callback in PREFERENCE_LISTENERS[key]:
+        callback(value)
+
+    schedule_preferences_save()
+
+
+def schedule_preferences_save():
+    """Save preferences once changes stop for SAVE_DELAY milliseconds.
+
+    Without an application (and thus an event loop), they are saved at
+    once.
+    """
+    if QCoreApplication.instance() is None:
+
+        flush_preferences()
+        return
+
+    timer = SAVING_STATE['timer']
+
+    if timer is None:
+
+        timer = SAVING_STATE['timer'] = QTimer()
+
+        timer.setSingleShot(True)
+        timer.setInterval(SAVE_DELAY)
+        timer.timeout.connect(flush_preferences)
+
+    ### (re)starting the timer postpones the save
+    timer.start()
+
+
+def flush_preferences(wait=False):
+    """Save changed preferences now, in a background thread.
+
+    If wait is True, returns only when the preferences are saved.
+    """
+    timer = SAVING_STATE['timer']
+
+    if timer is not None:
+        timer.stop()
+
+    if DIRTY_KEYS:
+
+        DIRTY_KEYS.clear()
+
+        executor = SAVING_STATE['executor']
+
+        if executor is None:
+            executor = SAVING_STATE['executor'] = ThreadPoolExecutor(1)
+
+        ### a copy is saved, so preferences can keep changing meanwhile
+
+        future = SAVING_STATE['future'] = executor.submit(
+            save_pyl,
+            PREFERENCES.copy(),
+            PREFERENCES_FILEPATH,
+            atomic=True,
+        )
+
+        future.add_done_callback(report_saving_error)
+
+    future = SAVING_STATE['future']
+
+    if wait and future is not None:
+        future.exception()
+
+
+def report_saving_error(future):
+
+    err = future.exception()
+
+    if err is not None:
+        print(f"Failed to save preferences: {err}")
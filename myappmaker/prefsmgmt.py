@@ -2,7 +2,7 @@
 
 ### standard library imports
 
-from enum import Enum, unique
+import os
 
 from functools import partial
 
@@ -18,6 +18,7 @@ from PySide6.QtWidgets import (
     QPushButton,
     QCheckBox,
     QSlider,
+    QComboBox,
 
 )
 
@@ -26,34 +27,28 @@ from PySide6.QtCore import Qt
 
 ### local imports
 
-from .config import PREFERENCES_FILEPATH
+from .prefsdata import (
+    PreferencesKeys,
+    DEFAULT_PREFERENCES,
+    PREFERENCES,
+    MINIMUM_POINTS_PER_STROKE,
+    set_preference,
+    flush_preferences,
+)
 
-from .ourstdlibs.pyl import load_pyl, save_pyl
+from .canvasprofiles import CANVAS_PROFILES
 
 
 
 ### module-level objects/constants
 
-@unique
-class PreferencesKeys(Enum):
-    SHOW_WIDGET_MENU_AFTER_DRAWING = 'show_widget_menu_after_drawing'
-    RATIO_LOG_DIFF_TOLERANCE = 'ratio_log_diff_tolerance'
-    MAXIMUM_TOLERABLE_HAUSDORFF_DISTANCE = (
-        'maximum_tolerable_hausdorff_distance'
-    )
-
-DEFAULT_PREFERENCES = {
-    PreferencesKeys.SHOW_WIDGET_MENU_AFTER_DRAWING.value: True,
-    PreferencesKeys.RATIO_LOG_DIFF_TOLERANCE.value: 0.6,
-    PreferencesKeys.MAXIMUM_TOLERABLE_HAUSDORFF_DISTANCE.value: 60,
-}
-
-PREFERENCES = DEFAULT_PREFERENCES.copy()
-
 BOLD_TEXT_CSS = 'font-weight: bold;'
 
 format_ratio_log_diff = "{:.2f}".format
 
+def format_number_or_off(value):
+    return str(value) if value else 'off'
+
 
 
 ### dialog definition
@@ -71,9 +66,6 @@ class PreferencesDialog(QDialog):
         self.widget_setter = {}
         self.slider_label_map = {}
 
-        ###
-        prepare_preferences()
-
         ###
 
         grid = self.grid = QGridLayout()
@@ -198,6 +190,204 @@ class PreferencesDialog(QDialog):
         grid.addWidget(distance_sld, row, 1, widget_alignment)
         grid.addWidget(sld_label, row, 2, widget_alignment)
 
+        ## RESAMPLING_POINTS_PER_STROKE
+
+        row += 1
+
+        key = PreferencesKeys.RESAMPLING_POINTS_PER_STROKE.value
+
+        lbl = QLabel("Resample strokes to (points)")
+
+        lbl.setToolTip(
+            "Number of equidistant points each stroke is resampled to"
+            " before comparing drawings (default: off); makes comparison"
+            " cost independent of how slowly the strokes were drawn"
+        )
+
+        grid.addWidget(lbl, row, 0, label_alignment)
+
+        resampling_sld = QSlider(Qt.Orientation.Horizontal)
+
+        ### the lowest position of the slider (below the minimum number of
+        ### points) means "off"
+
+        resampling_sld.setRange(MINIMUM_POINTS_PER_STROKE - 1, 128)
+        resampling_sld.setSingleStep(1)
+        value = PREFERENCES[key]
+        resampling_sld.setValue(value)
+        resampling_sld.valueChanged.connect(
+            self.update_resampling_points_per_stroke_value
+        )
+
+        self.widget_map[key] = resampling_sld
+        self.widget_setter[key] = resampling_sld.setValue
+
+        sld_label = QLabel(format_number_or_off(value))
+        self.slider_label_map[key] = sld_label
+
+        grid.addWidget(resampling_sld, row, 1, widget_alignment)
+        grid.addWidget(sld_label, row, 2, widget_alignment)
+
+        ## MATCHING_PROCESSES
+
+        row += 1
+
+        key = PreferencesKeys.MATCHING_PROCESSES.value
+
+        lbl = QLabel("Worker processes for matching")
+
+        lbl.setToolTip(
+            "Number of worker processes among which drawings are compared"
+            " when there are many of them (default: off, that is, drawings"
+            " are compared in the app's own process)"
+        )
+
+        grid.addWidget(lbl, row, 0, label_alignment)
+
+        processes_sld = QSlider(Qt.Orientation.Horizontal)
+
+        processes_sld.setRange(0, os.cpu_count() or 1)
+        processes_sld.setSingleStep(1)
+        value = PREFERENCES[key]
+        processes_sld.setValue(value)
+        processes_sld.valueChanged.connect(
+            self.update_matching_processes_value
+        )
+
+        self.widget_map[key] = processes_sld
+        self.widget_setter[key] = processes_sld.setValue
+
+        sld_label = QLabel(format_number_or_off(value))
+        self.slider_label_map[key] = sld_label
+
+        grid.addWidget(processes_sld, row, 1, widget_alignment)
+        grid.addWidget(sld_label, row, 2, widget_alignment)
+
+        ## STROKE_SIMPLIFICATION_TOLERANCE
+
+        row += 1
+
+        key = PreferencesKeys.STROKE_SIMPLIFICATION_TOLERANCE.value
+
+        lbl = QLabel("Simplify strokes within (pixels)")
+
+        lbl.setToolTip(
+            "Maximum distance between the strokes drawn and their"
+            " simplified versions, which keep only the points needed to"
+            " represent them (default: off); simplified strokes take less"
+            " memory/disk space and are compared faster, but are told"
+            " apart less accurately"
+        )
+
+        grid.addWidget(lbl, row, 0, label_alignment)
+
+        simplification_sld = QSlider(Qt.Orientation.Horizontal)
+
+        simplification_sld.setRange(0, 10)
+        simplification_sld.setSingleStep(1)
+        value = PREFERENCES[key]
+        simplification_sld.setValue(value)
+        simplification_sld.valueChanged.connect(
+            self.update_stroke_simplification_tolerance_value
+        )
+
+        self.widget_map[key] = simplification_sld
+        self.widget_setter[key] = simplification_sld.setValue
+
+        sld_label = QLabel(format_number_or_off(value))
+        self.slider_label_map[key] = sld_label
+
+        grid.addWidget(simplification_sld, row, 1, widget_alignment)
+        grid.addWidget(sld_label, row, 2, widget_alignment)
+
+        ## PAINT_CANVAS_WIDGETS
+
+        row += 1
+
+        key = PreferencesKeys.PAINT_CANVAS_WIDGETS.value
+
+        btn = get_button_like_label("Paint widgets on canvas")
+
+        btn.setToolTip(
+            "When enabled (default): widgets added to the canvas are just"
+            " painted (which takes much less memory and time), until you"
+            " click them, at which point they become actual widgets"
+        )
+
+        btn.clicked.connect(partial(self.toggle_preference, key))
+        grid.addWidget(btn, row, 0, label_alignment)
+
+        check = QCheckBox()
+        check.setChecked(PREFERENCES[key])
+
+        self.widget_map[key] = check
+        self.widget_setter[key] = check.setChecked
+
+        check.checkStateChanged.connect(self.update_paint_canvas_widgets)
+
+        grid.addWidget(check, row, 1, widget_alignment)
+
+        ## CANVAS_PERFORMANCE_PROFILE
+
+        row += 1
+
+        key = PreferencesKeys.CANVAS_PERFORMANCE_PROFILE.value
+
+        label = QLabel("Canvas performance profile")
+
+        label.setToolTip(
+            "Set of rendering/caching settings used by the canvas;"
+            " \"large_canvas\" helps keeping the canvas responsive when it"
+            " has many widgets"
+        )
+
+        grid.addWidget(label, row, 0, label_alignment)
+
+        combo = QComboBox()
+
+        for index, (name, profile) in enumerate(CANVAS_PROFILES.items()):
+
+            combo.addItem(name)
+            combo.setItemData(index, profile['description'], Qt.ToolTipRole)
+
+        combo.setCurrentText(PREFERENCES[key])
+
+        self.widget_map[key] = combo
+        self.widget_setter[key] = combo.setCurrentText
+
+        combo.currentTextChanged.connect(
+            self.update_canvas_performance_profile
+        )
+
+        grid.addWidget(combo, row, 1, widget_alignment)
+
+        ## VIRTUALIZE_CANVAS
+
+        row += 1
+
+        key = PreferencesKeys.VIRTUALIZE_CANVAS.value
+
+        btn = get_button_like_label("Virtualize canvas")
+
+        btn.setToolTip(
+            "When enabled: only widgets near the visible area of the canvas"
+            " are kept as items, so canvases with many screens' worth of"
+            " widgets remain light and responsive"
+        )
+
+        btn.clicked.connect(partial(self.toggle_preference, key))
+        grid.addWidget(btn, row, 0, label_alignment)
+
+        check = QCheckBox()
+        check.setChecked(PREFERENCES[key])
+
+        self.widget_map[key] = check
+        self.widget_setter[key] = check.setChecked
+
+        check.checkStateChanged.connect(self.update_virtualize_canvas)
+
+        grid.addWidget(check, row, 1, widget_alignment)
+
         ### Close/Set Default buttons
 
         row += 1
@@ -234,13 +424,40 @@ class PreferencesDialog(QDialog):
                 "Checkbox shouldn't have a state other than Checked/Unchecked"
             )
 
-        PREFERENCES[
-            PreferencesKeys.SHOW_WIDGET_MENU_AFTER_DRAWING.value
-        ] = value
+        set_preference(
+            PreferencesKeys.SHOW_WIDGET_MENU_AFTER_DRAWING.value,
+            value,
+        )
+
+    def update_paint_canvas_widgets(self, state):
+
+        if self.restoring_defaults:
+            return
+
+        set_preference(
+            PreferencesKeys.PAINT_CANVAS_WIDGETS.value,
+            state == Qt.CheckState.Checked,
+        )
+
+    def update_virtualize_canvas(self, state):
+
+        if self.restoring_defaults:
+            return
 
-        try: save_pyl(PREFERENCES, PREFERENCES_FILEPATH)
-        except Exception as err:
-            print(f"Failed to save preferences: {err}")
+        set_preference(
+            PreferencesKeys.VIRTUALIZE_CANVAS.value,
+            state == Qt.CheckState.Checked,
+        )
+
+    def update_canvas_performance_profile(self, name):
+
+        if self.restoring_defaults:
+            return
+
+        set_preference(
+            PreferencesKeys.CANVAS_PERFORMANCE_PROFILE.value,
+            name,
+        )
 
     def toggle_preference(self, key):
 
@@ -265,11 +482,7 @@ class PreferencesDialog(QDialog):
         if self.restoring_defaults:
             return
 
-        PREFERENCES[key] = value
-
-        try: save_pyl(PREFERENCES, PREFERENCES_FILEPATH)
-        except Exception as err:
-            print(f"Failed to save preferences: {err}")
+        set_preference(key, value)
 
     def update_maximum_tolerable_hausdorff_distance_value(self, value):
 
@@ -279,11 +492,40 @@ class PreferencesDialog(QDialog):
         if self.restoring_defaults:
             return
 
-        PREFERENCES[key] = value
+        set_preference(key, value)
+
+    def update_resampling_points_per_stroke_value(self, value):
+
+        if value < MINIMUM_POINTS_PER_STROKE:
+            value = 0
+
+        key = PreferencesKeys.RESAMPLING_POINTS_PER_STROKE.value
+        self.slider_label_map[key].setText(format_number_or_off(value))
+
+        if self.restoring_defaults:
+            return
+
+        set_preference(key, value)
+
+    def update_matching_processes_value(self, value):
+
+        key = PreferencesKeys.MATCHING_PROCESSES.value
+        self.slider_label_map[key].setText(format_number_or_off(value))
+
+        if self.restoring_defaults:
+            return
+
+        set_preference(key, value)
+
+    def update_stroke_simplification_tolerance_value(self, value):
 
-        try: save_pyl(PREFERENCES, PREFERENCES_FILEPATH)
-        except Exception as err:
-            print(f"Failed to save preferences: {err}")
+        key = PreferencesKeys.STROKE_SIMPLIFICATION_TOLERANCE.value
+        self.slider_label_map[key].setText(format_number_or_off(value))
+
+        if self.restoring_defaults:
+            return
+
+        set_preference(key, value)
 
     def restore_defaults(self):
 
@@ -291,33 +533,19 @@ class PreferencesDialog(QDialog):
 
         for key, value in DEFAULT_PREFERENCES.items():
 
-            PREFERENCES[key] = value
+            set_preference(key, value)
             self.widget_setter[key](value)
 
-        try: save_pyl(PREFERENCES, PREFERENCES_FILEPATH)
-        except Exception as err:
-            print(f"Failed to save preferences: {err}")
-
         self.restoring_defaults = False
 
+    def done(self, result):
+        """Save pending changes to preferences when the dialog closes."""
 
-### helper functions
-
-def validate_preferences(preferences):
-
-    for key, default_value in DEFAULT_PREFERENCES.items():
+        flush_preferences()
+        super().done(result)
 
-        value_type = type(default_value)
 
-        if (
-            key in preferences
-            and value_type != type(preferences[key])
-        ):
-
-            raise TypeError(
-                f"If the '{key!r}' key is present in preferences,"
-                f" it must of {value_type} type"
-            )
+### helper functions
 
 def get_button_like_label(text):
 
@@ -339,43 +567,3 @@ def get_button_like_label(text):
     """)
 
     return btn
-
-def prepare_preferences():
-
-    ### if the preferences file doesn't exist, create it
-
-    if (
-        not PREFERENCES_FILEPATH.is_file()
-        and not PREFERENCES_FILEPATH.exists()
-    ):
-
-        try: save_pyl(PREFERENCES, PREFERENCES_FILEPATH)
-        except Exception as err:
-            print(f"Failed to create preferences file: {err}")
-
-    ### load preferences
-
-    else:
-
-        try: prefs = load_pyl(PREFERENCES_FILEPATH)
-
-        except Exception as err:
-
-            print(
-                "Preferences couldn't be loaded (using defaults instead):"
-                f" {err}"
-            )
-
-        else:
-
-            try: validate_preferences(prefs)
-
-            except Exception as err:
-
-                print(
-                    "Loaded preferences didn't validate"
-                    f" (using defaults instead): {err}"
-                )
-
-            else:
-                PREFERENCES.update(prefs)
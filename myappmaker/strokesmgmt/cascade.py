@@ -0,0 +1,433 @@
+"""Facility for cheap rejection tests applied before Hausdorff scoring.
+
+Candidates go through a cascade of increasingly expensive tests (stages),
+each one rejecting templates that can't (or very likely can't) be within
+the tolerable Hausdorff distance of the drawing. Only the survivors reach
+the full distance computation.
+
+Stages, in the order they are applied:
+
+- stroke count: only templates with the drawing's number of strokes are
+  candidates to begin with (done when looking candidates up);
+- ratio index: only templates whose union of strokes has a width:height
+  ratio similar to the drawing's are kept (done with a sorted index, when
+  filtering is needed);
+- ratios: width:height ratios of the union and of each stroke must be
+  similar (the filter recognition always relied on, so it is always
+  applied);
+- bounding box: the sides of the bounding box of the union can't be
+  farther apart than the cutoff distance;
+- centroid and lengths (lossy, disabled by default): centroid of the
+  strokes can't be farther than the cutoff distance and the length of
+  each stroke must be similar;
+- coarse Hausdorff: the Hausdorff distance between decimated versions of
+  the strokes, minus the error introduced by the decimation, can't be
+  larger than the cutoff distance.
+
+The bounding box sides and the coarse Hausdorff distance are actual lower
+bounds of the Hausdorff distance, so those tests never reject a template
+that would be within the cutoff distance. The centroid and lengths tests
+aren't, so they may reject templates the full distance would accept
+(which changes the matches found), and are only applied when enabled
+explicitly.
+"""
+
+### standard library import
+from math import log
+
+
+### third-party imports
+
+from numpy import (
+    abs as numpy_abs,
+    arange,
+    argsort,
+    concatenate,
+    diff,
+    hypot,
+    linspace,
+    log1p,
+    maximum,
+    sqrt,
+)
+
+
+### local imports
+
+from .hausdorff import (
+    get_squared_distances,
+    get_pairwise_symmetric_hausdorff_distances,
+    take_templates,
+)
+
+
+
+### constants
+
+## maximum difference between the logs of the lengths of strokes (the log
+## of 2 means a stroke can be up to twice as long/short as the other)
+LENGTH_LOG_DIFF_TOLERANCE = log(2)
+
+## maximum number of points kept in each stroke when decimating it
+COARSE_POINTS_PER_STROKE = 8
+
+## stages always applied, before the optional ones
+MANDATORY_STAGES = ('ratios',)
+
+## names of all available optional stages, in the order they are applied
+
+STAGES = (
+    'bounding_box',
+    'centroid_and_lengths',
+    'coarse_hausdorff',
+)
+
+## stages whose tests aren't lower bounds of the Hausdorff distance, so
+## they may reject templates within the cutoff distance
+LOSSY_STAGES = ('centroid_and_lengths',)
+
+## stages currently enabled (by default, only the lossless ones)
+
+ENABLED_STAGES = [
+    stage_name
+    for stage_name in STAGES
+    if stage_name not in LOSSY_STAGES
+]
+
+## stages cheap enough to be used to order candidates even when no
+## filtering is needed
+CHEAP_STAGES = ('ratios', 'bounding_box', 'centroid_and_lengths')
+
+## hit/rejection counters for each stage, including the stroke count one,
+## the lookup in the ratio index and the final full distance computation;
+##
+## hits are the number of candidates that reached the stage; rejections are
+## the number of candidates discarded by it (in the full distance stage,
+## every candidate but the chosen one counts as rejected)
+
+CASCADE_STATS = {
+
+    stage_name: {'hits': 0, 'rejections': 0}
+
+    for stage_name in (
+        'stroke_count',
+        'ratio_index',
+        *MANDATORY_STAGES,
+        *STAGES,
+        'full_hausdorff',
+    )
+
+}
+
+
+
+### functions
+
+def set_enabled_stages(stage_names):
+    """Enable given stages (in the order they are always applied)."""
+
+    unknown_names = set(stage_names).difference(STAGES)
+
+    if unknown_names:
+
+        raise ValueError(
+            f"Unknown prefilter stage(s): {', '.join(sorted(unknown_names))}"
+        )
+
+    ENABLED_STAGES[:] = [
+        stage_name
+        for stage_name in STAGES
+        if stage_name in stage_names
+    ]
+
+
+def get_cascade_stats():
+    """Return copy of counters of each stage."""
+
+    return {
+        stage_name: counters.copy()
+        for stage_name, counters in CASCADE_STATS.items()
+    }
+
+
+def reset_cascade_stats():
+
+    for counters in CASCADE_STATS.values():
+        counters['hits'] = counters['rejections'] = 0
+
+
+def record_stage(stage_name, hits, rejections):
+
+    counters = CASCADE_STATS[stage_name]
+
+    counters['hits'] += hits
+    counters['rejections'] += rejections
+
+
+def get_cascade_features(strokes, offset_union_array):
+    """Return tuple with features of strokes used by the cascade stages.
+
+    Parameters
+    ==========
+    strokes (list of lists of points)
+        strokes whose features will be returned.
+    offset_union_array (numpy array of shape (n, 2))
+        points of all strokes, offset so the first one is at the origin.
+
+    The features are, in this order:
+
+    - bounding box of the union (left, top, right, bottom);
+    - centroid of the strokes, weighted by the length of their segments;
+    - log of (1 plus) the length of each stroke;
+    - decimated version of the union;
+    - the decimation error, that is, the directed Hausdorff distance from
+      the union to its decimated version.
+    """
+    ### bounding box
+
+    lefttop = offset_union_array.min(axis=0)
+    rightbottom = offset_union_array.max(axis=0)
+
+    bounding_box = concatenate((lefttop, rightbottom))
+
+    ### offset points of each stroke
+
+    end = 0
+    stroke_arrays = []
+
+    for points in strokes:
+
+        start, end = end, end + len(points)
+        stroke_arrays.append(offset_union_array[start:end])
+
+    ### lengths of segments of each stroke, along with their midpoints
+
+    segments_lengths = [
+        hypot(*diff(stroke_array, axis=0).T)
+        for stroke_array in stroke_arrays
+    ]
+
+    segments_midpoints = [
+        (stroke_array[1:] + stroke_array[:-1]) / 2
+        for stroke_array in stroke_arrays
+    ]
+
+    lengths = [
+        stroke_segments_lengths.sum()
+        for stroke_segments_lengths in segments_lengths
+    ]
+
+    ### centroid (weighted by segment lengths, so it doesn't depend on how
+    ### densely the strokes were sampled)
+
+    total_length = sum(lengths)
+
+    if total_length:
+
+        centroid = (
+            (
+                concatenate(segments_midpoints)
+                * concatenate(segments_lengths)[:, None]
+            ).sum(axis=0)
+            / total_length
+        )
+
+    else:
+        centroid = offset_union_array.mean(axis=0)
+
+    ### decimated union (evenly spaced points from each stroke, including
+    ### their first and last ones)
+
+    decimated_array = concatenate(
+        [
+
+            stroke_array[
+                linspace(
+                    0,
+                    len(stroke_array) - 1,
+                    min(len(stroke_array), COARSE_POINTS_PER_STROKE),
+                ).round().astype(int)
+            ]
+
+            for stroke_array in stroke_arrays
+
+        ]
+    )
+
+    decimation_error = float(
+        sqrt(
+            get_squared_distances(offset_union_array, decimated_array)
+            .min(axis=1)
+            .max()
+        )
+    )
+
+    ###
+
+    return (
+        bounding_box,
+        centroid,
+        log1p(lengths),
+        decimated_array,
+        decimation_error,
+    )
+
+
+def filter_candidates(
+    drawing_data,
+    batch,
+    ratio_tolerance,
+    cutoff,
+    indices=None,
+    cheap_only=False,
+    record=True,
+):
+    """Return (survivors, rejected) indices of templates in batch.
+
+    If indices are given, only the corresponding templates are considered,
+    otherwise all templates in batch are.
+
+    Survivors are ordered from most to least promising, according to the
+    scores of the last stage applied (or in their original order, if no
+    stage was applied); rejected indices are in the order they were
+    rejected.
+
+    When cheap_only is True, only cheap stages are applied. When record
+    is False, the stages aren't recorded in CASCADE_STATS (for instance,
+    when stages are only used to order candidates which are all scored
+    anyway).
+    """
+    if indices is None:
+        indices = arange(len(batch['widget_keys']))
+
+    rejected = []
+    scores = None
+
+    for stage_name in (*MANDATORY_STAGES, *ENABLED_STAGES):
+
+        if not len(indices):
+            break
+
+        if cheap_only and stage_name not in CHEAP_STAGES:
+            continue
+
+        ### apply stage, obtaining a mask telling which indices survived it
+        ### and scores (lower is better) used to order the survivors
+
+        mask, scores = STAGE_OPERATIONS[stage_name](
+            drawing_data,
+            batch,
+            indices,
+            ratio_tolerance,
+            cutoff,
+        )
+
+        if record:
+            record_stage(stage_name, len(indices), int((~mask).sum()))
+
+        rejected.append(indices[~mask])
+
+        indices = indices[mask]
+        scores = scores[mask]
+
+    if scores is not None:
+        indices = indices[argsort(scores, kind='stable')]
+
+    return indices, concatenate([arange(0), *rejected])
+
+
+### stages
+
+def check_ratios(
+    drawing_data,
+    batch,
+    indices,
+    ratio_tolerance,
+    cutoff,
+):
+
+    ratio_log_diffs = (
+        numpy_abs(batch['ratios_logs'][indices] - drawing_data['ratios_logs'])
+    )
+
+    mask = (ratio_log_diffs <= ratio_tolerance).all(axis=1)
+
+    return mask, ratio_log_diffs.sum(axis=1)
+
+
+def check_bounding_box(
+    drawing_data,
+    batch,
+    indices,
+    ratio_tolerance,
+    cutoff,
+):
+
+    max_sides_diffs = numpy_abs(
+        batch['bounding_boxes'][indices] - drawing_data['bounding_box']
+    ).max(axis=1)
+
+    return max_sides_diffs <= cutoff, max_sides_diffs
+
+
+def check_centroid_and_lengths(
+    drawing_data,
+    batch,
+    indices,
+    ratio_tolerance,
+    cutoff,
+):
+
+    centroid_distances = hypot(
+        *(batch['centroids'][indices] - drawing_data['centroid']).T
+    )
+
+    length_log_diffs = numpy_abs(
+        batch['lengths_logs'][indices] - drawing_data['lengths_logs']
+    )
+
+    mask = (
+        (centroid_distances <= cutoff)
+        & (length_log_diffs <= LENGTH_LOG_DIFF_TOLERANCE).all(axis=1)
+    )
+
+    return mask, centroid_distances
+
+
+def check_coarse_hausdorff(
+    drawing_data,
+    batch,
+    indices,
+    ratio_tolerance,
+    cutoff,
+):
+
+    points, offsets = take_templates(
+        batch['decimated_points'],
+        batch['decimated_offsets'],
+        indices,
+    )
+
+    coarse_distances = get_pairwise_symmetric_hausdorff_distances(
+        drawing_data['decimated_array'],
+        points,
+        offsets,
+    )
+
+    ### the coarse distance can exceed the actual distance by at most the
+    ### largest decimation error between the drawing and the template
+
+    lower_bounds = coarse_distances - maximum(
+        batch['decimation_errors'][indices],
+        drawing_data['decimation_error'],
+    )
+
+    return lower_bounds <= cutoff, lower_bounds
+
+
+STAGE_OPERATIONS = {
+    'ratios': check_ratios,
+    'bounding_box': check_bounding_box,
+    'centroid_and_lengths': check_centroid_and_lengths,
+    'coarse_hausdorff': check_coarse_hausdorff,
+}
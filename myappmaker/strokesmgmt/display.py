@@ -1,8 +1,6 @@
 
 ### standard library imports
 
-from shutil import rmtree
-
 from collections import deque
 
 from itertools import repeat
@@ -27,14 +25,12 @@ from PySide6.QtGui import QPainter, QPixmap, QPen, QBrush
 
 ### local imports
 
-from ..config import STROKES_DATA_DIR
-
-from ..ourstdlibs.pyl import load_pyl, save_pyl
-
 from .getnotfoundsvg import get_not_found_icon_svg_text
 
 from .utils import update_strokes_map
 
+from .strokeslibrary import get_strokes_library, set_widget_strokes
+
 from .constants import (
     STROKE_SIZE,
     STROKE_DIMENSION,
@@ -129,24 +125,10 @@ class StrokesDisplay(QWidget):
 
         self.widget_key = widget_key
 
-        self.strokes_dir = strokes_dir = (
-            STROKES_DATA_DIR / f'{widget_key}_strokes_dir'
-        )
-
-        if strokes_dir.exists():
-
-            pyls = (
-                sorted(
-                    str(path)
-                    for path in strokes_dir.glob('*.pyl')
-                )
-            )
-
-            if pyls:
-                self.init_strokes_display(pyls)
+        strokes = get_strokes_library().get(widget_key)
 
-            else:
-                self.init_empty_display()
+        if strokes:
+            self.init_strokes_display(strokes)
 
         else:
             self.init_empty_display()
@@ -165,9 +147,8 @@ class StrokesDisplay(QWidget):
         layout.addWidget(self.label)
         self.setLayout(layout)
 
-    def init_strokes_display(self, stroke_paths):
+    def init_strokes_display(self, strokes):
 
-        strokes = list(map(load_pyl, stroke_paths))
         update_strokes_map(self.widget_key, strokes)
 
         self.label.setPixmap(self.get_new_pixmap(strokes))
@@ -180,23 +161,11 @@ class StrokesDisplay(QWidget):
 
         update_strokes_map(self.widget_key, strokes)
 
-        ###
-
-        strokes_dir = self.strokes_dir
-
-        if strokes_dir.exists():
-            rmtree(str(strokes_dir))
-
-        strokes_dir.mkdir()
-
-        ###
-
-        for index, points in enumerate(strokes):
-
-            save_pyl(
-                points,
-                (strokes_dir / f'stroke_{index:>02}.pyl'),
-            )
+        ### the library file is saved in the background, if the strokes
+        ### changed, along with the features computed for them
+        try: set_widget_strokes(self.widget_key, strokes)
+        except Exception as err:
+            print(f"Failed to save strokes: {err}")
 
         self.label.setPixmap(self.get_new_pixmap(strokes))
 
@@ -0,0 +1,448 @@
+"""Facility for caching the features of templates on disk.
+
+Computing the features of a template (ratios logs, offset union and the
+features used by the prefilter cascade) for every widget on every launch
+is wasteful, since drawings rarely change. Features are thus cached in a
+file, keyed by a hash of the strokes they were computed from and of the
+normalization settings, so only templates whose strokes changed are
+computed again.
+
+The whole cache is discarded when the version of the feature pipeline
+changes (see FEATURE_PIPELINE_VERSION).
+
+Layout of a cache file (all numbers little-endian):
+
+- header (24 bytes): magic bytes, format version, pipeline version and
+  number of entries;
+- key of each entry (16 bytes each);
+- number of strokes, points and decimated points of each entry (uint32);
+- ratios logs, offset unions, bounding boxes, centroids, lengths logs,
+  decimated unions and decimation errors of all entries (float64).
+"""
+
+### standard library imports
+
+from collections import OrderedDict
+
+from hashlib import blake2b
+
+from struct import Struct
+
+
+### third-party imports
+
+from numpy import (
+    array as numpy_array,
+    concatenate,
+    cumsum,
+    empty,
+    float32,
+    float64,
+    frombuffer,
+    int64,
+)
+
+
+### local imports
+
+from ..config import FEATURE_CACHE_FILEPATH
+
+from ..ourstdlibs.atomicfile import atomic_write
+
+
+
+### constants
+
+MAGIC = b'MYAPPFTC'
+
+FORMAT_VERSION = 1
+
+## version of the computation of template features; must be increased
+## whenever utils.get_template_features() (or any function it relies on)
+## produces different features, so cached ones aren't reused
+FEATURE_PIPELINE_VERSION = 1
+
+## magic, format version, pipeline version and number of entries
+HEADER_STRUCT = Struct('<8sIII')
+
+KEY_SIZE = 16
+
+## maximum number of entries kept in the file (the least recently used
+## ones are dropped first)
+MAX_CACHE_ENTRIES = 20000
+
+
+
+### module level objs
+
+## features of templates by key, from least to most recently used
+FEATURE_CACHE = OrderedDict()
+
+## whether the cache file was loaded, whether cached features changed
+## since, and the file used (headless tools may point it elsewhere)
+
+FEATURE_CACHE_STATE = {
+    'loaded': False,
+    'dirty': False,
+    'filepath': FEATURE_CACHE_FILEPATH,
+}
+
+FEATURE_CACHE_STATS = {
+    'hits': 0,
+    'misses': 0,
+}
+
+
+
+### functions
+
+def get_features_key(strokes, points_per_stroke):
+    """Return key of features of given strokes view.
+
+    The number of points each stroke is resampled to is included, since it
+    changes the features.
+
+    Points are hashed with the precision they are stored with in the strokes
+    library (float32), so strokes just drawn and the same strokes reloaded
+    from the library have the same key.
+    """
+    hash_obj = blake2b(digest_size=KEY_SIZE)
+
+    hash_obj.update(int64(points_per_stroke).tobytes())
+    hash_obj.update(numpy_array(strokes.starts, dtype=int64).tobytes())
+    hash_obj.update(numpy_array(strokes.union_array, dtype=float32).tobytes())
+
+    return hash_obj.digest()
+
+
+def get_cached_features(key):
+    """Return cached features with given key, or None if there's none.
+
+    The cache is loaded the first time it is needed.
+    """
+    if not FEATURE_CACHE_STATE['loaded']:
+        load_feature_cache()
+
+    features = FEATURE_CACHE.get(key)
+
+    if features is None:
+        FEATURE_CACHE_STATS['misses'] += 1
+
+    else:
+
+        FEATURE_CACHE_STATS['hits'] += 1
+        FEATURE_CACHE.move_to_end(key)
+
+    return features
+
+
+def cache_features(key, features):
+
+    FEATURE_CACHE[key] = features
+    FEATURE_CACHE_STATE['dirty'] = True
+
+
+def get_feature_cache_stats():
+    """Return copy of hit/miss counters."""
+    return FEATURE_CACHE_STATS.copy()
+
+
+def reset_feature_cache_stats():
+    FEATURE_CACHE_STATS['hits'] = FEATURE_CACHE_STATS['misses'] = 0
+
+
+def get_feature_cache_report():
+    """Return text reporting how many templates used cached features."""
+
+    return (
+        "Template features: {hits} loaded from cache, {misses} computed"
+        .format_map(FEATURE_CACHE_STATS)
+    )
+
+
+def set_feature_cache_filepath(filepath):
+    """Use given cache file from now on, discarding cached features."""
+
+    FEATURE_CACHE.clear()
+
+    FEATURE_CACHE_STATE['loaded'] = FEATURE_CACHE_STATE['dirty'] = False
+    FEATURE_CACHE_STATE['filepath'] = filepath
+
+
+def load_feature_cache(filepath=None):
+    """Load features cached in file, if it exists and is usable.
+
+    If no file is given, the current cache file is used.
+    """
+    if filepath is None:
+        filepath = FEATURE_CACHE_STATE['filepath']
+
+    FEATURE_CACHE_STATE['loaded'] = True
+
+    try:
+
+        with open(filepath, 'rb') as f:
+            data = f.read()
+
+        entries = get_entries_from_bytes(data)
+
+    except FileNotFoundError:
+        return
+
+    except (OSError, ValueError) as err:
+
+        print(f"Failed to load feature cache: {err}")
+        return
+
+    ### entries are placed before ones cached in the meantime, which were
+    ### used more recently
+
+    cached_entries = list(FEATURE_CACHE.items())
+
+    FEATURE_CACHE.clear()
+    FEATURE_CACHE.update(entries)
+    FEATURE_CACHE.update(cached_entries)
+
+
+def save_feature_cache(lock, filepath=None):
+    """Save cached features in file, atomically, if they changed.
+
+    Since saving may happen in a background thread, the given lock must be
+    the one held while features are cached (utils.MATCHING_LOCK); it is
+    held while the cache is copied or released, but not while writing.
+
+    Cached features are then released from memory, since the templates
+    using them are backed by the template store once it is published; the
+    file is loaded again if features are needed afterwards. Features
+    cached while the file was written are kept until the next save.
+
+    If no file is given, the current cache file is used.
+    """
+    if filepath is None:
+        filepath = FEATURE_CACHE_STATE['filepath']
+
+    with lock:
+
+        if FEATURE_CACHE_STATE['dirty']:
+
+            while len(FEATURE_CACHE) > MAX_CACHE_ENTRIES:
+                FEATURE_CACHE.popitem(last=False)
+
+            cache = FEATURE_CACHE.copy()
+            FEATURE_CACHE_STATE['dirty'] = False
+
+        else:
+            cache = None
+
+    if cache is not None:
+
+        try:
+
+            with atomic_write(filepath) as f:
+                f.write(get_cache_bytes(cache))
+
+        except BaseException:
+
+            with lock:
+                FEATURE_CACHE_STATE['dirty'] = True
+
+            raise
+
+    with lock:
+
+        if not FEATURE_CACHE_STATE['dirty']:
+
+            FEATURE_CACHE.clear()
+            FEATURE_CACHE_STATE['loaded'] = False
+
+
+def get_cache_bytes(cache):
+    """Return bytes of cache file for given dict of features."""
+
+    keys = list(cache)
+    entries = list(cache.values())
+
+    if entries:
+
+        ratios_logs, unions, cascade_features = zip(*entries)
+
+        (
+            bounding_boxes,
+            centroids,
+            lengths_logs,
+            decimated_arrays,
+            decimation_errors,
+        ) = zip(*cascade_features)
+
+        counts = numpy_array(
+            [
+                (len(lengths), len(union), len(decimated_array))
+                for lengths, union, decimated_array in zip(
+                    lengths_logs,
+                    unions,
+                    decimated_arrays,
+                )
+            ],
+            dtype='<u4',
+        )
+
+        floats = concatenate(
+            [
+                numpy_array(values, dtype=float64).reshape(-1)
+                for values in (
+                    concatenate(ratios_logs),
+                    concatenate(unions),
+                    bounding_boxes,
+                    centroids,
+                    concatenate(lengths_logs),
+                    concatenate(decimated_arrays),
+                    decimation_errors,
+                )
+            ]
+        )
+
+    else:
+
+        counts = empty((0, 3), dtype='<u4')
+        floats = empty(0)
+
+    ### counts are stored column by column
+
+    return b''.join(
+        (
+            HEADER_STRUCT.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                FEATURE_PIPELINE_VERSION,
+                len(keys),
+            ),
+            *keys,
+            counts.T.tobytes(),
+            floats.astype('<f8').tobytes(),
+        )
+    )
+
+
+def get_entries_from_bytes(data):
+    """Return list of (key, features) entries from cache bytes.
+
+    Entries computed by a different version of the feature pipeline are
+    discarded, so an empty list is returned for them.
+    """
+    if len(data) < HEADER_STRUCT.size:
+        raise ValueError("File is too small to be a feature cache")
+
+    magic, version, pipeline_version, no_of_entries = (
+        HEADER_STRUCT.unpack_from(data)
+    )
+
+    if magic != MAGIC:
+        raise ValueError("File is not a feature cache")
+
+    if (
+        version != FORMAT_VERSION
+        or pipeline_version != FEATURE_PIPELINE_VERSION
+    ):
+        return []
+
+    offset = HEADER_STRUCT.size
+
+    keys_end = offset + no_of_entries * KEY_SIZE
+
+    keys = [
+        data[start:start+KEY_SIZE]
+        for start in range(offset, keys_end, KEY_SIZE)
+    ]
+
+    counts = frombuffer(
+        data,
+        dtype='<u4',
+        count=no_of_entries * 3,
+        offset=keys_end,
+    )
+
+    offset = keys_end + counts.nbytes
+
+    no_of_strokes, no_of_points, no_of_decimated = (
+        counts.reshape(3, no_of_entries).astype(int)
+    )
+
+    floats = frombuffer(data, dtype='<f8', offset=offset)
+
+    ### split floats in arrays with the respective feature of all entries
+
+    sizes = (
+        (no_of_strokes + 1).sum(),
+        no_of_points.sum() * 2,
+        no_of_entries * 4,
+        no_of_entries * 2,
+        no_of_strokes.sum(),
+        no_of_decimated.sum() * 2,
+        no_of_entries,
+    )
+
+    if sum(sizes) != len(floats):
+        raise ValueError("Feature cache is truncated")
+
+    ends = cumsum(sizes).tolist()
+
+    (
+        all_ratios_logs,
+        all_unions,
+        bounding_boxes,
+        centroids,
+        all_lengths_logs,
+        all_decimated,
+        decimation_errors,
+    ) = (
+        floats[start:end]
+        for start, end in zip([0, *ends[:-1]], ends)
+    )
+
+    all_unions = all_unions.reshape(-1, 2)
+    bounding_boxes = bounding_boxes.reshape(-1, 4)
+    centroids = centroids.reshape(-1, 2)
+    all_decimated = all_decimated.reshape(-1, 2)
+
+    ratios_logs_ends = cumsum(no_of_strokes + 1).tolist()
+    union_ends = cumsum(no_of_points).tolist()
+    lengths_logs_ends = cumsum(no_of_strokes).tolist()
+    decimated_ends = cumsum(no_of_decimated).tolist()
+
+    entries = []
+
+    ratios_logs_start = union_start = lengths_logs_start = decimated_start = 0
+
+    for index, key in enumerate(keys):
+
+        ratios_logs_end = ratios_logs_ends[index]
+        union_end = union_ends[index]
+        lengths_logs_end = lengths_logs_ends[index]
+        decimated_end = decimated_ends[index]
+
+        entries.append(
+            (
+                key,
+                (
+                    tuple(
+                        all_ratios_logs[ratios_logs_start:ratios_logs_end]
+                        .tolist()
+                    ),
+                    all_unions[union_start:union_end],
+                    (
+                        bounding_boxes[index],
+                        centroids[index],
+                        all_lengths_logs[lengths_logs_start:lengths_logs_end],
+                        all_decimated[decimated_start:decimated_end],
+                        float(decimation_errors[index]),
+                    ),
+                ),
+            )
+        )
+
+        ratios_logs_start = ratios_logs_end
+        union_start = union_end
+        lengths_logs_start = lengths_logs_end
+        decimated_start = decimated_end
+
+    return entries
@@ -0,0 +1,362 @@
+"""Facility for batched Hausdorff distance computations.
+
+Templates are handled as a single array with the points of all
+templates concatenated one after the other, along with an array of
+offsets indicating where the points of each template start.
+
+Distances are computed either by comparing all pairs of points or by
+querying spatial indices (KD-trees) built beforehand for the drawing and
+for each template.
+"""
+
+### third-party imports
+
+from numpy import (
+    arange,
+    cumsum,
+    diff,
+    empty,
+    fromiter,
+    inf,
+    maximum,
+    minimum,
+    nextafter,
+    repeat,
+    sqrt,
+)
+
+
+
+### constants
+
+## maximum number of pairwise distances computed at once; bounds the memory
+## used by the distance matrices (2**21 float64 values ~ 16MB)
+MAX_CHUNK_SIZE = 2 ** 21
+
+## number of points compared at once when computing bounded distances
+BLOCK_SIZE = 32
+
+
+
+### functions
+
+def get_squared_distances(points_a, points_b):
+    """Return matrix with squared distances between all pairs of points.
+
+    Rows represent points in points_a and columns points in points_b.
+    """
+    x_diffs = points_a[:, 0, None] - points_b[None, :, 0]
+    y_diffs = points_a[:, 1, None] - points_b[None, :, 1]
+
+    return (x_diffs * x_diffs) + (y_diffs * y_diffs)
+
+
+def get_template_chunks(offsets, no_of_points, rows, max_chunk_size):
+    """Yield (first, last) indices of templates to be processed together.
+
+    Templates are grouped so the matrix of distances between the rows
+    and the points of the grouped templates stays within max_chunk_size,
+    unless a single template is already larger than that.
+    """
+    no_of_templates = len(offsets)
+
+    max_points = max(max_chunk_size // max(rows, 1), 1)
+
+    first = 0
+
+    while first < no_of_templates:
+
+        start = offsets[first]
+        last = first + 1
+
+        while (
+            last < no_of_templates
+            and (
+                (offsets[last + 1] if last + 1 < no_of_templates else no_of_points)
+                - start
+            ) <= max_points
+        ):
+            last += 1
+
+        yield first, last
+
+        first = last
+
+
+def get_pairwise_symmetric_hausdorff_distances(
+    points,
+    templates_points,
+    templates_offsets,
+    max_chunk_size=MAX_CHUNK_SIZE,
+):
+    """Return array with symmetric Hausdorff distances to each template.
+
+    Distances are obtained by comparing all pairs of points, which is
+    cheap enough for small arrays and requires no spatial indices.
+
+    Parameters
+    ==========
+    points (numpy array of shape (n, 2))
+        points of the drawing being compared.
+    templates_points (numpy array of shape (m, 2))
+        points of all templates, concatenated.
+    templates_offsets (numpy array of integers)
+        index of the first point of each template within templates_points.
+    max_chunk_size (integer)
+        maximum number of pairwise distances to compute at once.
+
+    The returned distances are the same as the ones obtained by computing
+    the maximum between both directed Hausdorff distances of each pair.
+    """
+    no_of_templates = len(templates_offsets)
+    no_of_points = len(templates_points)
+
+    distances = empty(no_of_templates)
+
+    for first, last in get_template_chunks(
+        templates_offsets,
+        no_of_points,
+        len(points),
+        max_chunk_size,
+    ):
+
+        ### grab points of templates in chunk and offsets relative to
+        ### first point of chunk
+
+        start = templates_offsets[first]
+        end = (
+            templates_offsets[last]
+            if last < no_of_templates
+            else no_of_points
+        )
+
+        chunk_offsets = templates_offsets[first:last] - start
+
+        squared_distances = (
+            get_squared_distances(points, templates_points[start:end])
+        )
+
+        ### directed distance from drawing to each template: for each point
+        ### in drawing, the closest point within each template, then the
+        ### farthest among those
+
+        forward = (
+            minimum.reduceat(squared_distances, chunk_offsets, axis=1)
+            .max(axis=0)
+        )
+
+        ### directed distance from each template to drawing: for each point
+        ### in templates, the closest point in drawing, then the farthest
+        ### among those within each template
+
+        backward = maximum.reduceat(
+            squared_distances.min(axis=0),
+            chunk_offsets,
+        )
+
+        distances[first:last] = maximum(forward, backward)
+
+    return sqrt(distances)
+
+
+def take_templates(templates_points, templates_offsets, indices):
+    """Return points and offsets of templates in given indices only."""
+
+    no_of_points = len(templates_points)
+
+    ### length of each template
+
+    lengths = diff(templates_offsets, append=no_of_points)[indices]
+
+    ### offsets of selected templates once concatenated
+
+    new_offsets = empty(len(indices), dtype=templates_offsets.dtype)
+
+    if len(indices):
+
+        new_offsets[0] = 0
+        cumsum(lengths[:-1], out=new_offsets[1:])
+
+    ### index of each selected point in the original array; formed by
+    ### the start of its template plus its position within it
+
+    point_indices = (
+        repeat(templates_offsets[indices] - new_offsets, lengths)
+        + arange(lengths.sum())
+    )
+
+    return templates_points[point_indices], new_offsets
+
+
+def get_symmetric_hausdorff_distances(
+    points,
+    kdtree,
+    templates_points,
+    templates_offsets,
+    templates_kdtrees,
+):
+    """Return array with symmetric Hausdorff distances to each template.
+
+    Parameters
+    ==========
+    points (numpy array of shape (n, 2))
+        points of the drawing being compared.
+    kdtree (scipy.spatial.cKDTree)
+        spatial index of the points of the drawing.
+    templates_points (numpy array of shape (m, 2))
+        points of all templates, concatenated.
+    templates_offsets (numpy array of integers)
+        index of the first point of each template within templates_points.
+    templates_kdtrees (sequence of scipy.spatial.cKDTree)
+        spatial index of the points of each template.
+    """
+    ### directed distance from each template to drawing: the closest point
+    ### in the drawing for all points of all templates are queried at once,
+    ### then the farthest among those within each template is picked
+
+    backward = maximum.reduceat(
+        kdtree.query(templates_points)[0],
+        templates_offsets,
+    )
+
+    ### directed distance from drawing to each template: the closest point
+    ### in the template for each point in drawing, then the farthest among
+    ### those
+
+    forward = fromiter(
+        (
+            template_kdtree.query(points)[0].max()
+            for template_kdtree in templates_kdtrees
+        ),
+        dtype=float,
+        count=len(templates_kdtrees),
+    )
+
+    return maximum(forward, backward)
+
+
+def get_bounded_directed_hausdorff(
+    points,
+    kdtree,
+    cutoff,
+    block_size=BLOCK_SIZE,
+):
+    """Return directed Hausdorff distance from points to indexed points.
+
+    If the distance is found to be larger than the cutoff, the computation
+    is abandoned and infinity is returned instead.
+
+    Points are queried in blocks, each formed by points spread along the
+    whole array (rather than consecutive ones), so points far from the
+    indexed ones are more likely to be found in early blocks. Queries
+    themselves are also pruned by the cutoff.
+    """
+    ### queries only find neighbours strictly within the upper bound, so we
+    ### use the next representable value after the cutoff, since the cutoff
+    ### itself is acceptable here
+    upper_bound = nextafter(cutoff, inf)
+
+    no_of_blocks = -(-len(points) // block_size)
+
+    largest = 0.0
+
+    for start in range(no_of_blocks):
+
+        closest = (
+            kdtree.query(
+                points[start::no_of_blocks],
+                distance_upper_bound=upper_bound,
+            )[0]
+            .max()
+        )
+
+        ### points without neighbours within the upper bound have infinite
+        ### distances, so the comparison is abandoned
+
+        if closest > cutoff:
+            return inf
+
+        if closest > largest:
+            largest = closest
+
+    return float(largest)
+
+
+def get_closest_template(
+    points,
+    kdtree,
+    templates_points,
+    templates_offsets,
+    templates_kdtrees,
+    indices,
+    cutoff,
+):
+    """Return (index, distance) of template closest to points, if any.
+
+    Only templates in the given indices are considered, in the order given,
+    and only if their symmetric Hausdorff distance is smaller than cutoff.
+    If no such template exists, None is returned.
+
+    The cutoff shrinks to the best distance found so far, so each comparison
+    is abandoned as soon as it exceeds it; the reverse direction of a
+    comparison is skipped whenever the forward direction already exceeded
+    the cutoff. When distances are equal, the template with the lowest index
+    is chosen.
+    """
+    no_of_points = len(templates_points)
+    no_of_templates = len(templates_offsets)
+
+    best_index = None
+    best_distance = cutoff
+
+    for index in indices:
+
+        ### compute distance in both directions, abandoning it as soon as
+        ### it exceeds the best distance so far
+
+        distance = get_bounded_directed_hausdorff(
+            points,
+            templates_kdtrees[index],
+            best_distance,
+        )
+
+        if distance > best_distance:
+            continue
+
+        start = templates_offsets[index]
+
+        end = (
+            templates_offsets[index + 1]
+            if index + 1 < no_of_templates
+            else no_of_points
+        )
+
+        distance = max(
+            distance,
+            get_bounded_directed_hausdorff(
+                templates_points[start:end],
+                kdtree,
+                best_distance,
+            ),
+        )
+
+        ### keep template if it is closer than the best one so far (or as
+        ### close, but registered before it); the cutoff itself isn't
+        ### tolerable, though
+
+        if (
+            distance < best_distance
+            or (
+                distance == best_distance
+                and best_index is not None
+                and index < best_index
+            )
+        ):
+
+            best_index = index
+            best_distance = distance
+
+    if best_index is None:
+        return
+
+    return int(best_index), best_distance
@@ -0,0 +1,129 @@
+"""Facility with graphics item to display strokes while they are drawn.
+
+Rather than rebuilding a path and handing it over to a path item on every
+mouse move (which copies the whole path and invalidates the entire
+bounding rect each time, making long strokes quadratic), the item below
+appends each new segment in place and only requests the repainting of the
+area covered by such segment.
+
+Points are kept in chunks, each with its own bounding rect, so painting
+only goes through the chunks intersecting the exposed area.
+"""
+
+### third-party imports
+
+## PySide6
+
+from PySide6.QtWidgets import QGraphicsItem
+
+from PySide6.QtGui import QPen, QPainterPath
+
+from PySide6.QtCore import Qt, QRectF
+
+
+
+### constant
+
+## maximum number of points in each chunk of the stroke
+CHUNK_SIZE = 16
+
+
+
+### class definition
+
+class LiveStrokeItem(QGraphicsItem):
+    """Graphics item representing a stroke being drawn."""
+
+    def __init__(self, pen, point):
+        """Start stroke at given point (QPointF)."""
+
+        super().__init__()
+
+        ### use a copy of the pen with round caps/joins, so segments and
+        ### chunks join seamlessly
+
+        pen = self.pen = QPen(pen)
+        pen.setCapStyle(Qt.RoundCap)
+        pen.setJoinStyle(Qt.RoundJoin)
+
+        ### margin around points covered by the pen
+        self.margin = max(pen.widthF(), 1) / 2 + 1
+
+        ### painting area is given by option.exposedRect, so we can skip
+        ### chunks outside of it
+
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+
+        ### chunks of the stroke, as lists with a path, its number of points
+        ### and its bounding rect (already including the margin)
+
+        self.chunks = []
+
+        self.last_point = point
+        self.start_chunk(point)
+
+        self.bounding_rect = QRectF(self.chunks[0][2])
+
+    def start_chunk(self, point):
+
+        path = QPainterPath()
+        path.moveTo(point)
+
+        self.chunks.append([path, 1, self.get_segment_rect(point, point)])
+
+    def get_segment_rect(self, point_a, point_b):
+        """Return rect covered by pen when drawing segment between points."""
+
+        margin = self.margin
+
+        return (
+            QRectF(point_a, point_b)
+            .normalized()
+            .adjusted(-margin, -margin, margin, margin)
+        )
+
+    def add_point(self, point):
+        """Append segment ending at given point (QPointF) to the stroke."""
+
+        segment_rect = self.get_segment_rect(self.last_point, point)
+
+        ### start new chunk if the last one is full (the new chunk begins
+        ### with the last point, so chunks remain connected)
+
+        if self.chunks[-1][1] >= CHUNK_SIZE:
+            self.start_chunk(self.last_point)
+
+        chunk = self.chunks[-1]
+        path, no_of_points, chunk_rect = chunk
+
+        path.lineTo(point)
+
+        chunk[1] = no_of_points + 1
+        chunk[2] = chunk_rect.united(segment_rect)
+
+        self.last_point = point
+
+        ### only notify geometry changes when the bounding rect actually
+        ### grows (required by Qt before the bounding rect changes)
+
+        if not self.bounding_rect.contains(segment_rect):
+
+            self.prepareGeometryChange()
+            self.bounding_rect = self.bounding_rect.united(segment_rect)
+
+        ### repaint only the area covered by the new segment
+        self.update(segment_rect)
+
+    def boundingRect(self):
+        return self.bounding_rect
+
+    def paint(self, painter, option, widget=None):
+
+        exposed_rect = option.exposedRect
+
+        painter.setPen(self.pen)
+
+        for path, _, chunk_rect in self.chunks:
+
+            if chunk_rect.intersects(exposed_rect):
+                painter.drawPath(path)
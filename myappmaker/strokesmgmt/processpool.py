@@ -0,0 +1,290 @@
+"""Facility for matching drawings in parallel worker processes.
+
+Worker processes memory-map the template store holding the templates
+(see the templatestore module), so the template library isn't sent to
+them on every request and all processes share a single copy of it. A new
+store is only published when the library changes.
+
+Workers are started lazily (the first time they are needed) and kept
+alive afterwards. This module must not import Qt, since it is imported
+by the worker processes as well.
+"""
+
+### standard library imports
+
+import atexit
+
+from concurrent.futures import ProcessPoolExecutor
+
+from multiprocessing import get_context
+
+
+### third-party imports
+
+from numpy import array_split, concatenate
+
+from scipy.spatial import cKDTree
+
+
+### local imports
+
+from .hausdorff import (
+    get_symmetric_hausdorff_distances,
+    get_closest_template,
+    take_templates,
+)
+
+from .templatestore import TemplateKDTrees, open_store
+
+
+
+### constants
+
+## minimum number of candidates for which using the worker processes pays
+## off (below it, matching in the current process is faster)
+MINIMUM_CANDIDATES = 256
+
+
+
+### module level objs
+
+## state of the pool in the main process
+
+POOL_STATE = {
+    'executor': None,
+    'no_of_workers': 0,
+    'futures': set(),
+}
+
+## template store mapped in a worker process, along with the spatial
+## indices of its templates (built as needed), by number of strokes
+
+WORKER_STATE = {
+    'store': None,
+    'kdtrees': {},
+}
+
+
+
+### main process functions
+
+def get_executor(no_of_workers):
+    """Return pool of worker processes, starting it if needed."""
+
+    executor = POOL_STATE['executor']
+
+    if executor is not None and POOL_STATE['no_of_workers'] == no_of_workers:
+        return executor
+
+    if executor is not None:
+        stop_executor(executor)
+
+    ### we use the 'spawn' start method because forking a process running
+    ### a Qt application isn't safe
+
+    executor = POOL_STATE['executor'] = ProcessPoolExecutor(
+        max_workers=no_of_workers,
+        mp_context=get_context('spawn'),
+    )
+
+    POOL_STATE['no_of_workers'] = no_of_workers
+
+    return executor
+
+
+def shutdown_pool():
+    """Stop worker processes."""
+
+    executor = POOL_STATE['executor']
+
+    if executor is not None:
+
+        stop_executor(executor)
+        POOL_STATE['executor'] = None
+
+
+atexit.register(shutdown_pool)
+
+
+def stop_executor(executor):
+    """Shut executor down without waiting, cancelling pending work.
+
+    Pending futures are cancelled by hand, since the cancel_futures
+    argument of Executor.shutdown() requires Python 3.9.
+    """
+    futures = POOL_STATE['futures']
+
+    for future in list(futures):
+        future.cancel()
+
+    futures.clear()
+
+    executor.shutdown(wait=False)
+
+
+def submit(executor, *args):
+    """Submit work to executor, keeping track of it until it is done."""
+
+    future = executor.submit(*args)
+
+    futures = POOL_STATE['futures']
+
+    futures.add(future)
+    future.add_done_callback(futures.discard)
+
+    return future
+
+
+def get_parallel_distances(
+    no_of_workers,
+    store_path,
+    no_of_strokes,
+    points,
+    indices,
+):
+    """Return symmetric Hausdorff distances to templates in given indices.
+
+    The indices are split among the workers, whose results are merged
+    back in the same order.
+    """
+    executor = get_executor(no_of_workers)
+
+    futures = [
+
+        submit(
+            executor,
+            get_distances_in_worker,
+            store_path,
+            no_of_strokes,
+            points,
+            indices_chunk,
+        )
+
+        for indices_chunk in array_split(indices, no_of_workers)
+        if len(indices_chunk)
+
+    ]
+
+    return concatenate([future.result() for future in futures])
+
+
+def get_parallel_closest_template(
+    no_of_workers,
+    store_path,
+    no_of_strokes,
+    points,
+    indices,
+    cutoff,
+):
+    """Return (index, distance) of closest template within cutoff, if any.
+
+    Each worker receives indices spread along the given ones (which are
+    ordered from most to least promising), so all of them start with
+    promising candidates. The closest template found by the workers is
+    returned (or the one with the lowest index, if distances are equal).
+    """
+    executor = get_executor(no_of_workers)
+
+    futures = [
+
+        submit(
+            executor,
+            get_closest_template_in_worker,
+            store_path,
+            no_of_strokes,
+            points,
+            indices[start::no_of_workers],
+            cutoff,
+        )
+
+        for start in range(min(no_of_workers, len(indices)))
+
+    ]
+
+    results = [
+        result
+        for result in (future.result() for future in futures)
+        if result is not None
+    ]
+
+    if results:
+
+        return min(
+            results,
+            key=lambda index_distance: index_distance[::-1],
+        )
+
+
+### worker process functions
+
+def get_worker_templates(store_path, no_of_strokes):
+    """Return points, offsets and KD-trees of templates in template store.
+
+    The store is mapped if it wasn't mapped yet (replacing the previous
+    one, if any).
+    """
+    store = WORKER_STATE['store']
+    kdtrees = WORKER_STATE['kdtrees']
+
+    if store is None or store['filepath'] != store_path:
+
+        kdtrees.clear()
+        store = WORKER_STATE['store'] = open_store(store_path)
+
+    batch = store['batches'][no_of_strokes]
+
+    points = batch['points']
+    offsets = batch['offsets']
+
+    try:
+        templates_kdtrees = kdtrees[no_of_strokes]
+
+    except KeyError:
+
+        templates_kdtrees = kdtrees[no_of_strokes] = (
+            TemplateKDTrees(points, offsets)
+        )
+
+    return points, offsets, templates_kdtrees
+
+
+def get_distances_in_worker(store_path, no_of_strokes, points, indices):
+
+    templates_points, templates_offsets, templates_kdtrees = (
+        get_worker_templates(store_path, no_of_strokes)
+    )
+
+    candidates_points, candidates_offsets = (
+        take_templates(templates_points, templates_offsets, indices)
+    )
+
+    return get_symmetric_hausdorff_distances(
+        points,
+        cKDTree(points),
+        candidates_points,
+        candidates_offsets,
+        [templates_kdtrees[index] for index in indices],
+    )
+
+
+def get_closest_template_in_worker(
+    store_path,
+    no_of_strokes,
+    points,
+    indices,
+    cutoff,
+):
+
+    templates_points, templates_offsets, templates_kdtrees = (
+        get_worker_templates(store_path, no_of_strokes)
+    )
+
+    return get_closest_template(
+        points,
+        cKDTree(points),
+        templates_points,
+        templates_offsets,
+        templates_kdtrees,
+        indices,
+        cutoff,
+    )
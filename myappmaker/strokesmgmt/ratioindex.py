@@ -0,0 +1,67 @@
+"""Facility for indexing templates by the ratio log of their union.
+
+For each number of strokes, the ln of the width:height ratio of the union
+of strokes of each template is kept in a sorted list, along with the
+corresponding widget keys, so templates with a ratio log within a given
+tolerance can be found with binary searches instead of a linear scan.
+"""
+
+### standard library imports
+
+from collections import defaultdict
+
+from bisect import bisect_left, bisect_right
+
+
+
+### constants
+
+## margin added to the tolerance when searching the index, so rounding
+## errors never leave out templates right at the boundary (candidates are
+## still checked against the exact tolerance afterwards)
+TOLERANCE_MARGIN = 1e-9
+
+## for each number of strokes, a list of sorted ratio logs and a list
+## of widget keys in the corresponding order
+RATIO_INDEX = defaultdict(lambda: ([], []))
+
+
+
+### functions
+
+def add_to_ratio_index(no_of_strokes, widget_key, ratio_log):
+
+    ratios_logs, widget_keys = RATIO_INDEX[no_of_strokes]
+
+    index = bisect_right(ratios_logs, ratio_log)
+
+    ratios_logs.insert(index, ratio_log)
+    widget_keys.insert(index, widget_key)
+
+
+def remove_from_ratio_index(no_of_strokes, widget_key, ratio_log):
+
+    ratios_logs, widget_keys = RATIO_INDEX[no_of_strokes]
+
+    ### look for the widget key among the ones with the same ratio log
+
+    index = bisect_left(ratios_logs, ratio_log)
+
+    while widget_keys[index] != widget_key:
+        index += 1
+
+    del ratios_logs[index]
+    del widget_keys[index]
+
+
+def get_keys_within_tolerance(no_of_strokes, ratio_log, tolerance):
+    """Return keys of templates whose ratio logs are within tolerance."""
+
+    ratios_logs, widget_keys = RATIO_INDEX[no_of_strokes]
+
+    tolerance += TOLERANCE_MARGIN
+
+    start = bisect_left(ratios_logs, ratio_log - tolerance)
+    end = bisect_right(ratios_logs, ratio_log + tolerance)
+
+    return widget_keys[start:end]
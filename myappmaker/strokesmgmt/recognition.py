@@ -0,0 +1,120 @@
+"""Facility for recognizing drawings outside the GUI thread.
+
+Scenes submit their drawings to a recognition service, which matches them
+in a worker thread and delivers the results back in the GUI thread through
+a Qt signal. Results for drawings that were cancelled or superseded by
+newer ones are dropped.
+"""
+
+### standard library import
+from concurrent.futures import CancelledError
+
+
+### third-party import
+from PySide6.QtCore import QObject, Qt, Signal
+
+
+### local imports
+
+from .utils import MatchingCancelled
+
+from .speculation import SpeculativeMatcher
+
+
+
+### class definition
+
+class RecognitionService(QObject):
+
+    ### emitted in the GUI thread with the match data and the context object
+    ### given when the drawing was submitted
+    matches_ready = Signal(object, object)
+
+    ### emitted from worker thread with the request id, match data and
+    ### context object
+    request_finished = Signal(int, object, object)
+
+    def __init__(self, parent=None, always_filter=False):
+
+        super().__init__(parent)
+
+        self.speculative_matcher = SpeculativeMatcher(always_filter)
+
+        ### id of the latest request; results from other requests are stale
+        self.request_id = 0
+
+        ### cancel event of the latest request
+        self.cancel_event = None
+
+        ### results are always delivered in the GUI thread, even when the
+        ### matching finishes before we start waiting for it
+        self.request_finished.connect(self.deliver, Qt.QueuedConnection)
+
+    def speculate(self, strokes):
+        """Start matching strokes drawn so far, in case they are final."""
+        self.speculative_matcher.speculate(strokes)
+
+    def cancel(self):
+        """Cancel speculative and submitted work, dropping its results."""
+
+        self.speculative_matcher.cancel()
+        self.cancel_request()
+
+    def cancel_request(self):
+        """Cancel submitted work, dropping its results."""
+
+        self.request_id += 1
+
+        if self.cancel_event is not None:
+
+            self.cancel_event.set()
+            self.cancel_event = None
+
+    def submit(self, strokes, context=None):
+        """Match strokes in the background.
+
+        Once finished, the match data is delivered via the matches_ready
+        signal along with the given context object, unless the request is
+        cancelled or superseded by a newer one before that.
+        """
+        ### the speculative matching isn't cancelled here, since it may
+        ### be reused (obtaining the future cancels the speculations which
+        ### can't)
+
+        future, cancel_event = self.speculative_matcher.get_future(strokes)
+
+        self.cancel_request()
+
+        request_id = self.request_id
+        self.cancel_event = cancel_event
+
+        def on_done(future):
+
+            try:
+                match_data = future.result()
+
+            except (CancelledError, MatchingCancelled):
+                return
+
+            except Exception as err:
+
+                match_data = {
+                    'menu_items': '',
+                    'chosen_widget_key': '',
+                    'report': f"Failed to recognize drawing: {err}",
+                    'failed': True,
+                }
+
+            self.request_finished.emit(request_id, match_data, context)
+
+        future.add_done_callback(on_done)
+
+    def deliver(self, request_id, match_data, context):
+
+        ### drop stale results
+
+        if request_id != self.request_id:
+            return
+
+        self.cancel_event = None
+        self.matches_ready.emit(match_data, context)
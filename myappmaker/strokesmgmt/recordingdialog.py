@@ -1,4 +1,8 @@
 
+### standard library import
+from pathlib import Path
+
+
 ### third-party imports
 
 ## PySide6
@@ -13,6 +17,8 @@ from PySide6.QtWidgets import (
     QWidget,
     QComboBox,
     QLabel,
+    QPushButton,
+    QFileDialog,
 
     QSizePolicy,
 
@@ -23,16 +29,14 @@ from PySide6.QtCore import Qt
 
 ### local imports
 
-from ..widgets import (
-    get_checked_check_box,
-    get_unchecked_check_box,
-    get_label,
-)
+from ..widgets import get_widget_keys, get_widget
 
 from .recordingpanel import StrokesRecordingPanel
 
 from .display import StrokesDisplay
 
+from .strokeslibrary import export_pyl_strokes, schedule_feature_cache_save
+
 
 
 ### dialog definition
@@ -87,18 +91,16 @@ class StrokeRecordingDialog(QDialog):
         widget_stack = self.widget_stack = QStackedLayout()
         strokes_display_stack = self.strokes_display_stack = QStackedLayout()
 
-        for widget_key, get_widget in (
-
-            ('label', get_label),
-            ('unchecked_check_box', get_unchecked_check_box),
-            ('checked_check_box', get_checked_check_box),
-
-        ):
+        for widget_key in get_widget_keys():
 
             widget_key_box.addItem(widget_key)
-            widget_stack.addWidget(get_widget())
+            widget_stack.addWidget(get_widget(widget_key))
             strokes_display_stack.addWidget(StrokesDisplay(widget_key))
 
+        ### persist features computed for templates of the displays, if
+        ### they weren't cached yet (in the background)
+        schedule_feature_cache_save()
+
         ###
 
         grid.addWidget(widget_key_box, 0, 1)
@@ -117,6 +119,13 @@ class StrokeRecordingDialog(QDialog):
         strokes_displays_holder.setLayout(strokes_display_stack)
         grid.addWidget(strokes_displays_holder, 2, 1, topleft_alignment)
 
+        ### button to export strokes in human-readable format
+
+        export_btn = QPushButton("Export strokes as .pyl files")
+        export_btn.clicked.connect(self.export_strokes)
+
+        grid.addWidget(export_btn, 4, 1, topleft_alignment)
+
         ###
         self.setLayout(self.grid)
 
@@ -138,3 +147,17 @@ class StrokeRecordingDialog(QDialog):
         self.recording_panel.prepare(
             self.strokes_display_stack.currentWidget()
         )
+
+    def export_strokes(self):
+
+        directory = QFileDialog.getExistingDirectory(
+            self,
+            "Export strokes as .pyl files into directory",
+        )
+
+        if not directory:
+            return
+
+        try: export_pyl_strokes(Path(directory))
+        except Exception as err:
+            print(f"Failed to export strokes: {err}")
@@ -1,9 +1,5 @@
 """Facility with canvas to record strokes."""
 
-### standard library import
-from collections import deque
-
-
 ### third-party imports
 
 ## PySide6
@@ -17,14 +13,20 @@ from PySide6.QtWidgets import (
     QMessageBox,
 )
 
-from PySide6.QtGui import QPen, QPainterPath
+from PySide6.QtGui import QPen
 
 from PySide6.QtCore import Qt, QLine
 
 
 ### local imports
 
-from .utils import get_stroke_matches_data
+from ..prefsdata import PREFERENCES, PreferencesKeys
+
+from .recognition import RecognitionService
+
+from .strokesbuffer import StrokesBuffer
+
+from .liveink import LiveStrokeItem
 
 from .constants import (
     STROKE_DIMENSION,
@@ -37,8 +39,8 @@ from .constants import (
 
 ### module level objs
 
-STROKES = deque()
-STROKE_PATH_PROXIES = []
+STROKES = StrokesBuffer()
+STROKE_ITEMS = []
 
 
 ### class definition
@@ -98,6 +100,14 @@ class StrokesRecordingScene(QGraphicsScene):
         self.last_point = None
         self.watch_out_for_shift_release = False
 
+        ### matches strokes in the background
+
+        self.recognition_service = (
+            RecognitionService(self, always_filter=True)
+        )
+
+        self.recognition_service.matches_ready.connect(self.use_strokes)
+
     def mouseMoveEvent(self, event):
 
         ### leave right away if either...
@@ -126,21 +136,30 @@ class StrokesRecordingScene(QGraphicsScene):
 
         if last_point is None:
 
-            ### create a path and its QGraphics proxy to represent the stroke
+            ### drop result of previous drawing, if not delivered yet
+            self.recognition_service.cancel()
 
-            path = self.path = QPainterPath()
-            self.path_proxy = self.addPath(path, self.strokes_pen)
+            ### create item to represent the stroke, starting at the current
+            ### point, and store such point as last one
 
-            ### move path to current point and store such point as last one
+            self.stroke_item = LiveStrokeItem(self.strokes_pen, point)
+            self.addItem(self.stroke_item)
 
-            path.moveTo(*coords)
             self.last_point = point
 
-            ### store coordinates in new list within STROKES
-            STROKES.append([coords])
+            ### start new stroke in STROKES with the coordinates; the
+            ### stroke is simplified as its points are added, within the
+            ### tolerance set in the preferences
+
+            STROKES.add_stroke(
+                *coords,
+                PREFERENCES[
+                    PreferencesKeys.STROKE_SIMPLIFICATION_TOLERANCE.value
+                ],
+            )
 
-            ### store path proxy
-            STROKE_PATH_PROXIES.append(self.path_proxy)
+            ### store stroke item
+            STROKE_ITEMS.append(self.stroke_item)
 
             ### then leave
             return
@@ -150,14 +169,13 @@ class StrokesRecordingScene(QGraphicsScene):
             return
 
 
-        ### otherwise, draw a line on our board and update its
-        ### QGraphics proxy
+        ### otherwise, draw a line on our board by appending a segment to
+        ### the stroke item (only the area of the segment is repainted)
 
-        self.path.lineTo(point.x(), point.y())
-        self.path_proxy.setPath(self.path)
+        self.stroke_item.add_point(point)
 
         ### store coordinates
-        STROKES[-1].append(coords)
+        STROKES.add_point(*coords)
 
         ### reference current point as last one
         self.last_point = point
@@ -178,41 +196,56 @@ class StrokesRecordingScene(QGraphicsScene):
 
     def process_strokes(self):
 
-        ### remove path proxies
+        ### remove stroke items
 
-        for item in STROKE_PATH_PROXIES:
+        for item in STROKE_ITEMS:
             self.removeItem(item)
 
-        STROKE_PATH_PROXIES.clear()
+        STROKE_ITEMS.clear()
 
-        del self.path, self.path_proxy
+        del self.stroke_item
 
-        offset_strokes = []
+        offset_strokes = STROKES.get_view().get_offset_view(
+            -STROKE_HALF_DIMENSION,
+            -STROKE_HALF_DIMENSION,
+        )
 
-        while STROKES:
+        STROKES.clear()
 
-            points = STROKES.popleft()
+        ### check strokes for matches in the background; the result is
+        ### delivered to use_strokes() along with the strokes and the
+        ### display they were drawn for (the user may pick another widget
+        ### in the meantime)
 
-            offset_points = [
-                (a - STROKE_HALF_DIMENSION, b - STROKE_HALF_DIMENSION)
-                for a, b in points
-            ]
+        self.recognition_service.submit(
+            offset_strokes,
+            (self.stroke_display, offset_strokes),
+        )
 
-            offset_strokes.append(offset_points)
+    def use_strokes(self, match_data, context):
 
-        ###
+        stroke_display, offset_strokes = context
 
-        chosen_widget_key = (
-            get_stroke_matches_data(offset_strokes, always_filter=True)['chosen_widget_key']
-        )
+        chosen_widget_key = match_data['chosen_widget_key']
+
+        ### if the drawing couldn't be checked, we can't tell whether another
+        ### widget is already using it, so it isn't used
+
+        if match_data.get('failed'):
+
+            QMessageBox.warning(
+                self.recording_panel,
+                "Drawing couldn't be checked!",
+                match_data['report'],
+            )
 
         ### if there's a matching widget and it isn't the current one,
         ### explain to the user that we can't use the drawing because another
         ### widget is already using it
 
-        if (
+        elif (
             chosen_widget_key
-            and chosen_widget_key != self.stroke_display.widget_key
+            and chosen_widget_key != stroke_display.widget_key
         ):
 
             QMessageBox.information(
@@ -227,7 +260,9 @@ class StrokesRecordingScene(QGraphicsScene):
         ### otherwise, the new drawing can be set without problems
 
         else:
-            self.stroke_display.update_and_save_strokes(offset_strokes)
+            stroke_display.update_and_save_strokes(
+                offset_strokes.get_strokes_lists()
+            )
 
 
 
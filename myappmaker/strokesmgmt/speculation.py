@@ -0,0 +1,110 @@
+"""Facility for speculative recognition of drawings.
+
+While the user draws, each finished stroke may be the last one, so we
+start matching the strokes drawn so far in the background as soon as each
+stroke is finished. When the drawing is actually finished, the result is
+usually ready (or almost ready) already.
+"""
+
+### standard library imports
+
+from concurrent.futures import ThreadPoolExecutor
+
+from threading import Event
+
+
+### local import
+from .utils import get_stroke_matches_data
+
+
+
+### module level obj
+
+## single worker, so speculative matching never competes with itself
+EXECUTOR = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix='speculative_matching',
+)
+
+
+
+### class definition
+
+class SpeculativeMatcher:
+    """Matches strokes in the background, caching results by stroke count."""
+
+    def __init__(self, always_filter=False):
+
+        self.always_filter = always_filter
+
+        ### map each number of strokes to the strokes being matched, the
+        ### event used to cancel the matching and the corresponding future
+        self.speculations = {}
+
+    def speculate(self, strokes):
+        """Start matching strokes drawn so far in the background.
+
+        Strokes must be given as a strokes view, which isn't affected by
+        strokes captured afterwards.
+        """
+
+        cancel_event = Event()
+
+        future = EXECUTOR.submit(
+            get_stroke_matches_data,
+            strokes,
+            self.always_filter,
+            cancel_event,
+        )
+
+        self.speculations[len(strokes)] = strokes, cancel_event, future
+
+    def cancel(self):
+        """Cancel all speculative matching, since strokes changed."""
+
+        for _, cancel_event, future in self.speculations.values():
+
+            cancel_event.set()
+            future.cancel()
+
+        self.speculations.clear()
+
+    def get_future(self, strokes):
+        """Return (future, cancel event) for matching of given strokes.
+
+        The speculative matching started for the very same strokes is
+        reused, if available. Otherwise matching is started now.
+        """
+        speculation = self.speculations.pop(len(strokes), None)
+        self.cancel()
+
+        ### the speculation can only be used if it was started for the very
+        ### same strokes
+
+        if (
+            speculation is not None
+            and speculation[0].is_same_as(strokes)
+        ):
+            _, cancel_event, future = speculation
+
+        else:
+
+            ### a speculation for other strokes is useless, so it is
+            ### cancelled as well
+
+            if speculation is not None:
+
+                _, cancel_event, future = speculation
+                cancel_event.set()
+                future.cancel()
+
+            cancel_event = Event()
+
+            future = EXECUTOR.submit(
+                get_stroke_matches_data,
+                strokes,
+                self.always_filter,
+                cancel_event,
+            )
+
+        return future, cancel_event
@@ -0,0 +1,286 @@
+"""Facility for capturing strokes in a compact buffer.
+
+Points of all strokes are stored in a single growable array of floats,
+along with the index of the first point of each stroke, so the strokes can
+be handed over to the recognizer as views of the array, without building
+intermediate lists/tuples or concatenating them again.
+
+Strokes can also be simplified while captured, given a tolerance: points
+are only kept when needed to represent the stroke within such distance
+(combining a radial distance filter with an opening window variant of the
+Ramer-Douglas-Peucker algorithm, so it works as points arrive).
+
+Points of finished strokes never change (only the last point of the
+stroke being captured may be replaced, when simplifying), so views of the
+strokes captured so far stay valid while more strokes are captured.
+Clearing the buffer allocates a new array instead of reusing the current
+one, so views still being used (for instance, by matching in the
+background) aren't affected either.
+"""
+
+### standard library imports
+
+from itertools import chain
+
+from math import hypot
+
+
+### third-party imports
+
+from numpy import (
+    array as numpy_array,
+    cumsum,
+    empty,
+    split,
+)
+
+
+
+### constants
+
+## number of points the buffer can hold before growing
+INITIAL_CAPACITY = 1024
+
+## maximum number of points skipped in a row when simplifying a stroke,
+## so checking them stays cheap (for instance, along a very long and
+## straight stroke)
+MAX_WINDOW_SIZE = 32
+
+## maximum length of the segments of a simplified stroke, in multiples of
+## the tolerance; drawings are compared as sets of points, so long segments
+## without points would make similar drawings look farther apart
+MAX_SEGMENT_LENGTH_FACTOR = 8
+
+
+
+### class definitions
+
+class StrokesBuffer:
+    """Growable array of points with the index of the first one per stroke."""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+
+        self.points = empty((capacity, 2))
+        self.size = 0
+        self.starts = []
+
+        ### simplification state of the stroke being captured: tolerance,
+        ### last point kept for good (anchor), last point stored (which is
+        ### provisional when it isn't the anchor) and points after the
+        ### anchor that may be skipped (window)
+
+        self.tolerance = 0
+        self.anchor = self.last_point = None
+        self.window = []
+
+    def __len__(self):
+        """Return number of strokes."""
+        return len(self.starts)
+
+    def add_stroke(self, x, y, tolerance=0):
+        """Start new stroke at given point.
+
+        If a tolerance greater than 0 is given, the stroke is simplified
+        as its points are added, so that the points kept represent the
+        stroke within such distance.
+        """
+        self.starts.append(self.size)
+        self.append_point(x, y)
+
+        self.tolerance = tolerance
+        self.anchor = self.last_point = x, y
+        self.window = []
+
+    def add_point(self, x, y):
+        """Add point to last stroke (simplifying it, if requested)."""
+
+        if not self.tolerance:
+
+            self.append_point(x, y)
+            return
+
+        point = x, y
+        window = self.window
+
+        ### radial distance: points too close to the last one stored are
+        ### skipped right away (though still checked against the segments
+        ### replacing the last point, if it is provisional)
+
+        last_x, last_y = self.last_point
+
+        if hypot(x - last_x, y - last_y) < self.tolerance:
+
+            if window:
+                window.append(point)
+
+            return
+
+        ### opening window: if the segment from the anchor to the new point
+        ### still represents the skipped points within tolerance, the new
+        ### point replaces the provisional one; otherwise the provisional
+        ### point is kept for good and becomes the new anchor
+
+        anchor_x, anchor_y = self.anchor
+
+        if (
+            window
+            and len(window) < MAX_WINDOW_SIZE
+            and (
+                hypot(x - anchor_x, y - anchor_y)
+                <= self.tolerance * MAX_SEGMENT_LENGTH_FACTOR
+            )
+            and all(
+                get_distance_to_segment(skipped, self.anchor, point)
+                <= self.tolerance
+                for skipped in window
+            )
+        ):
+            self.points[self.size - 1] = point
+
+        else:
+
+            if window:
+
+                self.anchor = self.last_point
+                window.clear()
+
+            self.append_point(x, y)
+
+        window.append(point)
+        self.last_point = point
+
+    def append_point(self, x, y):
+
+        size = self.size
+
+        ### double the capacity when full (the previous array is left
+        ### untouched, since views of it may still be in use)
+
+        if size == len(self.points):
+
+            points = empty((size * 2, 2))
+            points[:size] = self.points[:size]
+
+            self.points = points
+
+        self.points[size] = x, y
+        self.size = size + 1
+
+    def get_view(self):
+        """Return view of strokes captured so far (no data is copied)."""
+        return StrokesView(self.points[:self.size], self.starts)
+
+    def clear(self):
+
+        self.points = empty((INITIAL_CAPACITY, 2))
+        self.size = 0
+        self.starts = []
+
+        self.anchor = self.last_point = None
+        self.window = []
+
+
+class StrokesView:
+    """Read-only strokes backed by an array with the points of all of them.
+
+    Behaves like a sequence of strokes, each one an array of points (a
+    view of the array of all points).
+    """
+
+    __slots__ = ('union_array', 'starts', 'stroke_arrays')
+
+    def __init__(self, union_array, starts):
+
+        self.union_array = union_array
+        self.starts = tuple(starts)
+
+        self.stroke_arrays = (
+            split(union_array, self.starts[1:])
+            if self.starts
+            else []
+        )
+
+    def __len__(self):
+        return len(self.stroke_arrays)
+
+    def __iter__(self):
+        return iter(self.stroke_arrays)
+
+    def __getitem__(self, index):
+        return self.stroke_arrays[index]
+
+    def is_same_as(self, other):
+        """Return whether both views hold the very same strokes.
+
+        That is, whether they view the same points in the same memory with
+        the same strokes, which only happens for views of the same buffer
+        taken while no point was added to it.
+        """
+        return (
+            self.starts == other.starts
+            and self.union_array.shape == other.union_array.shape
+            and (
+                self.union_array.__array_interface__['data']
+                == other.union_array.__array_interface__['data']
+            )
+        )
+
+    def get_offset_view(self, x_offset, y_offset):
+        """Return new view with strokes offset by given amounts."""
+
+        return StrokesView(
+            self.union_array + (x_offset, y_offset),
+            self.starts,
+        )
+
+    def get_strokes_lists(self):
+        """Return strokes as lists of (x, y) tuples."""
+
+        return [
+            list(map(tuple, stroke_array.tolist()))
+            for stroke_array in self.stroke_arrays
+        ]
+
+
+### functions
+
+def get_distance_to_segment(point, start, end):
+    """Return distance from point to segment between start and end."""
+
+    x, y = point
+    start_x, start_y = start
+
+    dx = end[0] - start_x
+    dy = end[1] - start_y
+
+    squared_length = dx * dx + dy * dy
+
+    ### project point on segment, clamping the projection to its ends
+
+    if squared_length:
+
+        t = ((x - start_x) * dx + (y - start_y) * dy) / squared_length
+        t = min(max(t, 0.0), 1.0)
+
+    else:
+        t = 0.0
+
+    return hypot(x - (start_x + t * dx), y - (start_y + t * dy))
+
+
+def get_strokes_view(strokes):
+    """Return strokes view from strokes given as lists of points.
+
+    Views are returned as-is.
+    """
+    if isinstance(strokes, StrokesView):
+        return strokes
+
+    lengths = [len(points) for points in strokes]
+
+    union_array = (
+        numpy_array(list(chain.from_iterable(strokes)), dtype=float)
+        .reshape(-1, 2)
+    )
+
+    return StrokesView(union_array, cumsum([0] + lengths[:-1]).tolist())
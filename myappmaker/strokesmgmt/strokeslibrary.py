@@ -0,0 +1,449 @@
+"""Facility for storing the strokes of all widgets in a single file.
+
+Layout of a strokes library file (all numbers little-endian):
+
+- header (24 bytes): magic bytes, format version and number of widgets,
+  strokes and points;
+- offset tables (uint32): index of the first stroke of each widget and
+  index of the first point of each stroke, each followed by the total
+  (so the strokes of widget i are the ones from offset i to offset i+1);
+- length (uint32) of the UTF-8 encoded key of each widget;
+- points of all strokes (float32 x, y pairs);
+- keys of all widgets (UTF-8).
+
+The whole library is loaded with a single read, and the strokes of each
+widget are handed over as a strokes view of the array of all points, so
+there's no parsing of individual strokes.
+
+Changing the strokes of a widget updates the library in memory at once,
+while the file is saved (atomically) in a background thread, and only if
+the strokes actually changed. The same thread saves the cache of template
+features (see featurecache.py).
+
+Libraries used to be stored as one .pyl file per stroke, in a directory
+per widget; such directories are imported automatically the first time
+the library is needed, and the library can still be exported to them,
+since they are human-readable.
+"""
+
+### standard library imports
+
+from concurrent.futures import ThreadPoolExecutor
+
+from struct import Struct
+
+from threading import Lock
+
+
+### third-party imports
+
+from numpy import (
+    array as numpy_array,
+    concatenate,
+    cumsum,
+    array_equal,
+    empty,
+    float32,
+    float64,
+    frombuffer,
+    diff,
+)
+
+
+### local imports
+
+from ..config import STROKES_DATA_DIR, STROKES_LIBRARY_FILEPATH
+
+from ..ourstdlibs.pyl import load_pyl, save_pyl
+
+from ..ourstdlibs.atomicfile import atomic_write
+
+from .strokesbuffer import StrokesView, get_strokes_view
+
+from .featurecache import save_feature_cache
+
+from .utils import MATCHING_LOCK
+
+
+
+### constants/module level obj
+
+MAGIC = b'MYAPPSTK'
+
+FORMAT_VERSION = 1
+
+## magic, version and numbers of widgets, strokes and points
+HEADER_STRUCT = Struct('<8sIIII')
+
+## suffix of the directories with the strokes of each widget as .pyl files
+STROKES_DIR_SUFFIX = '_strokes_dir'
+
+## strokes of each widget, by widget key (loaded when first needed)
+STROKES_LIBRARY = {}
+
+LIBRARY_LOADING_STATE = {'loaded': False}
+
+## lock held while the library is changed or copied to be saved
+LIBRARY_LOCK = Lock()
+
+## thread in which the library and the feature cache are saved, along
+## with the last save requested and whether the library changed since it
+## was last saved; requests made while a save is still waiting to start
+## are coalesced into it, since it copies the data only when it starts;
+##
+## pending saves are finished before the interpreter exits, since the
+## threads of executors are joined then
+
+SAVING_STATE = {
+    'executor': None,
+    'future': None,
+    'library_changed': False,
+}
+
+
+
+### functions
+
+def get_strokes_library():
+    """Return dict with the strokes view of each widget, by widget key.
+
+    The library is loaded the first time it is needed. If there's no
+    library file or it can't be loaded, the library is imported from .pyl
+    files instead (and is empty if there are none).
+    """
+    if not LIBRARY_LOADING_STATE['loaded']:
+
+        library = None
+
+        if STROKES_LIBRARY_FILEPATH.exists():
+
+            try: library = load_strokes_library(STROKES_LIBRARY_FILEPATH)
+            except (OSError, ValueError) as err:
+                print(f"Failed to load strokes library: {err}")
+
+        if library is not None:
+            STROKES_LIBRARY.update(library)
+
+        else:
+
+            STROKES_LIBRARY.update(import_pyl_strokes(STROKES_DATA_DIR))
+
+            if STROKES_LIBRARY:
+
+                try: save_strokes_library()
+                except Exception as err:
+                    print(f"Failed to save imported strokes: {err}")
+
+        LIBRARY_LOADING_STATE['loaded'] = True
+
+    return STROKES_LIBRARY
+
+
+def set_widget_strokes(widget_key, strokes):
+    """Store strokes of widget in the library and save it in the background.
+
+    Nothing is saved if the widget already has the same strokes. Returns
+    whether the strokes changed.
+    """
+    strokes = get_strokes_view(strokes)
+    library = get_strokes_library()
+
+    current_strokes = library.get(widget_key)
+
+    if current_strokes is not None and are_same_strokes(
+        current_strokes,
+        strokes,
+    ):
+        return False
+
+    with LIBRARY_LOCK:
+        library[widget_key] = strokes
+
+    schedule_library_save()
+
+    return True
+
+
+def are_same_strokes(strokes_a, strokes_b):
+    """Return whether strokes views are equal, as stored in library files.
+
+    That is, points are compared with the precision they are stored with.
+    """
+    return (
+        strokes_a.starts == strokes_b.starts
+        and array_equal(
+            strokes_a.union_array.astype(float32),
+            strokes_b.union_array.astype(float32),
+        )
+    )
+
+
+def schedule_library_save():
+    """Save strokes library (and feature cache) in a background thread."""
+
+    with LIBRARY_LOCK:
+        SAVING_STATE['library_changed'] = True
+
+    schedule_saving()
+
+
+def schedule_feature_cache_save():
+    """Save feature cache in a background thread."""
+    schedule_saving()
+
+
+def schedule_saving():
+    """Save changed data in a background thread, unless already due."""
+
+    future = SAVING_STATE['future']
+
+    ### a save which didn't start yet will include the latest changes
+
+    if future is not None and not future.running() and not future.done():
+        return
+
+    executor = SAVING_STATE['executor']
+
+    if executor is None:
+        executor = SAVING_STATE['executor'] = ThreadPoolExecutor(1)
+
+    SAVING_STATE['future'] = executor.submit(save_changed_data)
+
+
+def save_changed_data():
+    """Save strokes library, if it changed, and feature cache.
+
+    The feature cache is saved only if it changed as well (see
+    featurecache.save_feature_cache()).
+    """
+    with LIBRARY_LOCK:
+
+        library_changed = SAVING_STATE['library_changed']
+        SAVING_STATE['library_changed'] = False
+
+    if library_changed:
+
+        try: save_strokes_library()
+        except Exception as err:
+            print(f"Failed to save strokes: {err}")
+
+    try: save_feature_cache(MATCHING_LOCK)
+    except Exception as err:
+        print(f"Failed to save feature cache: {err}")
+
+
+def save_strokes_library(filepath=STROKES_LIBRARY_FILEPATH):
+    """Save strokes library in given file, atomically."""
+
+    with LIBRARY_LOCK:
+        library = dict(STROKES_LIBRARY)
+
+    with atomic_write(filepath) as f:
+        f.write(get_library_bytes(library))
+
+
+def get_library_bytes(library):
+    """Return bytes of library file for given dict of strokes."""
+
+    widget_keys = list(library)
+    views = [get_strokes_view(library[widget_key]) for widget_key in library]
+
+    no_of_strokes_per_widget = [len(view) for view in views]
+
+    stroke_lengths = [
+        len(stroke_array)
+        for view in views
+        for stroke_array in view
+    ]
+
+    widget_offsets = cumsum([0] + no_of_strokes_per_widget)
+    stroke_offsets = cumsum([0] + stroke_lengths)
+
+    points = (
+        concatenate([view.union_array for view in views])
+        if views
+        else empty((0, 2))
+    )
+
+    encoded_keys = [widget_key.encode('utf-8') for widget_key in widget_keys]
+
+    return b''.join(
+        (
+            HEADER_STRUCT.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                len(widget_keys),
+                len(stroke_lengths),
+                len(points),
+            ),
+            widget_offsets.astype('<u4').tobytes(),
+            stroke_offsets.astype('<u4').tobytes(),
+            numpy_array(
+                [len(key) for key in encoded_keys],
+                dtype='<u4',
+            ).tobytes(),
+            points.astype('<f4').tobytes(),
+            *encoded_keys,
+        )
+    )
+
+
+def load_strokes_library(filepath):
+    """Return dict with strokes views of widgets from library file."""
+
+    with open(filepath, 'rb') as f:
+        data = f.read()
+
+    return get_library_from_bytes(data)
+
+
+def get_library_from_bytes(data):
+    """Return dict with strokes views of widgets from library bytes.
+
+    Raises ValueError if the data isn't a (complete and consistent)
+    strokes library.
+    """
+
+    if len(data) < HEADER_STRUCT.size:
+        raise ValueError("File is too small to be a strokes library")
+
+    magic, version, no_of_widgets, no_of_strokes, no_of_points = (
+        HEADER_STRUCT.unpack_from(data)
+    )
+
+    if magic != MAGIC:
+        raise ValueError("File is not a strokes library")
+
+    if version > FORMAT_VERSION:
+
+        raise ValueError(
+            f"Strokes library has format version {version}, but only"
+            f" versions up to {FORMAT_VERSION} are supported"
+        )
+
+    ### check size of data against the counts in the header before reading
+    ### anything else (the size of the keys is only known once their
+    ### lengths are read)
+
+    keys_offset = (
+        HEADER_STRUCT.size
+        + 4 * (no_of_widgets + 1)
+        + 4 * (no_of_strokes + 1)
+        + 4 * no_of_widgets
+        + 8 * no_of_points
+    )
+
+    if len(data) < keys_offset:
+        raise ValueError("Strokes library is truncated")
+
+    offset = HEADER_STRUCT.size
+
+    def take(dtype, count):
+
+        nonlocal offset
+
+        array = frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+
+        return array
+
+    widget_offsets = take('<u4', no_of_widgets + 1).astype(int)
+    stroke_offsets = take('<u4', no_of_strokes + 1).astype(int)
+    key_lengths = take('<u4', no_of_widgets).tolist()
+
+    expected_size = keys_offset + sum(key_lengths)
+
+    if len(data) != expected_size:
+
+        raise ValueError(
+            f"Strokes library has {len(data)} bytes, but its header"
+            f" requires {expected_size}"
+        )
+
+    ### offsets must go from the first stroke/point to the total, without
+    ### going back, so the strokes of widgets and points of strokes are
+    ### within the data
+
+    for offsets, total in (
+        (widget_offsets, no_of_strokes),
+        (stroke_offsets, no_of_points),
+    ):
+
+        if (
+            offsets[0] != 0
+            or offsets[-1] != total
+            or (diff(offsets) < 0).any()
+        ):
+            raise ValueError("Strokes library has invalid offsets")
+
+    widget_offsets = widget_offsets.tolist()
+
+    ### points are converted to the type used by the recognizer once, for
+    ### all widgets
+    points = take('<f4', no_of_points * 2).astype(float64).reshape(-1, 2)
+
+    library = {}
+
+    for index, key_length in enumerate(key_lengths):
+
+        widget_key = data[offset:offset+key_length].decode('utf-8')
+        offset += key_length
+
+        first_stroke = widget_offsets[index]
+        end_stroke = widget_offsets[index+1]
+
+        first_point = stroke_offsets[first_stroke]
+        end_point = stroke_offsets[end_stroke]
+
+        library[widget_key] = StrokesView(
+            points[first_point:end_point],
+            (stroke_offsets[first_stroke:end_stroke] - first_point).tolist(),
+        )
+
+    return library
+
+
+def import_pyl_strokes(directory):
+    """Return dict with strokes of widgets stored as .pyl files.
+
+    The strokes of each widget are expected in a directory named after the
+    widget key (plus a suffix), with one .pyl file per stroke.
+    """
+    library = {}
+
+    for strokes_dir in sorted(directory.glob(f'*{STROKES_DIR_SUFFIX}')):
+
+        if not strokes_dir.is_dir():
+            continue
+
+        pyls = sorted(str(path) for path in strokes_dir.glob('*.pyl'))
+
+        if not pyls:
+            continue
+
+        widget_key = strokes_dir.name[:-len(STROKES_DIR_SUFFIX)]
+
+        library[widget_key] = get_strokes_view(list(map(load_pyl, pyls)))
+
+    return library
+
+
+def export_pyl_strokes(directory):
+    """Save strokes of each widget in library as .pyl files in directory.
+
+    Uses the same layout from which libraries are imported.
+    """
+    for widget_key, strokes in get_strokes_library().items():
+
+        strokes_dir = directory / f'{widget_key}{STROKES_DIR_SUFFIX}'
+        strokes_dir.mkdir(parents=True, exist_ok=True)
+
+        for stale_path in strokes_dir.glob('*.pyl'):
+            stale_path.unlink()
+
+        for index, points in enumerate(strokes.get_strokes_lists()):
+
+            save_pyl(
+                points,
+                (strokes_dir / f'stroke_{index:>02}.pyl'),
+            )
@@ -0,0 +1,376 @@
+"""Facility for storing templates in memory-mapped files.
+
+The batched data of the templates (see utils.get_template_batch()) is
+written to a store file which is then memory-mapped, so templates are
+accessed as read-only NumPy views into it. Every process mapping the same
+file (windows of different app instances, worker processes, benchmark
+runs) shares a single physical copy of the templates, held by the page
+cache of the operating system.
+
+Layout of a store file (all numbers little-endian):
+
+- header (48 bytes): magic bytes, format version, number of arrays and
+  digest of the rest of the file;
+- directory: number of strokes, field, number of dimensions, offset and
+  shape of each array;
+- arrays, each aligned to 8 bytes (widget keys are stored as UTF-8 bytes
+  separated by null characters).
+
+Store files are never modified once written. They are named after their
+digest, so changing the templates produces a new file (written to a
+temporary file and then renamed) while readers of the previous one keep
+using it, and publishing templates identical to existing ones just maps
+the existing file.
+
+This module must not import Qt, since it is imported by the worker
+processes as well.
+"""
+
+### standard library imports
+
+import os
+
+from hashlib import blake2b
+
+from mmap import mmap, ACCESS_READ
+
+from struct import Struct
+
+from time import time
+
+
+### third-party imports
+
+from numpy import (
+    ascontiguousarray,
+    dtype,
+    frombuffer,
+    zeros,
+)
+
+from scipy.spatial import cKDTree
+
+
+### local import
+from ..ourstdlibs.atomicfile import atomic_write
+
+
+
+### constants
+
+MAGIC = b'MYAPPTPL'
+
+FORMAT_VERSION = 1
+
+DIGEST_SIZE = 32
+
+## magic, version, number of arrays and digest
+HEADER_STRUCT = Struct(f'<8sII{DIGEST_SIZE}s')
+
+ENTRY_DTYPE = dtype(
+    [
+        ('no_of_strokes', '<u4'),
+        ('field', '<u2'),
+        ('ndim', '<u2'),
+        ('offset', '<u8'),
+        ('rows', '<u8'),
+        ('columns', '<u8'),
+    ]
+)
+
+ALIGNMENT = 8
+
+## fields of each batch stored in the file, in the order of their ids
+
+FIELDS = (
+    'widget_keys',
+    'ratios_logs',
+    'points',
+    'offsets',
+    'bounding_boxes',
+    'centroids',
+    'lengths_logs',
+    'decimated_points',
+    'decimated_offsets',
+    'decimation_errors',
+)
+
+## type of the items of fields which aren't floats
+
+FIELD_DTYPES = {
+    'widget_keys': '<u1',
+    'offsets': '<i8',
+    'decimated_offsets': '<i8',
+}
+
+## type of the items of other fields
+DEFAULT_DTYPE = '<f8'
+
+STORE_FILENAME_PREFIX = 'templates-'
+STORE_FILENAME_SUFFIX = '.store'
+
+## age in seconds from which store files left behind are removed
+STALE_STORE_AGE = 7 * 24 * 60 * 60
+
+
+
+### class definition
+
+class TemplateKDTrees:
+    """Spatial indices (KD-trees) of templates, built as they are needed.
+
+    Supports indexing with the index of a template within its batch, like
+    the list of KD-trees it replaces. KD-trees already built for the same
+    templates (for instance, for a previous store) can be given by index.
+
+    KD-trees hold a copy of the points, so they don't keep the store they
+    were built from mapped.
+    """
+
+    def __init__(self, points, offsets, kdtrees=None):
+
+        self.points = points
+        self.offsets = offsets
+        self.kdtrees = {} if kdtrees is None else kdtrees
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+
+        try:
+            return self.kdtrees[index]
+
+        except KeyError:
+
+            kdtree = self.kdtrees[index] = cKDTree(
+                get_template_array(self.points, self.offsets, index),
+                copy_data=True,
+            )
+
+            return kdtree
+
+
+
+### functions
+
+def get_padding(offset):
+    return -offset % ALIGNMENT
+
+
+def get_template_array(points, offsets, index):
+    """Return view of the points of template at index."""
+
+    start = offsets[index]
+
+    end = (
+        offsets[index + 1]
+        if index + 1 < len(offsets)
+        else len(points)
+    )
+
+    return points[start:end]
+
+
+def get_field_array(batch, field):
+    """Return array with data of field of batch, as stored in the file."""
+
+    if field == 'widget_keys':
+
+        return frombuffer(
+            '\0'.join(batch['widget_keys']).encode('utf-8'),
+            dtype=FIELD_DTYPES[field],
+        )
+
+    return ascontiguousarray(
+        batch[field],
+        dtype=FIELD_DTYPES.get(field, DEFAULT_DTYPE),
+    )
+
+
+def get_store_bytes(batches):
+    """Return bytes of store file for given batches."""
+
+    arrays = [
+        (no_of_strokes, field_id, get_field_array(batch, field))
+        for no_of_strokes, batch in batches.items()
+        for field_id, field in enumerate(FIELDS)
+    ]
+
+    directory = zeros(len(arrays), dtype=ENTRY_DTYPE)
+
+    offset = HEADER_STRUCT.size + directory.nbytes
+    chunks = []
+
+    for entry, (no_of_strokes, field_id, array) in zip(directory, arrays):
+
+        padding = get_padding(offset)
+        chunks.append(bytes(padding))
+
+        offset += padding
+
+        entry['no_of_strokes'] = no_of_strokes
+        entry['field'] = field_id
+        entry['ndim'] = array.ndim
+        entry['offset'] = offset
+        entry['rows'] = array.shape[0]
+        entry['columns'] = array.shape[1] if array.ndim > 1 else 0
+
+        chunks.append(array.tobytes())
+        offset += array.nbytes
+
+    body = directory.tobytes() + b''.join(chunks)
+
+    header = HEADER_STRUCT.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        len(arrays),
+        get_digest(body),
+    )
+
+    return header + body
+
+
+def get_digest(data):
+    return blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def open_store(filepath):
+    """Return dict with data of store file, as read-only views into it.
+
+    The dict contains the path and digest of the file and the batches it
+    holds, by number of strokes. The file remains mapped for as long as
+    any of the views exists.
+    """
+    with open(filepath, 'rb') as f:
+        buffer = mmap(f.fileno(), 0, access=ACCESS_READ)
+
+    if len(buffer) < HEADER_STRUCT.size:
+        raise ValueError("File is too small to be a template store")
+
+    magic, version, no_of_arrays, digest = HEADER_STRUCT.unpack_from(buffer)
+
+    if magic != MAGIC:
+        raise ValueError("File is not a template store")
+
+    if version != FORMAT_VERSION:
+
+        raise ValueError(
+            f"Template store has format version {version}, but only"
+            f" version {FORMAT_VERSION} is supported"
+        )
+
+    directory = frombuffer(
+        buffer,
+        dtype=ENTRY_DTYPE,
+        count=no_of_arrays,
+        offset=HEADER_STRUCT.size,
+    )
+
+    batches = {}
+
+    for no_of_strokes, field_id, ndim, offset, rows, columns in (
+        directory.tolist()
+    ):
+
+        field = FIELDS[field_id]
+        field_dtype = dtype(FIELD_DTYPES.get(field, DEFAULT_DTYPE))
+
+        count = rows * columns if ndim > 1 else rows
+
+        if offset + count * field_dtype.itemsize > len(buffer):
+            raise ValueError("Template store is truncated")
+
+        array = frombuffer(
+            buffer,
+            dtype=field_dtype,
+            count=count,
+            offset=offset,
+        )
+
+        batch = batches.setdefault(no_of_strokes, {})
+
+        if field == 'widget_keys':
+
+            batch[field] = (
+                array.tobytes().decode('utf-8').split('\0')
+                if rows
+                else []
+            )
+
+        else:
+            batch[field] = array.reshape(rows, columns) if ndim > 1 else array
+
+    return {
+        'filepath': filepath,
+        'digest': digest,
+        'batches': batches,
+    }
+
+
+def publish_store(directory, batches):
+    """Store batches in a store file within directory; return it opened.
+
+    If a store file with the same templates already exists (for instance,
+    because another instance of the app published them), it is used
+    instead of writing a new one.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+
+    data = get_store_bytes(batches)
+    *_, digest = HEADER_STRUCT.unpack_from(data)
+
+    filepath = directory / (
+        f'{STORE_FILENAME_PREFIX}{digest.hex()}{STORE_FILENAME_SUFFIX}'
+    )
+
+    try:
+        store = open_store(filepath)
+
+    except (OSError, ValueError):
+        store = None
+
+    if store is None or store['digest'] != digest:
+
+        with atomic_write(filepath) as f:
+            f.write(data)
+
+        store = open_store(filepath)
+
+    else:
+
+        ### mark store as in use, so it isn't considered stale
+        os.utime(filepath)
+
+    remove_stale_stores(directory)
+
+    return store
+
+
+def remove_store(filepath):
+    """Remove store file, if possible.
+
+    Processes which mapped it keep their mapping (where the platform allows
+    removing it at all).
+    """
+    try: os.remove(filepath)
+    except OSError: pass
+
+
+def remove_stale_stores(directory):
+    """Remove store files not used for a long time."""
+
+    threshold = time() - STALE_STORE_AGE
+
+    for filepath in directory.glob(
+        f'{STORE_FILENAME_PREFIX}*{STORE_FILENAME_SUFFIX}'
+    ):
+
+        try:
+            is_stale = filepath.stat().st_mtime < threshold
+
+        except OSError:
+            continue
+
+        if is_stale:
+            remove_store(filepath)
@@ -1,75 +1,559 @@
 
 ### standard library imports
 
-from collections import defaultdict
+import os
 
-from operator import itemgetter
+from collections import defaultdict
 
 from math import log
 
-from contextlib import suppress
+from threading import RLock
 
 
 ### third-party imports
 
-from numpy import array as numpy_array
+from numpy import (
+    array as numpy_array,
+    column_stack,
+    concatenate,
+    cumsum,
+    diff,
+    hypot,
+    interp,
+    lexsort,
+    linspace,
+)
 
-from scipy.spatial.distance import directed_hausdorff
+from scipy.spatial import cKDTree
 
 ### local imports
-from ..prefsmgmt import PREFERENCES, PreferencesKeys
+
+from ..config import TEMPLATE_STORE_DIR
+
+from ..prefsdata import (
+    PREFERENCES,
+    PreferencesKeys,
+    MINIMUM_POINTS_PER_STROKE,
+)
+
+from .hausdorff import (
+    get_symmetric_hausdorff_distances,
+    get_closest_template,
+    take_templates,
+)
+
+from .cascade import get_cascade_features, filter_candidates, record_stage
+
+from .processpool import (
+    MINIMUM_CANDIDATES,
+    get_parallel_distances,
+    get_parallel_closest_template,
+)
+
+from .featurecache import (
+    get_features_key,
+    get_cached_features,
+    cache_features,
+)
+
+from .templatestore import (
+    TemplateKDTrees,
+    get_template_array,
+    publish_store,
+    remove_store,
+)
+
+from .strokesbuffer import StrokesView, get_strokes_view
+
+from .ratioindex import (
+    add_to_ratio_index,
+    remove_from_ratio_index,
+    get_keys_within_tolerance,
+)
 
 
 
 STROKES_MAP = defaultdict(dict)
 
-get_first_item = itemgetter(0)
+## batched templates data for each number of strokes, published in the
+## template store whenever templates are needed after the library changed
+TEMPLATE_BATCHES = {}
+
+## template store whose views back the templates in STROKES_MAP and
+## TEMPLATE_BATCHES, along with the version of the library it holds and
+## the directory stores are published in (headless tools may point it
+## elsewhere)
+
+TEMPLATE_STORE_STATE = {
+    'store': None,
+    'library_version': None,
+    'directory': TEMPLATE_STORE_DIR,
+}
+
+## key of the features of the template of each widget (see
+## featurecache.get_features_key()), which identifies its KD-tree across
+## template stores
+FEATURES_KEYS = {}
+
+## strokes of each widget as registered (that is, before being normalized),
+## so templates can be normalized again when the normalization settings
+## change
+REGISTERED_STROKES = {}
+
+## normalization settings used for the templates currently in STROKES_MAP
+NORMALIZATION_SETTINGS = {'points_per_stroke': 0}
+
+## version of the template library, changed whenever templates change
+LIBRARY_STATE = {'version': 0}
+
+## lock held while templates are changed or compared, since matching may
+## also happen outside the main thread
+MATCHING_LOCK = RLock()
+
+
+class MatchingCancelled(Exception):
+    """Raised when the matching of a drawing is cancelled midway."""
 
 
 def update_strokes_map(widget_key, strokes):
 
-    for inner_map in STROKES_MAP.values():
+    with MATCHING_LOCK:
+
+        ensure_normalized_templates()
+
+        REGISTERED_STROKES[widget_key] = strokes
+        store_template(widget_key, strokes)
+
+
+def remove_from_strokes_map(widget_key):
+    """Remove strokes of widget, if present, from all structures."""
+
+    with MATCHING_LOCK:
+
+        REGISTERED_STROKES.pop(widget_key, None)
+        remove_template(widget_key)
+
 
-        with suppress(KeyError):
-            del inner_map[widget_key]
+def remove_template(widget_key):
+
+    for no_of_strokes, inner_map in STROKES_MAP.items():
+
+        if widget_key in inner_map:
+
+            ratios_logs, *_ = inner_map.pop(widget_key)
+            FEATURES_KEYS.pop(widget_key, None)
+
+            remove_from_ratio_index(no_of_strokes, widget_key, ratios_logs[0])
+
+            LIBRARY_STATE['version'] += 1
+
+
+def store_template(widget_key, strokes):
+    """Store data used to compare drawings with strokes of widget.
+
+    Such data is reused from the feature cache when the same strokes were
+    already processed with the current normalization settings.
+    """
+    remove_template(widget_key)
 
     ### 
     no_of_strokes = len(strokes)
 
-    ### union of strokes
-    union_of_strokes = sum(strokes, [])
+    strokes = get_strokes_view(strokes)
+
+    features_key = get_features_key(strokes, get_points_per_stroke())
+    features = get_cached_features(features_key)
+
+    if features is None:
+
+        features = get_template_features(strokes)
+        cache_features(features_key, features)
 
     ###
-    ratios_logs = get_strokes_ratios_logs(union_of_strokes, strokes)
 
-    ### get offset union for easier comparison
-    offset_union_array = get_offset_union_array(union_of_strokes)
+    STROKES_MAP[no_of_strokes][widget_key] = features
+    FEATURES_KEYS[widget_key] = features_key
+
+    ratios_logs, *_ = features
+    add_to_ratio_index(no_of_strokes, widget_key, ratios_logs[0])
+
+    LIBRARY_STATE['version'] += 1
+
+
+def get_template_features(strokes):
+    """Return tuple with data used to compare drawings with given strokes.
+
+    That is, the ratios logs, the offset union array and the features used
+    by the prefilter cascade, computed from the strokes view once
+    normalized.
+    """
+    ### normalize strokes according to current settings (as a view of a
+    ### single array with the points of all strokes)
+    strokes = get_normalized_strokes(strokes)
 
     ###
-    STROKES_MAP[no_of_strokes][widget_key] = (ratios_logs, offset_union_array)
+    ratios_logs = get_strokes_ratios_logs(strokes)
+
+    ### get offset union for easier comparison
+    offset_union_array = get_offset_union_array(strokes.union_array)
+
+    ### features used by the prefilter cascade
+    cascade_features = get_cascade_features(strokes, offset_union_array)
+
+    return ratios_logs, offset_union_array, cascade_features
+
+
+def get_points_per_stroke():
+    """Return number of points to resample strokes to (0 means none).
+
+    Values below the minimum (possible in edited preference files) are
+    raised to it.
+    """
+    no_of_points = (
+        PREFERENCES[PreferencesKeys.RESAMPLING_POINTS_PER_STROKE.value]
+    )
+
+    return no_of_points and max(no_of_points, MINIMUM_POINTS_PER_STROKE)
+
+
+def get_normalized_strokes(strokes):
+    """Return strokes view normalized according to the current preferences.
+
+    For now, normalization consists of resampling each stroke to a fixed
+    number of equidistant points, if requested.
+    """
+    no_of_points = get_points_per_stroke()
+
+    if not no_of_points:
+        return strokes
+
+    return StrokesView(
+        concatenate(
+            [resample_stroke(points, no_of_points) for points in strokes]
+        ),
+        range(0, len(strokes) * no_of_points, no_of_points),
+    )
+
+
+def resample_stroke(points, no_of_points):
+    """Return array with given number of points equidistant along stroke.
+
+    The first and last points of the stroke are preserved.
+    """
+    xs, ys = points.T
+
+    ### cumulative length of the stroke at each point
+
+    lengths = cumsum(hypot(diff(xs), diff(ys)))
+    lengths = concatenate(((0.0,), lengths))
+
+    total_length = lengths[-1]
+
+    ### a stroke without length is represented by its first point repeated
+
+    if not total_length:
+        return points[:1].repeat(no_of_points, axis=0)
+
+    ### otherwise interpolate coordinates at equidistant lengths
+
+    targets = linspace(0.0, total_length, no_of_points)
+
+    return column_stack(
+        (
+            interp(targets, lengths, xs),
+            interp(targets, lengths, ys),
+        )
+    )
+
+
+def ensure_normalized_templates():
+    """Normalize templates again if normalization settings changed.
+
+    Only the templates in memory are normalized; the strokes stored on
+    disk are always the original ones.
+    """
+    points_per_stroke = get_points_per_stroke()
+
+    if NORMALIZATION_SETTINGS['points_per_stroke'] == points_per_stroke:
+        return
+
+    NORMALIZATION_SETTINGS['points_per_stroke'] = points_per_stroke
+
+    for widget_key, strokes in REGISTERED_STROKES.items():
+        store_template(widget_key, strokes)
+
+
+def get_template_batch(no_of_strokes):
+    """Return batched data of templates with given number of strokes.
+
+    The data is a dict containing:
+
+    - list of widget keys and a map from each widget key to its index;
+    - list with the features key of each template;
+    - 2D array with ratios logs of each template in each row;
+    - array with the points of all templates concatenated;
+    - array with the index of the first point of each template;
+    - the spatial index (KD-tree) of each template, built as needed (or
+      carried over from the previous batches, if the template didn't
+      change);
+    - arrays with the features used by the prefilter cascade, also
+      concatenated/stacked.
+
+    Arrays are read-only views into the template store, which is
+    published again first if the library changed.
+    """
+    if TEMPLATE_STORE_STATE['library_version'] != LIBRARY_STATE['version']:
+        publish_template_store()
+
+    return TEMPLATE_BATCHES[no_of_strokes]
+
+
+def build_template_batch(inner_map, kdtrees_by_key=None):
+    """Return batched data of templates in given inner map of STROKES_MAP.
+
+    See get_template_batch() for the contents of the data. KD-trees of
+    templates whose features key is in kdtrees_by_key are reused.
+    """
+    ratios_logs_tuples, union_arrays, cascade_features = (
+        zip(*inner_map.values())
+    )
+
+    (
+        bounding_boxes,
+        centroids,
+        lengths_logs,
+        decimated_arrays,
+        decimation_errors,
+    ) = zip(*cascade_features)
+
+    widget_keys = list(inner_map)
+
+    features_keys = [FEATURES_KEYS[widget_key] for widget_key in widget_keys]
+
+    points = concatenate(union_arrays)
+    offsets = get_offsets(union_arrays)
+
+    return {
+
+        'widget_keys': widget_keys,
+        'indices_by_key': {key: index for index, key in enumerate(widget_keys)},
+        'features_keys': features_keys,
+        'ratios_logs': numpy_array(ratios_logs_tuples),
+
+        'points': points,
+        'offsets': offsets,
+        'kdtrees': get_kdtrees(
+            points,
+            offsets,
+            features_keys,
+            kdtrees_by_key,
+        ),
+
+        'bounding_boxes': numpy_array(bounding_boxes),
+        'centroids': numpy_array(centroids),
+        'lengths_logs': numpy_array(lengths_logs),
+        'decimated_points': concatenate(decimated_arrays),
+        'decimated_offsets': get_offsets(decimated_arrays),
+        'decimation_errors': numpy_array(decimation_errors),
+
+    }
+
 
+def publish_template_store():
+    """Publish templates in the template store and use its views.
 
-def get_strokes_ratios_logs(union_of_strokes, strokes):
+    The templates in STROKES_MAP and TEMPLATE_BATCHES are replaced by
+    read-only views into the store, so the arrays computed for them in
+    this process can be released. If the store can't be published, the
+    templates are batched in memory instead.
+    """
+    ### KD-trees built for the templates in the previous batches, reused
+    ### for the templates which didn't change
+    kdtrees_by_key = get_built_kdtrees()
+
+    batches = {
+        no_of_strokes: build_template_batch(inner_map, kdtrees_by_key)
+        for no_of_strokes, inner_map in STROKES_MAP.items()
+        if inner_map
+    }
+
+    previous_store = TEMPLATE_STORE_STATE['store']
+
+    try:
+        store = publish_store(TEMPLATE_STORE_STATE['directory'], batches)
+
+    except Exception as err:
+
+        print(f"Failed to publish templates in template store: {err}")
+        store = None
+
+    else:
+
+        batches = {
+            no_of_strokes: get_store_batch(batch, kdtrees_by_key)
+            for no_of_strokes, batch in store['batches'].items()
+        }
+
+        for no_of_strokes, batch in batches.items():
+            back_templates_with_batch(STROKES_MAP[no_of_strokes], batch)
+
+    TEMPLATE_BATCHES.clear()
+    TEMPLATE_BATCHES.update(batches)
+
+    TEMPLATE_STORE_STATE['store'] = store
+    TEMPLATE_STORE_STATE['library_version'] = LIBRARY_STATE['version']
+
+    ### the previous store file is no longer needed by this process
+    ### (other processes still mapping it keep their mapping)
+
+    if (
+        previous_store is not None
+        and (store is None or store['filepath'] != previous_store['filepath'])
+    ):
+        remove_store(previous_store['filepath'])
+
+
+def set_template_store_directory(directory):
+    """Publish template stores in given directory from now on.
+
+    The current store is released and its file removed; templates are
+    published again, in the new directory, the next time they are needed.
+    """
+    with MATCHING_LOCK:
+
+        store = TEMPLATE_STORE_STATE['store']
+
+        TEMPLATE_BATCHES.clear()
+
+        TEMPLATE_STORE_STATE['store'] = None
+        TEMPLATE_STORE_STATE['library_version'] = None
+        TEMPLATE_STORE_STATE['directory'] = directory
+
+        if store is not None:
+            remove_store(store['filepath'])
+
+
+def get_built_kdtrees():
+    """Return KD-trees built for current batches, by features key."""
+
+    return {
+        batch['features_keys'][index]: kdtree
+        for batch in TEMPLATE_BATCHES.values()
+        for index, kdtree in batch['kdtrees'].kdtrees.items()
+    }
+
+
+def get_kdtrees(points, offsets, features_keys, kdtrees_by_key=None):
+    """Return KD-trees of templates, reusing the ones already built."""
+
+    kdtrees = (
+        {
+            index: kdtrees_by_key[features_key]
+            for index, features_key in enumerate(features_keys)
+            if features_key in kdtrees_by_key
+        }
+        if kdtrees_by_key
+        else None
+    )
+
+    return TemplateKDTrees(points, offsets, kdtrees)
+
+
+def get_store_batch(store_batch, kdtrees_by_key=None):
+    """Return batched data of templates from batch in template store.
+
+    KD-trees of templates whose features key is in kdtrees_by_key are
+    reused instead of being built again.
+    """
+    widget_keys = store_batch['widget_keys']
+    points = store_batch['points']
+    offsets = store_batch['offsets']
+
+    features_keys = [FEATURES_KEYS[widget_key] for widget_key in widget_keys]
+
+    return {
+        **store_batch,
+        'indices_by_key': {key: index for index, key in enumerate(widget_keys)},
+        'features_keys': features_keys,
+        'kdtrees': get_kdtrees(points, offsets, features_keys, kdtrees_by_key),
+    }
+
+
+def back_templates_with_batch(inner_map, batch):
+    """Replace templates in inner map of STROKES_MAP by views into batch."""
+
+    points = batch['points']
+    offsets = batch['offsets']
+
+    decimated_points = batch['decimated_points']
+    decimated_offsets = batch['decimated_offsets']
+
+    for index, widget_key in enumerate(batch['widget_keys']):
+
+        inner_map[widget_key] = (
+            batch['ratios_logs'][index],
+            get_template_array(points, offsets, index),
+            (
+                batch['bounding_boxes'][index],
+                batch['centroids'][index],
+                batch['lengths_logs'][index],
+                get_template_array(decimated_points, decimated_offsets, index),
+                batch['decimation_errors'][index],
+            ),
+        )
+
+
+def get_process_pool_setup(no_of_strokes, no_of_candidates):
+    """Return data needed to match in worker processes, if applicable.
+
+    That is, the number of worker processes, the path of the template store
+    holding the templates (which worker processes map as well) and the
+    number of strokes of the templates to compare. If matching in worker
+    processes is disabled, not worth it for the given number of candidates
+    or not possible (because the template store couldn't be published),
+    None is returned instead.
+    """
+    no_of_workers = PREFERENCES[PreferencesKeys.MATCHING_PROCESSES.value]
+
+    if not no_of_workers or no_of_candidates < MINIMUM_CANDIDATES:
+        return
+
+    store = TEMPLATE_STORE_STATE['store']
+
+    ### publish the store again if its file was removed (for instance, by
+    ### another instance of the app) so workers can still map it
+
+    if store is not None and not os.path.exists(store['filepath']):
+
+        publish_template_store()
+        store = TEMPLATE_STORE_STATE['store']
+
+    if store is None:
+        return
+
+    return no_of_workers, os.fspath(store['filepath']), no_of_strokes
+
+
+def get_offsets(arrays):
+    """Return index of first item of each array once concatenated."""
+    return cumsum([0] + [len(array) for array in arrays[:-1]])
+
+
+def get_strokes_ratios_logs(strokes):
     """Return tuple w/ ln of width:height ratios.
 
     That is, width:height ratio of union of strokes and of each stroke
-    individually.
+    individually, given a strokes view.
     """
 
     ratios_logs = []
 
-    for points in (union_of_strokes, *strokes):
+    for points in (strokes.union_array, *strokes):
 
-        xs, ys = zip(*points)
-
-        left = min(xs)
-        right = max(xs)
+        left, top = points.min(axis=0).tolist()
+        right, bottom = points.max(axis=0).tolist()
 
         width = (right - left) or 1
-
-        top = min(ys)
-        bottom = max(ys)
-
         height = (bottom - top) or 1
 
         # XXX further research might improve the measure explained and
@@ -113,45 +597,55 @@ def get_strokes_ratios_logs(union_of_strokes, strokes):
     return tuple(ratios_logs)
 
 
-def get_offset_union_array(union_of_strokes):
-    """Yield offset strokes so 1st point in 1st stroke is at origin.
+def get_offset_union_array(union_array):
+    """Return copy of union array offset so its 1st point is at origin."""
+    return union_array - union_array[0]
 
-    Moved strokes are yielded as numpy arrays.
-    """
 
-    ### coordinates of first point from first stroke
-    x_offset, y_offset = union_of_strokes[0]
+def get_stroke_matches_data(strokes, always_filter=False, cancel_event=None):
+    """Return dict with data about widgets matching the given strokes.
 
-    ### offset all points in all strokes ac
+    Strokes can be given as a strokes view (as captured by a strokes
+    buffer, used without copying) or as lists of points.
 
-    return numpy_array(
+    If a cancel_event (threading.Event) is given, MatchingCancelled is
+    raised as soon as the event is found to be set.
+    """
+    strokes = get_strokes_view(strokes)
 
-        [
-            (a - x_offset, b - y_offset)
-            for a, b in union_of_strokes
-        ]
+    with MATCHING_LOCK:
+        return compute_stroke_matches_data(strokes, always_filter, cancel_event)
 
-    )
 
+def raise_if_cancelled(cancel_event):
 
-def get_stroke_matches_data(strokes, always_filter=False):
+    if cancel_event is not None and cancel_event.is_set():
+        raise MatchingCancelled
+
+
+def compute_stroke_matches_data(strokes, always_filter, cancel_event):
 
     match_data = {}
     match_data['menu_items'] = match_data['chosen_widget_key'] = ''
 
     no_of_strokes = len(strokes)
 
+    ensure_normalized_templates()
+
     possible_matches = STROKES_MAP[no_of_strokes]
 
     if possible_matches:
 
-        union_of_strokes = sum(strokes, [])
+        ### the union of the original strokes is used by the caller to
+        ### position the widget, so we store it before normalizing them
+
+        match_data['union_of_strokes'] = strokes.union_array
 
-        match_data['union_of_strokes'] = union_of_strokes
+        strokes = get_normalized_strokes(strokes)
 
-        your_ratios_logs = get_strokes_ratios_logs(union_of_strokes, strokes)
+        your_ratios_logs = get_strokes_ratios_logs(strokes)
 
-        your_union_array = get_offset_union_array(union_of_strokes)
+        your_union_array = get_offset_union_array(strokes.union_array)
 
         ### if the 'always_filter' flag is off, we check whether
         ### the user asked us to show a widget menu after drawing;
@@ -167,53 +661,116 @@ def get_stroke_matches_data(strokes, always_filter=False):
             PREFERENCES[PreferencesKeys.RATIO_LOG_DIFF_TOLERANCE.value]
         )
 
-        hdist_widget_key_pairs = sorted(
+        hausdorff_tolerance = PREFERENCES[
+            PreferencesKeys.MAXIMUM_TOLERABLE_HAUSDORFF_DISTANCE.value
+        ]
 
-            (
+        batch = get_template_batch(no_of_strokes)
 
-                ### item
+        widget_keys = batch['widget_keys']
+        points = batch['points']
+        offsets = batch['offsets']
+        kdtrees = batch['kdtrees']
 
-                (
+        ### spatial index of the drawing, reused in all comparisons
+        your_kdtree = cKDTree(your_union_array)
 
-                    ## symmetric Hausdorff distance
+        ### data of drawing used by the prefilter cascade
 
-                    max(
-                        directed_hausdorff(your_union_array, widget_union_array)[0],
-                        directed_hausdorff(widget_union_array, your_union_array)[0],
-                    ),
+        (
+            bounding_box,
+            centroid,
+            lengths_logs,
+            decimated_array,
+            decimation_error,
+        ) = get_cascade_features(strokes, your_union_array)
 
-                    ## widget key
-                    widget_key,
+        drawing_data = {
+            'ratios_logs': your_ratios_logs,
+            'bounding_box': bounding_box,
+            'centroid': centroid,
+            'lengths_logs': lengths_logs,
+            'decimated_array': decimated_array,
+            'decimation_error': decimation_error,
+        }
 
-                )
+        raise_if_cancelled(cancel_event)
+
+        ### the stroke count stage rejected all widgets with a different
+        ### number of strokes
+
+        no_of_all_widgets = sum(map(len, STROKES_MAP.values()))
+
+        record_stage(
+            'stroke_count',
+            no_of_all_widgets,
+            no_of_all_widgets - len(widget_keys),
+        )
+
+        if ignore_filtering:
 
-                ### source
+            ### all candidates are scored, so the cheap prefilter stages
+            ### are only used to score the most promising ones first (their
+            ### rejections aren't recorded, since nothing is rejected)
 
-                for widget_key, (widget_ratios_logs, widget_union_array)
-                in possible_matches.items()
+            survivors, rejected = filter_candidates(
+                drawing_data,
+                batch,
+                ratio_tolerance,
+                hausdorff_tolerance,
+                cheap_only=True,
+                record=False,
+            )
 
-                ## filtering (or not)
+            indices = concatenate((survivors, rejected))
 
-                if ignore_filtering or not any(
+            raise_if_cancelled(cancel_event)
 
-                    abs(ratio_log_a - ratio_log_b) > ratio_tolerance
+            record_stage('full_hausdorff', len(indices), 0)
 
-                    for ratio_log_a, ratio_log_b
-                    in zip(your_ratios_logs, widget_ratios_logs)
+            ### score candidates at once (splitting them among worker
+            ### processes, if requested)
 
+            process_pool_setup = (
+                get_process_pool_setup(no_of_strokes, len(indices))
+            )
+
+            if process_pool_setup is None:
+
+                candidates_points, candidates_offsets = (
+                    take_templates(points, offsets, indices)
                 )
 
-            ),
+                distances = (
+                    get_symmetric_hausdorff_distances(
+                        your_union_array,
+                        your_kdtree,
+                        candidates_points,
+                        candidates_offsets,
+                        [kdtrees[index] for index in indices],
+                    )
+                )
 
-            ## sorting key
-            key=get_first_item,
+            else:
 
-        )
+                distances = get_parallel_distances(
+                    *process_pool_setup,
+                    your_union_array,
+                    indices,
+                )
 
-        if ignore_filtering:
+            ### generate menu items, pairing distances with widget keys
+            ### sorted by distance;
+            ###
+            ### ties keep the order in which widgets were registered
+
+            match_data['menu_items'] = [
+
+                (float(distances[position]), widget_keys[indices[position]])
+                for position in lexsort((indices, distances))
+
+            ]
 
-            ### generate menu items
-            match_data['menu_items'] = hdist_widget_key_pairs
             report = "Didn't filter matches."
 
         else:
@@ -221,30 +778,97 @@ def get_stroke_matches_data(strokes, always_filter=False):
             # default report
             report = "Possible matches weren't similar enough."
 
-            # check whether distances of best strokes are within
-            # tolerable distance
-
-            if hdist_widget_key_pairs:
+            # grab widgets whose union of strokes has a similar ratio
+            # from the ratio index
+
+            indices_by_key = batch['indices_by_key']
+
+            indices = numpy_array(
+                sorted(
+                    indices_by_key[widget_key]
+                    for widget_key in get_keys_within_tolerance(
+                        no_of_strokes,
+                        your_ratios_logs[0],
+                        ratio_tolerance,
+                    )
+                ),
+                dtype=int,
+            )
+
+            record_stage(
+                'ratio_index',
+                len(widget_keys),
+                len(widget_keys) - len(indices),
+            )
+
+            # filter them further with the prefilter cascade (which includes
+            # the comparison of the ratios of each stroke); survivors come
+            # ordered from most to least promising
+
+            survivors, _ = filter_candidates(
+                drawing_data,
+                batch,
+                ratio_tolerance,
+                hausdorff_tolerance,
+                indices=indices,
+            )
+
+            # look for the closest widget within tolerable distance, if any;
+            #
+            # since only the best match matters, the best distance found so
+            # far is used to abandon remaining comparisons early
+
+            raise_if_cancelled(cancel_event)
+
+            if len(survivors):
 
-                hausdorff_distance, chosen_widget_key = hdist_widget_key_pairs[0]
                 match_data['no_of_widgets'] = len(possible_matches)
 
-                hausdorff_tolerance = PREFERENCES[
-                    PreferencesKeys.MAXIMUM_TOLERABLE_HAUSDORFF_DISTANCE.value
-                ]
-
-                if hausdorff_distance < hausdorff_tolerance:
+                process_pool_setup = (
+                    get_process_pool_setup(no_of_strokes, len(survivors))
+                )
 
-                    report = 'match'
+                if process_pool_setup is None:
 
-                    match_data['chosen_widget_key'] = chosen_widget_key
-                    match_data['hausdorff_distance'] = hausdorff_distance
+                    closest = get_closest_template(
+                        your_union_array,
+                        your_kdtree,
+                        points,
+                        offsets,
+                        kdtrees,
+                        survivors,
+                        hausdorff_tolerance,
+                    )
 
                 else:
+
+                    closest = get_parallel_closest_template(
+                        *process_pool_setup,
+                        your_union_array,
+                        survivors,
+                        hausdorff_tolerance,
+                    )
+
+                record_stage(
+                    'full_hausdorff',
+                    len(survivors),
+                    len(survivors) - (closest is not None),
+                )
+
+                if closest is None:
                     report += " (hausdorff distance too large)"
 
+                else:
+
+                    index, hausdorff_distance = closest
+
+                    report = 'match'
+
+                    match_data['chosen_widget_key'] = widget_keys[index]
+                    match_data['hausdorff_distance'] = hausdorff_distance
+
             else:
-                report += " (proportions didn't match)"
+                report += " (proportions/dimensions didn't match)"
 
     else:
         report = "No widget with this stroke count"
@@ -0,0 +1,214 @@
+"""Facility with lightweight items representing widgets on the canvas.
+
+Instead of embedding a full widget in the scene (through a proxy widget)
+for each widget on the canvas, an item painting a cached render of the
+widget is used. Renders are made once per kind of widget (from its
+prototype in the widget registry) and shared by all items of that kind.
+The actual widget is only created when the user interacts with the item,
+at which point it replaces the item.
+
+When requested, both kinds of widgets on the canvas (painted items and
+actual widgets) are drawn as simple placeholder rectangles when zoomed out
+(see canvasview.py) far enough for their details not to be visible.
+"""
+
+### third-party imports
+
+## PySide6
+
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsProxyWidget
+
+from PySide6.QtGui import QColor
+
+from PySide6.QtCore import QPointF, QRectF
+
+
+### local imports
+
+from .widgets import get_widget, get_widget_prototype
+
+
+
+### constants/module level objs
+
+## level of detail (roughly, the scale of the view) below which widgets are
+## drawn as placeholders, when requested
+PLACEHOLDER_LEVEL_OF_DETAIL = 0.4
+
+PLACEHOLDER_QCOLOR = QColor(200, 200, 200)
+
+## render (pixmap) of each kind of widget, by widget key
+WIDGET_RENDERS = {}
+
+## settings used when drawing widgets on the canvas
+RENDERING_SETTINGS = {'level_of_detail': False}
+
+## key under which items store the key of the widget they represent (see
+## QGraphicsItem.setData())
+WIDGET_KEY_DATA = 0
+
+
+
+### functions
+
+def get_widget_render(widget_key):
+    """Return render of widget with given key, rendering it if needed."""
+
+    try:
+        return WIDGET_RENDERS[widget_key]
+
+    except KeyError:
+        pass
+
+    render = WIDGET_RENDERS[widget_key] = (
+        get_widget_prototype(widget_key)['widget'].grab()
+    )
+
+    return render
+
+
+def paint_placeholder(painter, option, rect):
+    """Paint placeholder in rect if zoomed out enough and requested.
+
+    Returns whether the placeholder was painted.
+    """
+    if (
+        not RENDERING_SETTINGS['level_of_detail']
+        or (
+            option.levelOfDetailFromTransform(painter.worldTransform())
+            >= PLACEHOLDER_LEVEL_OF_DETAIL
+        )
+    ):
+        return False
+
+    painter.fillRect(rect, PLACEHOLDER_QCOLOR)
+
+    return True
+
+
+def get_widget_proxy(widget_key):
+    """Return proxy embedding new widget with given key in the canvas.
+
+    Proxies able to draw placeholders are only used when placeholders are
+    requested, since painting them goes through Python and is slower.
+    """
+    proxy = (
+        CanvasWidgetProxy()
+        if RENDERING_SETTINGS['level_of_detail']
+        else QGraphicsProxyWidget()
+    )
+
+    proxy.setWidget(get_widget(widget_key))
+    proxy.setData(WIDGET_KEY_DATA, widget_key)
+
+    return proxy
+
+
+def update_widget_proxy(proxy):
+    """Return proxy of the kind currently used for the widget of proxy.
+
+    That is, the given proxy if it already is of such kind (see
+    get_widget_proxy()). Otherwise its widget, along with any changes the
+    user made to it, is moved into a new proxy, which takes the place of
+    the given one (in the scene, if it is in one) and is returned.
+    """
+    proxy_class = (
+        CanvasWidgetProxy
+        if RENDERING_SETTINGS['level_of_detail']
+        else QGraphicsProxyWidget
+    )
+
+    if type(proxy) is proxy_class:
+        return proxy
+
+    widget = proxy.widget()
+    proxy.setWidget(None)
+
+    new_proxy = proxy_class()
+
+    new_proxy.setWidget(widget)
+    new_proxy.setData(WIDGET_KEY_DATA, proxy.data(WIDGET_KEY_DATA))
+
+    new_proxy.setPos(proxy.pos())
+    new_proxy.setZValue(proxy.zValue())
+    new_proxy.setCacheMode(proxy.cacheMode())
+
+    scene = proxy.scene()
+
+    if scene is not None:
+
+        scene.addItem(new_proxy)
+        scene.removeItem(proxy)
+
+    ### so whoever keeps the given proxy can find the new one, as with
+    ### materialized items
+    proxy.replaced_by = new_proxy
+
+    return new_proxy
+
+
+
+### class definitions
+
+class PaintedWidgetItem(QGraphicsItem):
+    """Item painting the look of a widget, replaced by it when clicked."""
+
+    def __init__(self, widget_key):
+
+        super().__init__()
+
+        self.widget_key = widget_key
+        self.setData(WIDGET_KEY_DATA, widget_key)
+
+        self.render = get_widget_render(widget_key)
+
+        ### proxy replacing this item once materialized
+        self.replaced_by = None
+
+        self.bounding_rect = QRectF(
+            QPointF(0, 0),
+            self.render.deviceIndependentSize(),
+        )
+
+    def boundingRect(self):
+        return self.bounding_rect
+
+    def paint(self, painter, option, widget=None):
+
+        if not paint_placeholder(painter, option, self.bounding_rect):
+            painter.drawPixmap(QPointF(0, 0), self.render)
+
+    def mousePressEvent(self, event):
+
+        ### the user is interacting with the item, so it is replaced by an
+        ### actual widget
+        self.materialize()
+
+        event.accept()
+
+    def materialize(self):
+        """Replace item by proxy of actual widget; return the proxy."""
+
+        scene = self.scene()
+
+        widget_proxy = get_widget_proxy(self.widget_key)
+        scene.addItem(widget_proxy)
+
+        widget_proxy.setPos(self.pos())
+        widget_proxy.setZValue(self.zValue())
+        widget_proxy.setCacheMode(self.cacheMode())
+
+        scene.removeItem(self)
+
+        self.replaced_by = widget_proxy
+
+        return widget_proxy
+
+
+class CanvasWidgetProxy(QGraphicsProxyWidget):
+    """Proxy of actual widget on the canvas."""
+
+    def paint(self, painter, option, widget=None):
+
+        if not paint_placeholder(painter, option, self.boundingRect()):
+            super().paint(painter, option, widget)
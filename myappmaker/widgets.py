@@ -1,7 +1,10 @@
 
-### standard library import
+### standard library imports
+
 from functools import partial
 
+from importlib import import_module
+
 
 ### third-party imports
 
@@ -45,3 +48,125 @@ def get_label():
     label.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Maximum)
     return label
 
+
+
+
+### widget registry
+###
+### widget factories are registered by widget key, either directly or as a
+### 'module:name' reference only imported when the factory is first needed,
+### so registering many widget types costs nothing at startup;
+###
+### the first widget obtained for each key is kept as a prototype, from
+### which the size hint (which depends on the style and font metrics) and
+### the render shared by painted items (see widgetitems.py) are taken, so
+### looking up the size of a widget or painting it doesn't require creating
+### an instance;
+###
+### actual instances can't be cloned from the prototype (Qt widgets can't
+### be copied), so each one still comes from its factory; code placing many
+### widgets should only create them when needed (painted items do so once
+### the user interacts with them)
+
+## factory (or reference to it) of each widget, by widget key
+WIDGET_FACTORIES = {}
+
+## prototype data of each widget, by widget key
+WIDGET_PROTOTYPES = {}
+
+
+def register_widget(widget_key, factory):
+    """Register factory (callable or 'module:name' reference) for widget."""
+
+    WIDGET_FACTORIES[widget_key] = factory
+
+    ### discard prototype made with a previous factory, if any
+    WIDGET_PROTOTYPES.pop(widget_key, None)
+
+
+def get_widget_keys():
+    """Return keys of registered widgets, in registration order."""
+    return list(WIDGET_FACTORIES)
+
+
+def get_widget_factory(widget_key):
+    """Return factory of widget, importing it first if needed."""
+
+    factory = WIDGET_FACTORIES[widget_key]
+
+    if isinstance(factory, str):
+
+        module_name, _, name = factory.partition(':')
+
+        factory = WIDGET_FACTORIES[widget_key] = getattr(
+            import_module(module_name),
+            name,
+        )
+
+    return factory
+
+
+def get_widget_prototype(widget_key):
+    """Return prototype data of widget, creating it if needed.
+
+    The data is a dict with the factory, the prototype widget itself and
+    its size hint.
+    """
+    try:
+        return WIDGET_PROTOTYPES[widget_key]
+
+    except KeyError:
+        pass
+
+    factory = get_widget_factory(widget_key)
+    widget = factory()
+
+    prototype = WIDGET_PROTOTYPES[widget_key] = {
+        'factory': factory,
+        'widget': widget,
+        'size_hint': widget.sizeHint(),
+    }
+
+    ### widgets not shown yet don't have their actual size, so we set it
+    ### (it is the same size used when they are embedded in the scene)
+    widget.resize(prototype['size_hint'])
+
+    return prototype
+
+
+def get_widget_size(widget_key):
+    """Return (width, height) of widget with given key."""
+
+    size_hint = get_widget_prototype(widget_key)['size_hint']
+    return size_hint.width(), size_hint.height()
+
+
+def get_widget(widget_key):
+    """Return new instance of widget with given key.
+
+    The instance is created by the factory of the widget, so this costs as
+    much as creating the widget directly; only the size hint is reused.
+    """
+
+    prototype = get_widget_prototype(widget_key)
+
+    widget = prototype['factory']()
+    widget.resize(prototype['size_hint'])
+
+    return widget
+
+
+def register_builtin_widgets():
+    """Register the widgets which come with the app."""
+
+    for widget_key, factory in (
+
+        ('label', get_label),
+        ('unchecked_check_box', get_unchecked_check_box),
+        ('checked_check_box', get_checked_check_box),
+
+    ):
+        register_widget(widget_key, factory)
+
+
+register_builtin_widgets()